@@ -15,10 +15,10 @@ load_dotenv()
 class Settings(BaseSettings):
     """项目配置类"""
     
-    # LLM提供商选择: 'openai' 或 'dashscope'
-    llm_provider: Literal['openai', 'dashscope'] = Field(
-        default='openai',
-        description="LLM提供商选择"
+    # LLM提供商选择: 'openai'、'dashscope' 或 'stub'（本地确定性桩模型，用于离线压测）
+    llm_provider: Literal['openai', 'dashscope', 'stub'] = Field(
+        default='dashscope',
+        description="LLM和嵌入模型提供商选择"
     )
     
     # OpenAI配置
@@ -53,11 +53,41 @@ class Settings(BaseSettings):
         description="通义千问嵌入模型"
     )
     
+    # 本地桩模型配置（llm_provider='stub'）
+    stub_llm_latency_ms: float = Field(
+        default=200.0,
+        description="桩模型首token延迟的中位数（毫秒）"
+    )
+    stub_llm_latency_distribution: Literal['fixed', 'uniform', 'lognormal'] = Field(
+        default='lognormal',
+        description="桩模型首token延迟的分布: 'fixed'(固定)、'uniform'(中位数±jitter比例内均匀分布)、'lognormal'(对数正态，jitter为sigma)"
+    )
+    stub_llm_latency_jitter: float = Field(
+        default=0.5,
+        description="桩模型延迟分布的离散程度"
+    )
+    stub_llm_token_latency_ms: float = Field(
+        default=10.0,
+        description="桩模型流式输出时相邻两个片段的间隔（毫秒），非流式调用也计入总时长"
+    )
+    stub_llm_stream_chunk_chars: int = Field(
+        default=4,
+        description="桩模型流式输出每个片段的字符数"
+    )
+    stub_llm_seed: int = Field(
+        default=0,
+        description="桩模型延迟采样的随机种子"
+    )
+
     # 向量数据库配置
     vector_store_path: str = Field(
         default="./vector_store",
         description="向量数据库存储路径"
     )
+    vector_store_backend: Literal['chroma', 'numpy'] = Field(
+        default='chroma',
+        description="检索后端: 'chroma'(直接查询Chroma) 或 'numpy'(启动时把集合全部载入内存NumPy矩阵做精确检索，适合几千条以内的小型目录)"
+    )
     chunk_size: int = Field(
         default=1000,
         description="文本分块大小"
@@ -67,12 +97,76 @@ class Settings(BaseSettings):
         description="文本分块重叠大小"
     )
     
+    # 索引热切换配置
+    enable_index_watcher: bool = Field(
+        default=False,
+        description="是否监听data/api.json的修改并自动构建、切换新一代API索引（默认关闭，需要时显式开启）"
+    )
+    index_watch_interval_seconds: float = Field(
+        default=5.0,
+        description="监听api.json修改的轮询间隔（秒）"
+    )
+    index_build_batch_size: int = Field(
+        default=256,
+        description="构建新一代索引时每批写入向量集合的文档数量"
+    )
+
+    # 本地模型配置
+    local_embedding_backend: Literal['torch', 'torch-int8', 'onnx', 'onnx-int8'] = Field(
+        default='torch',
+        description="本地Qwen嵌入模型的推理后端: 'torch'(fp32)、'torch-int8'(动态int8量化)、'onnx'或'onnx-int8'(ONNX Runtime，需要sentence-transformers[onnx])"
+    )
+    onnx_model_dir: str = Field(
+        default="./models/onnx",
+        description="导出的ONNX/量化模型的保存目录"
+    )
+    onnx_quantization_target: Literal['auto', 'arm64', 'avx2', 'avx512', 'avx512_vnni'] = Field(
+        default='auto',
+        description="onnx-int8后端的量化配置对应的CPU指令集，'auto'时按当前CPU检测（arm64/avx512_vnni/avx512/avx2）"
+    )
+
+    # 嵌入缓存配置
+    enable_embedding_cache: bool = Field(
+        default=True,
+        description="是否在VectorStoreManager的嵌入模型前加一层缓存"
+    )
+    embedding_cache_max_entries: int = Field(
+        default=10000,
+        description="内存LRU嵌入缓存的最大条目数"
+    )
+    embedding_cache_document_max_entries: int = Field(
+        default=10000,
+        description="文档嵌入（embed_documents）内存LRU缓存的最大条目数，与查询嵌入缓存分开计数和淘汰"
+    )
+    embedding_cache_path: Optional[str] = Field(
+        default=None,
+        description="持久化嵌入缓存（内存映射float32文件）的目录，为空时只使用内存缓存"
+    )
+    embedding_cache_disk_max_entries: int = Field(
+        default=100000,
+        description="持久化嵌入缓存最多保存的向量数量"
+    )
+
     # 检索配置
     retrieval_k: int = Field(
         default=5,
         description="检索返回的文档数量"
     )
 
+    # 混合检索配置
+    enable_hybrid_retrieval: bool = Field(
+        default=True,
+        description="API检索是否在向量召回之外增加BM25词法召回，两路结果用RRF融合后再精排"
+    )
+    lexical_k: int = Field(
+        default=10,
+        description="BM25词法召回的文档数量"
+    )
+    rrf_k: int = Field(
+        default=60,
+        description="倒数排名融合（RRF）的平滑常数"
+    )
+
     # 重排序配置
     enable_reranking: bool = Field(
         default=True,
@@ -90,6 +184,34 @@ class Settings(BaseSettings):
         default=8,
         description="重排序后的最终文档数量"
     )
+    local_rerank_backend: Literal['torch', 'torch-int8', 'onnx', 'onnx-int8'] = Field(
+        default='torch',
+        description="本地Qwen重排序模型的推理后端: 'torch'(fp32)、'torch-int8'(动态int8量化)、'onnx'或'onnx-int8'(ONNX Runtime，需要optimum[onnxruntime])"
+    )
+    local_rerank_batch_token_budget: int = Field(
+        default=16384,
+        description="本地Qwen重排序模型每个微批次（批大小×批内最大长度）的token预算"
+    )
+    local_rerank_max_doc_tokens: int = Field(
+        default=1024,
+        description="本地Qwen重排序模型单个文档最多保留的token数"
+    )
+    enable_rerank_cache: bool = Field(
+        default=True,
+        description="是否缓存重排序结果（按查询+候选文档集合+模型），向量索引重建后自动失效"
+    )
+    rerank_cache_max_entries: int = Field(
+        default=2048,
+        description="重排序结果LRU缓存的最大条目数"
+    )
+    enable_rerank_gate: bool = Field(
+        default=False,
+        description="是否启用置信度门控：查询原样包含唯一候选API名称，或向量top-1与top-2距离差足够大时跳过重排序"
+    )
+    rerank_gate_margin: float = Field(
+        default=0.2,
+        description="跳过重排序的向量距离差阈值，与嵌入模型相关，用scripts/calibrate_rerank_gate.py按目标准确率拟合"
+    )
 
     # 增强检索配置
     enable_query_expansion: bool = Field(
@@ -105,6 +227,129 @@ class Settings(BaseSettings):
         description="最大检索轮数"
     )
 
+    # 规划候选API筛选配置
+    enable_planner_candidate_selection: bool = Field(
+        default=True,
+        description="是否在任务规划前用向量检索筛选候选API，而不是把完整API目录放进Prompt"
+    )
+    planner_candidate_k: int = Field(
+        default=20,
+        description="候选API筛选时向量检索召回的API数量（前置依赖API额外加入）"
+    )
+    planner_candidate_max_distance: float = Field(
+        default=1.0,
+        description="top-1召回结果允许的最大向量距离，超过则认为召回置信度低，回退到完整API目录"
+    )
+    enable_plan_pipelining: bool = Field(
+        default=True,
+        description="/plan流水线模式：用原始查询做候选API召回，与查询改写并行执行"
+    )
+    plan_refine_check_k: int = Field(
+        default=5,
+        description="流水线模式下，判断候选集是否需要用改写后查询重新召回时，BM25检查的top结果数量"
+    )
+    plan_refine_min_overlap: float = Field(
+        default=0.6,
+        description="改写后查询的BM25 top结果落在原始候选集中的比例低于该值时，用改写后的查询重新召回"
+    )
+
+    # 任务规划缓存配置
+    enable_plan_cache: bool = Field(
+        default=True,
+        description="是否启用任务规划缓存（精确匹配+语义匹配两级）"
+    )
+    plan_cache_backend: Literal['memory', 'sqlite'] = Field(
+        default='memory',
+        description="任务规划缓存后端: 'memory'(进程内) 或 'sqlite'(本地磁盘文件)"
+    )
+    plan_cache_path: str = Field(
+        default="./cache/plan_cache.sqlite3",
+        description="SQLite缓存后端的数据库文件路径"
+    )
+    plan_cache_ttl_seconds: int = Field(
+        default=86400,
+        description="任务规划缓存条目的存活时间（秒），<=0表示永不过期"
+    )
+    plan_cache_max_entries: int = Field(
+        default=1024,
+        description="任务规划缓存的最大条目数，超出后按LRU淘汰"
+    )
+    plan_cache_similarity_threshold: float = Field(
+        default=0.95,
+        description="语义匹配层的余弦相似度阈值"
+    )
+
+    # 并发配置
+    blocking_executor_workers: int = Field(
+        default=16,
+        description="执行无异步客户端的阻塞调用（向量检索、重排序等）的线程池大小"
+    )
+
+    http_pool_maxsize: int = Field(
+        default=32,
+        description="共享HTTP连接池中每个主机保持的最大keep-alive连接数"
+    )
+    batch_param_fill_concurrency: int = Field(
+        default=8,
+        description="批量API调用生成时，参数填充LLM调用的最大并发数"
+    )
+    batch_max_queries: int = Field(
+        default=1000,
+        description="单个批量API调用生成请求允许的最大查询数量"
+    )
+    multi_query_concurrency: int = Field(
+        default=4,
+        description="批量重排序、多查询检索时同时进行的查询数量上限"
+    )
+    rerank_rate_limit_qps: float = Field(
+        default=10.0,
+        description="批量重排序、多查询检索调用重排序API的速率上限（次/秒，令牌桶），<=0表示不限流"
+    )
+    rerank_rate_limit_burst: int = Field(
+        default=5,
+        description="重排序API令牌桶的容量，即允许的突发调用次数"
+    )
+    micro_batch_max_size: int = Field(
+        default=32,
+        description="本地模型微批次调度：每批最多合并的请求数"
+    )
+    micro_batch_max_wait_ms: float = Field(
+        default=5.0,
+        description="本地模型微批次调度：第一条请求最多等待凑批的毫秒数"
+    )
+
+    # 任务计划执行配置
+    plan_exec_base_url: str = Field(
+        default="http://localhost:8080",
+        description="执行任务计划时业务API的基础地址（API定义中的base_url优先）"
+    )
+    plan_exec_max_connections_per_host: int = Field(
+        default=4,
+        description="执行任务计划时每个主机的最大并发请求数"
+    )
+    plan_exec_request_timeout: float = Field(
+        default=10.0,
+        description="执行任务计划时单次API请求的超时时间（秒）"
+    )
+    plan_exec_timeout: float = Field(
+        default=60.0,
+        description="执行整个任务计划的超时时间（秒），超时后取消未完成的步骤"
+    )
+    plan_exec_max_retries: int = Field(
+        default=2,
+        description="单个步骤失败后的最大重试次数（连接错误、超时、429，以及幂等请求的5xx）"
+    )
+    plan_exec_retry_backoff: float = Field(
+        default=0.2,
+        description="重试的初始退避时间（秒），之后指数增长"
+    )
+
+    # 可观测性配置
+    enable_tracing: bool = Field(
+        default=True,
+        description="是否记录流水线各阶段的追踪span（/metrics直方图和Server-Timing响应头），关闭后几乎没有额外开销"
+    )
+
     # 输出配置
     output_dir: str = Field(
         default="./output",
@@ -0,0 +1,75 @@
+"""
+规划Prompt裁剪效果基准
+Measures planner prompt tokens with and without candidate pruning on a synthetic catalog
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.synthetic_catalog import generate_catalog
+from scripts.vectorization import build_api_documents
+from src.planning.candidate_selector import CandidateSelector
+from src.planning.task_planner import TaskPlanner, PREREQUISITE_RULES
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.vectorizer import VectorStoreManager
+
+QUERIES = [
+    "首先获取我的员工信息，然后并行为我提交请假和加班申请。",
+    "获取我的员工项目信息，并告诉我项目经理是谁。",
+    "帮我提交一个请假申请。",
+    "帮我解锁用户 a@b.com",
+    "查询项目 p_abc 的详情",
+]
+
+
+def _token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "cl100k_base", lambda text: len(encoding.encode(text))
+    except Exception:
+        return "chars", len
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规划Prompt裁剪效果基准")
+    parser.add_argument("--size", type=int, default=1000, help="合成API目录大小")
+    parser.add_argument("--top-n", type=int, default=20, help="候选API数量")
+    args = parser.parse_args()
+
+    logger.remove()
+    with open("data/api.json", "r", encoding="utf-8") as f:
+        catalog = generate_catalog(args.size, base=json.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+        vsm.create_vector_store(build_api_documents(catalog), collection_name="api_docs")
+        selector = CandidateSelector(vsm, prerequisites=PREREQUISITE_RULES, top_n=args.top_n, max_distance=2.0)
+        planner = TaskPlanner(llm=None)
+        unit, count_tokens = _token_counter()
+
+        total_full, total_pruned = 0, 0
+        print(f"API目录大小: {len(catalog)}，候选数: {args.top_n}，计数单位: {unit}")
+        for query in QUERIES:
+            start = time.perf_counter()
+            candidates = selector.select(query, catalog)
+            select_ms = (time.perf_counter() - start) * 1000
+            full = count_tokens(planner._build_prompt(query, catalog))
+            pruned = count_tokens(planner._build_prompt(query, candidates))
+            total_full += full
+            total_pruned += pruned
+            print(f"- {query}\n  完整: {full}  裁剪后: {pruned} ({len(candidates)}个API)  "
+                  f"节省: {1 - pruned / full:.1%}  筛选耗时: {select_ms:.1f}ms")
+        print(f"合计 完整: {total_full}  裁剪后: {total_pruned}  节省: {1 - total_pruned / total_full:.1%}")
+
+
+if __name__ == "__main__":
+    main()
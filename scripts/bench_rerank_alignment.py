@@ -0,0 +1,137 @@
+"""
+重排序分数对齐基准
+Compares the old page_content scan / content-hash dedup with document-id keyed alignment and merge
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from langchain_core.documents import Document
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.synthetic_catalog import generate_catalog
+from src.rerank.reranker import RerankerManager
+from src.retrieval.rank_fusion import merge_top_k
+from src.vectorize.api_documents import build_api_documents, document_id
+
+
+class FixedReranker(RerankerManager):
+    """返回预先计算好的重排序结果，只测量分数对齐本身"""
+
+    def __init__(self, reranked):
+        super().__init__(cache=None)
+        self.enabled = True
+        self.reranked = reranked
+
+    def rerank_documents(self, query, documents, top_k=None):
+        return self.reranked[:top_k]
+
+
+def _legacy_align(doc_score_pairs, reranked_results):
+    """修改前rerank_with_scores的对齐方式：对每个结果线性扫描并比较整段内容"""
+    final_results = []
+    for doc, rerank_score in reranked_results:
+        orig_score = 1.0
+        for orig_doc, orig_score_val in doc_score_pairs:
+            if orig_doc.page_content == doc.page_content:
+                orig_score = orig_score_val
+                break
+        final_results.append((doc, orig_score, rerank_score))
+    return final_results
+
+
+def _legacy_merge(result_lists, final_k):
+    """修改前multi_query_search的合并方式：按内容哈希去重后全量排序"""
+    all_results = []
+    seen_contents = set()
+    for results in result_lists:
+        for doc, vec_score, rerank_score in results:
+            content_hash = hash(doc.page_content)
+            if content_hash not in seen_contents:
+                seen_contents.add(content_hash)
+                all_results.append((doc, vec_score, rerank_score))
+    all_results.sort(key=lambda x: x[2], reverse=True)
+    return all_results[:final_k]
+
+
+def _timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _timed_each(func, inputs):
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        func(item)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _fresh_copy(doc):
+    """模拟向量库返回的新文档对象（内容相同但字符串是新对象）"""
+    return Document(page_content=doc.page_content.encode("utf-8").decode("utf-8"), metadata=dict(doc.metadata))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重排序分数对齐基准")
+    parser.add_argument("--top-k", type=int, default=100, help="召回并重排序的候选数量（rerank_top_k）")
+    parser.add_argument("--queries", type=int, default=20, help="多查询合并的查询数量")
+    parser.add_argument("--final-k", type=int, default=10, help="多查询合并后返回的数量")
+    parser.add_argument("--repeat", type=int, default=50, help="每组测量的重复次数")
+    args = parser.parse_args()
+
+    logger.remove()
+    rng = random.Random(42)
+    with open("data/api.json", "r", encoding="utf-8") as f:
+        catalog = generate_catalog(args.top_k * 2, base=json.load(f))
+    docs = build_api_documents(catalog)
+
+    recalled = [(doc, rng.random()) for doc in docs[:args.top_k]]
+    reranked = [(doc, rng.random()) for doc, _ in rng.sample(recalled, len(recalled))]
+    reranker = FixedReranker(reranked)
+
+    legacy = _legacy_align(recalled, reranked)
+    current = reranker.rerank_with_scores("查询", recalled, args.top_k)
+    assert [(id(d), s, r) for d, s, r in legacy] == [(id(d), s, r) for d, s, r in current]
+
+    legacy_ms = _timed(lambda: _legacy_align(recalled, reranked), args.repeat)
+    current_ms = _timed(lambda: reranker.rerank_with_scores("查询", recalled, args.top_k), args.repeat)
+    print(f"分数对齐 (top_k={args.top_k}): 逐条扫描比较内容 {legacy_ms:.3f} ms, 按文档ID查字典 {current_ms:.3f} ms, "
+          f"加速 {legacy_ms / current_ms:.1f}x")
+
+    # 每次测量使用新的结果集：Chroma每次查询都返回新的Document对象，字符串哈希没有缓存
+    def make_result_lists():
+        result_lists = []
+        for _ in range(args.queries):
+            sample = rng.sample(docs, args.top_k)
+            result_lists.append([(_fresh_copy(doc), rng.random(), rng.random()) for doc in sample])
+        return result_lists
+
+    sample_lists = make_result_lists()
+    assert [document_id(r[0]) for r in _legacy_merge(sample_lists, args.final_k)] \
+        == [document_id(r[0]) for r in merge_top_k(sample_lists, args.final_k, score=lambda r: r[2])]
+
+    legacy_inputs = [make_result_lists() for _ in range(args.repeat)]
+    current_inputs = [make_result_lists() for _ in range(args.repeat)]
+    legacy_ms = _timed_each(lambda result_lists: _legacy_merge(result_lists, args.final_k), legacy_inputs)
+    current_ms = _timed_each(
+        lambda result_lists: merge_top_k(result_lists, args.final_k, score=lambda r: r[2]), current_inputs
+    )
+    print(f"多查询合并 ({args.queries}个查询 x {args.top_k}): 内容哈希+全量排序 {legacy_ms:.3f} ms, "
+          f"文档ID+堆top-k {current_ms:.3f} ms, 加速 {legacy_ms / current_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
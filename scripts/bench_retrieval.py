@@ -0,0 +1,283 @@
+"""
+离线检索基准与回归检查
+Offline retrieval benchmark: recall@k, MRR, latency and throughput per retrieval configuration, as a diffable JSON report
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import settings
+from scripts.calibrate_rerank_gate import derive_queries
+from scripts.synthetic_catalog import generate_catalog
+from src.rerank.reranker import RerankerManager
+from src.retrieval.api_retriever import ApiRetriever
+from src.retrieval.bm25_index import tokenize
+from src.retrieval.rerank_gate import RerankGate
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.api_documents import api_id, build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+# 检索配置：名称 -> 需要覆盖的settings
+CONFIGURATIONS = {
+    "vector": {"enable_hybrid_retrieval": False, "enable_reranking": False},
+    "vector+rerank": {"enable_hybrid_retrieval": False, "enable_reranking": True},
+    "hybrid+rerank": {"enable_hybrid_retrieval": True, "enable_reranking": True},
+}
+
+# 与基线对比时检查的质量指标（另含全部recall@k）；延迟和吞吐量受机器负载影响，只报告不检查
+QUALITY_METRICS = ("mrr",)
+
+
+class StubReranker(RerankerManager):
+    """确定性的本地重排序器：按查询与API名称、描述的词元重合度打分，不调用重排序API"""
+
+    def __init__(self):
+        super().__init__(cache=None)
+        self.enabled = True
+
+    def rerank_documents(self, query, documents, top_k=None):
+        top_k = top_k or settings.rerank_final_k
+        query_tokens = set(tokenize(query))
+        scored = []
+        for doc in documents:
+            text = f"{doc.metadata.get('name', '')} {doc.metadata.get('description', '')}".strip() or doc.page_content
+            doc_tokens = set(tokenize(text))
+            overlap = len(query_tokens & doc_tokens)
+            scored.append((doc, overlap / (len(query_tokens | doc_tokens) or 1)))
+        # 稳定排序：同分时保持召回顺序
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:top_k]
+
+
+@contextlib.contextmanager
+def override_settings(**values: Any) -> Iterator[None]:
+    """临时覆盖全局配置"""
+    previous = {name: getattr(settings, name) for name in values}
+    for name, value in values.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def groovy_queries(examples: List[Dict[str, Any]], catalog: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """groovy_request_example.json的用例名为"场景 - API名称"，API名称在目录中存在的用例作为标注查询"""
+    ids_by_name = {api["name"]: api_id(api) for api in catalog}
+    queries = []
+    for example in examples:
+        name = example.get("test_case_name", "").rsplit(" - ", 1)[-1].strip()
+        if name in ids_by_name:
+            queries.append({"query": example["request"]["query"], "api_id": ids_by_name[name]})
+    return queries
+
+
+def build_datasets(data_dir: str, synthetic_sizes: Sequence[int], synthetic_queries: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    构建基准数据集：data/api.json（派生查询 + Groovy用例查询）、data/api_test.json（派生查询），
+    以及以data/api.json为前缀的合成目录（从中按固定种子抽样API派生查询）
+    """
+    with open(os.path.join(data_dir, "api.json"), "r", encoding="utf-8") as f:
+        api_catalog = json.load(f)
+    with open(os.path.join(data_dir, "api_test.json"), "r", encoding="utf-8") as f:
+        test_catalog = json.load(f)
+    with open(os.path.join(data_dir, "groovy_request_example.json"), "r", encoding="utf-8") as f:
+        examples = json.load(f)
+
+    datasets = [
+        {
+            "name": "api",
+            "catalog": api_catalog,
+            "queries": derive_queries(api_catalog) + groovy_queries(examples, api_catalog),
+        },
+        {"name": "api_test", "catalog": test_catalog, "queries": derive_queries(test_catalog)},
+    ]
+    for size in synthetic_sizes:
+        catalog = generate_catalog(size, seed=seed, base=api_catalog)
+        sample = random.Random(seed).sample(catalog, min(synthetic_queries, len(catalog)))
+        datasets.append({"name": f"synthetic-{size}", "catalog": catalog, "queries": derive_queries(sample)})
+    return datasets
+
+
+def rank_of(results, expected_id: str) -> Optional[int]:
+    """标注API在检索结果中的名次（从1开始），未命中时为None"""
+    for rank, (doc, _) in enumerate(results, start=1):
+        if doc.metadata.get("api_id") == expected_id:
+            return rank
+    return None
+
+
+def quality_metrics(ranks: Sequence[Optional[int]], ks: Sequence[int]) -> Dict[str, float]:
+    """每个查询只有一个相关API，recall@k即标注API出现在前k个结果中的查询比例"""
+    total = len(ranks) or 1
+    metrics = {
+        f"recall@{k}": round(sum(1 for rank in ranks if rank is not None and rank <= k) / total, 4)
+        for k in ks
+    }
+    metrics["mrr"] = round(sum(1.0 / rank for rank in ranks if rank is not None) / total, 4)
+    return metrics
+
+
+async def measure_throughput(retriever: ApiRetriever, queries: Sequence[str], final_k: int, concurrency: int) -> float:
+    """以给定并发度执行asearch，返回吞吐量（查询/秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query: str):
+        async with semaphore:
+            await retriever.asearch(query, vector_k=settings.rerank_top_k, final_k=final_k)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def run_configuration(vsm: VectorStoreManager, queries: List[Dict[str, str]], ks: Sequence[int], concurrency: int) -> Dict[str, Any]:
+    """在当前settings下逐条检索并计时，然后按并发度测量吞吐量"""
+    retriever = ApiRetriever(vsm, reranker=StubReranker(), gate=RerankGate(enabled=False))
+    final_k = max(ks)
+    ranks, latencies = [], []
+    for item in queries:
+        start = time.perf_counter()
+        results = retriever.search(item["query"], vector_k=settings.rerank_top_k, final_k=final_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranks.append(rank_of(results, item["api_id"]))
+
+    throughput = asyncio.run(measure_throughput(retriever, [item["query"] for item in queries], final_k, concurrency))
+    return {
+        **quality_metrics(ranks, ks),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+        },
+        "throughput_qps": round(throughput, 1),
+        "misses": sorted(item["query"] for item, rank in zip(queries, ranks) if rank is None),
+    }
+
+
+def benchmark_dataset(dataset: Dict[str, Any], ks: Sequence[int], concurrency: int) -> Dict[str, Any]:
+    """为一个数据集构建索引（哈希嵌入，关闭嵌入缓存），依次运行各检索配置"""
+    with tempfile.TemporaryDirectory() as tmp_dir, \
+            override_settings(enable_embedding_cache=False, enable_hybrid_retrieval=True):
+        vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+        start = time.perf_counter()
+        vsm.create_vector_store(build_api_documents(dataset["catalog"]), collection_name="api_docs")
+        index_seconds = time.perf_counter() - start
+
+        configurations = {}
+        for name, overrides in CONFIGURATIONS.items():
+            with override_settings(**overrides):
+                configurations[name] = run_configuration(vsm, dataset["queries"], ks, concurrency)
+
+    return {
+        "apis": len(dataset["catalog"]),
+        "queries": len(dataset["queries"]),
+        "index_seconds": round(index_seconds, 2),
+        "configurations": configurations,
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float) -> List[str]:
+    """对比两份报告的质量指标（recall@k、MRR），返回下降超过tolerance的项"""
+    regressions = []
+    for dataset, result in report["datasets"].items():
+        old_dataset = baseline.get("datasets", {}).get(dataset)
+        if old_dataset is None:
+            continue
+        for config, metrics in result["configurations"].items():
+            old_metrics = old_dataset["configurations"].get(config)
+            if old_metrics is None:
+                continue
+            for metric, value in metrics.items():
+                if not (metric.startswith("recall@") or metric in QUALITY_METRICS) or metric not in old_metrics:
+                    continue
+                if old_metrics[metric] - value > tolerance:
+                    regressions.append(f"{dataset}/{config} {metric}: {old_metrics[metric]} -> {value}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    data_dir: str = "data",
+    synthetic_sizes: Sequence[int] = (1000, 10000),
+    synthetic_queries: int = 200,
+    ks: Sequence[int] = (1, 3, 5, 10),
+    concurrency: int = 8,
+    seed: int = 42
+) -> Dict[str, Any]:
+    """运行全部数据集和检索配置，返回基准报告"""
+    datasets = build_datasets(data_dir, synthetic_sizes, synthetic_queries, seed)
+    return {
+        "commit": _git_commit(),
+        "embedding": "hash",
+        "reranker": "stub",
+        "rerank_top_k": settings.rerank_top_k,
+        "ks": list(ks),
+        "concurrency": concurrency,
+        "datasets": {dataset["name"]: benchmark_dataset(dataset, ks, concurrency) for dataset in datasets},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线检索基准与回归检查")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000], help="合成API目录大小，不传值时跳过合成目录")
+    parser.add_argument("--synthetic-queries", type=int, default=200, help="每个合成目录抽样派生查询的API数量")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="计算recall@k的k值")
+    parser.add_argument("--concurrency", type=int, default=8, help="测量吞吐量时的并发查询数")
+    parser.add_argument("--output", default=os.path.join(settings.output_dir, "bench_retrieval.json"), help="报告输出路径（JSON）")
+    parser.add_argument("--baseline", help="用于对比的历史报告，质量指标下降超过--tolerance时以非零状态退出")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="允许的质量指标下降幅度")
+    args = parser.parse_args()
+
+    logger.remove()
+    report = run_benchmark(
+        synthetic_sizes=args.sizes, synthetic_queries=args.synthetic_queries,
+        ks=sorted(set(args.k)), concurrency=args.concurrency
+    )
+
+    for dataset, result in report["datasets"].items():
+        print(f"\n{dataset}: {result['apis']}个API，{result['queries']}个查询，建索引 {result['index_seconds']}s")
+        for config, metrics in result["configurations"].items():
+            recalls = "  ".join(f"{key}={value:.3f}" for key, value in metrics.items() if key.startswith("recall@"))
+            print(f"  {config:<14} {recalls}  MRR={metrics['mrr']:.3f}  "
+                  f"p50={metrics['latency_ms']['p50']:.2f}ms  p95={metrics['latency_ms']['p95']:.2f}ms  "
+                  f"吞吐量={metrics['throughput_qps']:.1f} qps")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+    print(f"\n基准报告已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        if regressions:
+            print("检索质量回归:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("与基线相比检索质量没有回归")
+
+
+if __name__ == "__main__":
+    main()
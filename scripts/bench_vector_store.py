@@ -0,0 +1,89 @@
+"""
+向量检索后端基准
+Compares per-query latency of the Chroma path and the in-process NumPy index
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.synthetic_catalog import generate_catalog
+from scripts.vectorization import build_api_documents
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.numpy_store import NumpyVectorStore
+from src.vectorize.vectorizer import VectorStoreManager
+
+QUERIES = [
+    "帮我解锁用户 a@b.com",
+    "查询项目 p_abc 的详情",
+    "帮我提交一个请假申请。",
+    "导出上个月的考勤报表",
+    "审批张三的报销单",
+    "查询会议室预订列表",
+    "统计本季度的合同数据",
+    "订阅工单变更通知",
+]
+
+
+def _timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量检索后端基准")
+    parser.add_argument("--size", type=int, default=3000, help="合成API目录大小")
+    parser.add_argument("--k", type=int, default=10, help="每个查询返回的文档数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每组测量的重复次数")
+    args = parser.parse_args()
+
+    logger.remove()
+    with open("data/api.json", "r", encoding="utf-8") as f:
+        catalog = generate_catalog(args.size, base=json.load(f))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 嵌入缓存保证两条路径的查询嵌入开销一致，测量的只是检索本身
+        vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+        chroma = vsm.create_vector_store(build_api_documents(catalog), collection_name="api_docs")
+
+        start = time.perf_counter()
+        index = NumpyVectorStore.from_chroma(chroma, vsm.embeddings)
+        load_ms = (time.perf_counter() - start) * 1000
+        query_embeddings = vsm.embeddings.embed_documents(QUERIES)
+
+        chroma_single = _timed(lambda: [chroma.similarity_search_with_score(q, k=args.k) for q in QUERIES], args.repeat)
+        numpy_single = _timed(lambda: [index.similarity_search_with_score(q, k=args.k) for q in QUERIES], args.repeat)
+        chroma_batch = _timed(lambda: chroma._collection.query(
+            query_embeddings=query_embeddings, n_results=args.k, include=["documents", "metadatas", "distances"]
+        ), args.repeat)
+        numpy_batch = _timed(lambda: index.similarity_search_by_vectors_with_score(query_embeddings, k=args.k), args.repeat)
+
+        overlap = []
+        for query in QUERIES:
+            expected = {d.metadata["name"] for d, _ in chroma.similarity_search_with_score(query, k=args.k)}
+            actual = {d.metadata["name"] for d, _ in index.similarity_search_with_score(query, k=args.k)}
+            overlap.append(len(expected & actual) / args.k)
+
+    n = len(QUERIES)
+    print(f"API目录大小: {len(catalog)}，k={args.k}，查询数: {n}，NumPy索引加载耗时: {load_ms:.1f}ms")
+    print(f"单查询  Chroma: {chroma_single / n:.3f}ms/查询  NumPy: {numpy_single / n:.3f}ms/查询  "
+          f"加速: {chroma_single / numpy_single:.1f}x")
+    print(f"批量查询 Chroma: {chroma_batch:.3f}ms/批  NumPy: {numpy_batch:.3f}ms/批  "
+          f"加速: {chroma_batch / numpy_batch:.1f}x")
+    print(f"top-{args.k}结果与Chroma的平均重合率: {statistics.mean(overlap):.1%}")
+
+
+if __name__ == "__main__":
+    main()
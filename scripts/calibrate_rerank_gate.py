@@ -0,0 +1,129 @@
+"""
+重排序置信度门控阈值校准
+Fits rerank_gate_margin on a labeled query set so that skipping the reranker keeps a target top-1 accuracy
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from loguru import logger
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.retrieval.rerank_gate import exact_name_match, fit_margin_threshold, vector_margin
+from src.vectorize.api_documents import api_id, build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+
+def derive_queries(catalog):
+    """没有人工标注集时，用每个API的名称、描述及其口语化改写作为查询，标注为该API本身"""
+    queries = []
+    for api in catalog:
+        label = api_id(api)
+        description = api.get("description", "").rstrip("。")
+        queries.append({"query": api["name"], "api_id": label})
+        queries.append({"query": f"帮我{api['name']}", "api_id": label})
+        if description:
+            queries.append({"query": description, "api_id": label})
+            queries.append({"query": f"我想{description}", "api_id": label})
+    return queries
+
+
+def collect_samples(vsm, queries, k):
+    """对每个查询记录向量距离差、向量top-1是否正确、API名称精确匹配结果"""
+    samples = []
+    for item in queries:
+        recalled = vsm.similarity_search_with_score(item["query"], k=k)
+        if not recalled:
+            continue
+        candidates = [doc for doc, _ in recalled] + [doc for doc, _ in vsm.lexical_search(item["query"], k=k)]
+        matched = exact_name_match(item["query"], candidates)
+        samples.append({
+            "query": item["query"],
+            "api_id": item["api_id"],
+            "margin": vector_margin(recalled),
+            "vector_correct": recalled[0][0].metadata.get("api_id") == item["api_id"],
+            "exact_name": matched.metadata.get("api_id") if matched is not None else None,
+        })
+    return samples
+
+
+def evaluate(samples, threshold):
+    """门控在样本集上的跳过率和被跳过查询的top-1准确率"""
+    skipped = correct = 0
+    for sample in samples:
+        if sample["exact_name"] is not None:
+            skipped += 1
+            correct += int(sample["exact_name"] == sample["api_id"])
+        elif threshold is not None and sample["margin"] >= threshold:
+            skipped += 1
+            correct += int(sample["vector_correct"])
+    return {
+        "skip_rate": skipped / len(samples) if samples else 0.0,
+        "skipped_accuracy": correct / skipped if skipped else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重排序置信度门控阈值校准")
+    parser.add_argument("--api-json", default="data/api_test.json", help="API定义文件路径")
+    parser.add_argument("--queries", help="标注查询集JSON（[{\"query\": ..., \"api_id\": ...}]），缺省时由API定义派生")
+    parser.add_argument("--target-accuracy", type=float, default=0.98, help="跳过重排序的查询需要达到的top-1准确率")
+    parser.add_argument("--embedding", choices=["dashscope", "openai", "hash"], default="dashscope",
+                        help="嵌入模型，应与线上一致；hash仅用于离线演示")
+    parser.add_argument("--k", type=int, default=10, help="每个查询召回的文档数量")
+    parser.add_argument("--output", help="校准报告输出路径（JSON）")
+    args = parser.parse_args()
+
+    logger.remove()
+    with open(args.api_json, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = json.load(f)
+    else:
+        queries = derive_queries(catalog)
+
+    if args.embedding == "hash":
+        from src.utils.hash_embeddings import HashEmbeddings
+        embeddings = HashEmbeddings()
+    else:
+        from src.utils.llm_factory import LLMFactory
+        embeddings = LLMFactory.create_embeddings(args.embedding)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vsm = VectorStoreManager(embeddings=embeddings, persist_directory=tmp_dir)
+        vsm.create_vector_store(build_api_documents(catalog), collection_name="api_docs")
+        samples = collect_samples(vsm, queries, args.k)
+
+    threshold = fit_margin_threshold([(s["margin"], s["vector_correct"]) for s in samples], args.target_accuracy)
+    report = {
+        "api_json": args.api_json,
+        "embedding": args.embedding,
+        "queries": len(samples),
+        "target_accuracy": args.target_accuracy,
+        "vector_top1_accuracy": sum(s["vector_correct"] for s in samples) / len(samples) if samples else 0.0,
+        "rerank_gate_margin": threshold,
+        **evaluate(samples, threshold),
+    }
+
+    print(f"查询数: {report['queries']}，向量top-1准确率: {report['vector_top1_accuracy']:.1%}")
+    if threshold is None:
+        print(f"没有距离差阈值能达到目标准确率 {args.target_accuracy:.1%}，建议只保留API名称精确匹配门控")
+    else:
+        print(f"建议配置: RERANK_GATE_MARGIN={threshold:.4f}")
+    accuracy = report["skipped_accuracy"]
+    print(f"跳过重排序比例: {report['skip_rate']:.1%}，被跳过查询的top-1准确率: "
+          f"{'-' if accuracy is None else f'{accuracy:.1%}'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({**report, "samples": samples}, f, ensure_ascii=False, indent=2)
+        print(f"校准报告已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+本地模型量化/ONNX精度漂移检查
+Compares fp32 PyTorch scores with a quantized / ONNX backend on the data/api.json catalog
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.vectorize.api_documents import build_api_documents
+
+
+def _queries(catalog):
+    """用每个API的名称和描述作为查询，期望的top-1即为该API本身"""
+    return [(api["name"], i) for i, api in enumerate(catalog)] + [(api["description"], i) for i, api in enumerate(catalog)]
+
+
+def _timed(func, items):
+    latencies, outputs = [], []
+    for item in items:
+        start = time.perf_counter()
+        outputs.append(func(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return outputs, statistics.median(latencies)
+
+
+def check_embeddings(model_name, backend, docs, queries):
+    from src.utils.qwen_embeddings import QwenSentenceTransformerEmbeddings
+
+    results = {}
+    for name in ("torch", backend):
+        embeddings = QwenSentenceTransformerEmbeddings(model_name, backend=name)
+        doc_vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]))
+        query_vectors, latency = _timed(embeddings.embed_query, [query for query, _ in queries])
+        results[name] = (doc_vectors, np.asarray(query_vectors), latency)
+
+    (ref_docs, ref_queries, ref_latency), (docs_b, queries_b, latency_b) = results["torch"], results[backend]
+    cosine = np.sum(ref_queries * queries_b, axis=1) / (
+        np.linalg.norm(ref_queries, axis=1) * np.linalg.norm(queries_b, axis=1)
+    )
+    top1_ref = np.argmax(ref_queries @ ref_docs.T, axis=1)
+    top1_b = np.argmax(queries_b @ docs_b.T, axis=1)
+    return {
+        "min_cosine_to_fp32": float(cosine.min()),
+        "top1_agreement": float(np.mean(top1_ref == top1_b)),
+        "fp32_ms_per_query": ref_latency,
+        "backend_ms_per_query": latency_b,
+        "speedup": ref_latency / latency_b,
+    }
+
+
+def check_reranker(model_name, backend, docs, queries):
+    from src.utils.qwen_reranker import RerankerManager
+
+    pairs = [(doc, 0.0) for doc in docs]
+    results = {}
+    for name in ("torch", backend):
+        reranker = RerankerManager(model_name, use_cuda=False, backend=name)
+
+        def score(query):
+            ranked = reranker.rerank_with_scores(query, pairs, final_k=len(pairs))
+            by_doc = {id(doc): rerank_score for doc, _, rerank_score in ranked}
+            return [by_doc[id(doc)] for doc in docs]
+
+        results[name] = _timed(score, [query for query, _ in queries])
+
+    (ref_scores, ref_latency), (scores_b, latency_b) = results["torch"], results[backend]
+    ref_scores, scores_b = np.asarray(ref_scores), np.asarray(scores_b)
+    return {
+        "max_abs_score_drift": float(np.max(np.abs(ref_scores - scores_b))),
+        "mean_abs_score_drift": float(np.mean(np.abs(ref_scores - scores_b))),
+        "top1_agreement": float(np.mean(np.argmax(ref_scores, axis=1) == np.argmax(scores_b, axis=1))),
+        "fp32_ms_per_query": ref_latency,
+        "backend_ms_per_query": latency_b,
+        "speedup": ref_latency / latency_b,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模型量化/ONNX精度漂移检查")
+    parser.add_argument("--model", choices=["embedding", "reranker"], required=True, help="检查的模型")
+    parser.add_argument("--backend", choices=["torch-int8", "onnx", "onnx-int8"], required=True, help="对比的推理后端")
+    parser.add_argument("--model-name", default=None, help="模型名称，默认使用Qwen3 0.6B")
+    parser.add_argument("--max-score-drift", type=float, default=0.05, help="重排序分数允许的最大绝对漂移")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="嵌入向量与fp32的最小余弦相似度")
+    parser.add_argument("--min-top1-agreement", type=float, default=0.95, help="top-1结果与fp32一致的最低比例")
+    args = parser.parse_args()
+
+    with open("data/api.json", "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    docs = build_api_documents(catalog)
+    queries = _queries(catalog)
+
+    if args.model == "embedding":
+        report = check_embeddings(args.model_name or "Qwen/Qwen3-Embedding-0.6B", args.backend, docs, queries)
+        passed = report["min_cosine_to_fp32"] >= args.min_cosine
+    else:
+        report = check_reranker(args.model_name or "Qwen/Qwen3-Reranker-0.6B", args.backend, docs, queries)
+        passed = report["max_abs_score_drift"] <= args.max_score_drift
+    passed = passed and report["top1_agreement"] >= args.min_top1_agreement
+
+    print(json.dumps({"model": args.model, "backend": args.backend, "queries": len(queries), **report},
+                     ensure_ascii=False, indent=2))
+    print("精度漂移检查通过" if passed else "精度漂移超出阈值")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+服务压测
+Drives a running service with concurrent requests and reports latency percentiles and throughput per concurrency level
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+import httpx
+import numpy as np
+
+DEFAULT_QUERIES = [
+    "帮我申请请假和加班",
+    "我要请假，身体不适",
+    "提交加班申请",
+    "帮我解锁用户 a@b.com",
+    "查询项目 p_abc 的详情",
+    "查询用户 s_123 的状态",
+]
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, queries: List[str], total: int, concurrency: int) -> Dict[str, Any]:
+    """以给定并发度发出total个请求，返回延迟分位数、吞吐量和错误数"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json={"query": queries[index % len(queries)]})
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 1),
+            "p95": round(float(np.percentile(latencies, 95)), 1),
+            "p99": round(float(np.percentile(latencies, 99)), 1),
+            "mean": round(statistics.mean(latencies), 1),
+        },
+    }
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        results = []
+        for concurrency in args.concurrency:
+            result = await run_level(client, args.endpoint, DEFAULT_QUERIES, args.requests, concurrency)
+            results.append(result)
+            latency = result["latency_ms"]
+            print(f"{args.endpoint} 并发度={concurrency:<3} 吞吐量={result['throughput_rps']:.1f} req/s  "
+                  f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  错误={result['errors']}")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务压测（配合LLM_PROVIDER=stub可在本地离线运行）")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--endpoint", default="/plan", help="压测的接口，请求体为{\"query\": ...}")
+    parser.add_argument("--requests", type=int, default=200, help="每个并发度发出的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="依次测量的并发度")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时时间（秒）")
+    parser.add_argument("--output", help="结果输出路径（JSON）")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"endpoint": args.endpoint, "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"压测结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+合成API目录生成器
+Generates large, deterministic synthetic API catalogs in the data/api.json format
+"""
+
+import argparse
+import json
+import random
+from typing import Any, Dict, List
+
+DOMAINS = [
+    ("员工", "employees"), ("请假", "leaves"), ("加班", "overtimes"), ("项目", "projects"),
+    ("用户", "users"), ("部门", "departments"), ("任务", "tasks"), ("报销", "expenses"),
+    ("合同", "contracts"), ("会议室", "meeting-rooms"), ("资产", "assets"), ("考勤", "attendances"),
+    ("薪资", "payrolls"), ("招聘", "recruitments"), ("培训", "trainings"), ("采购", "purchases"),
+    ("发票", "invoices"), ("客户", "customers"), ("工单", "tickets"), ("通知", "notifications"),
+]
+
+SUB_RESOURCES = [
+    ("", ""), ("附件", "attachments"), ("评论", "comments"), ("历史记录", "history"),
+    ("标签", "tags"), ("审批记录", "approvals"),
+]
+
+ACTIONS = [
+    ("查询{d}列表", "分页查询{d}列表，支持按关键字过滤。", "GET", ""),
+    ("获取{d}详情", "根据ID获取{d}的详细信息。", "GET", "/{{{id}}}"),
+    ("创建{d}", "创建一条新的{d}记录。", "POST", ""),
+    ("更新{d}", "根据ID更新{d}的信息。", "PUT", "/{{{id}}}"),
+    ("删除{d}", "根据ID删除{d}记录。", "DELETE", "/{{{id}}}"),
+    ("审批{d}", "对{d}发起审批或给出审批结论。", "POST", "/{{{id}}}/approve"),
+    ("导出{d}报表", "按时间范围导出{d}报表。", "GET", "/export"),
+    ("统计{d}数据", "按维度统计{d}数据。", "GET", "/stats"),
+    ("批量导入{d}", "通过文件批量导入{d}。", "POST", "/import"),
+    ("订阅{d}变更", "订阅{d}的变更事件通知。", "POST", "/subscriptions"),
+]
+
+EXTRA_PARAMS = [
+    {"name": "keyword", "in": "query", "description": "搜索关键字", "required": False, "type": "string"},
+    {"name": "pageSize", "in": "query", "description": "每页条数", "required": False, "type": "number"},
+    {"name": "fromDate", "in": "query", "description": "开始日期 (YYYY-MM-DD)", "required": False, "type": "string"},
+    {"name": "toDate", "in": "query", "description": "结束日期 (YYYY-MM-DD)", "required": False, "type": "string"},
+    {"name": "status", "in": "query", "description": "状态 (ACTIVE, CLOSED)", "required": False, "type": "string"},
+    {"name": "ownerEmail", "in": "body", "description": "负责人邮箱地址", "required": False, "type": "string"},
+]
+
+
+def _id_param(resource: str) -> str:
+    singular = resource[:-1] if resource.endswith("s") else resource
+    return f"{_camel(singular)}Id"
+
+
+def _camel(resource: str) -> str:
+    head, *rest = resource.replace("-", " ").split()
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def generate_catalog(size: int, seed: int = 42, base: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    生成一个包含size个API的合成目录
+
+    Args:
+        size: API数量
+        seed: 随机种子，相同种子总是生成相同的目录
+        base: 放在目录最前面的真实API定义（例如data/api.json），计入size
+
+    Returns:
+        List[Dict[str, Any]]: 与data/api.json格式一致的API定义列表
+    """
+    rng = random.Random(seed)
+    catalog = [dict(api) for api in (base or [])]
+    names = {api["name"] for api in catalog}
+    routes = {(api["method"], api["endpoint"]) for api in catalog}
+
+    version = 1
+    while len(catalog) < size:
+        for domain, resource in DOMAINS:
+            for sub_name, sub_resource in SUB_RESOURCES:
+                for action, description, method, path in ACTIONS:
+                    if len(catalog) >= size:
+                        return catalog
+                    subject = f"{domain}{sub_name}"
+                    name = action.format(d=subject) + (f"(v{version})" if version > 1 else "")
+                    endpoint = f"/api/v{version}/{resource}"
+                    if sub_resource:
+                        endpoint += f"/{{{_id_param(resource)}}}/{sub_resource}"
+                    endpoint += path.format(id=_id_param(sub_resource or resource))
+                    if name in names or (method, endpoint) in routes:
+                        continue
+                    names.add(name)
+                    routes.add((method, endpoint))
+
+                    params = [
+                        {"name": placeholder, "in": "path", "description": f"{subject}的唯一ID",
+                         "required": True, "type": "string"}
+                        for placeholder in _placeholders(endpoint)
+                    ]
+                    params.extend(rng.sample(EXTRA_PARAMS, rng.randint(0, 3)))
+
+                    catalog.append({
+                        "name": name,
+                        "description": description.format(d=subject),
+                        "method": method,
+                        "endpoint": endpoint,
+                        "params": params,
+                        "response": {"code": 0, "data": f"{subject}数据"}
+                    })
+        version += 1
+    return catalog
+
+
+def _placeholders(endpoint: str) -> List[str]:
+    placeholders = []
+    for segment in endpoint.split("/"):
+        if segment.startswith("{") and segment.endswith("}"):
+            placeholders.append(segment[1:-1])
+    return placeholders
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成API目录")
+    parser.add_argument("--size", type=int, default=1000, help="API数量")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--output", default="data/synthetic_api_1k.json", help="输出文件路径")
+    parser.add_argument("--with-base", action="store_true", help="将data/api.json中的真实API放在目录最前面")
+    args = parser.parse_args()
+
+    base = None
+    if args.with_base:
+        with open("data/api.json", "r", encoding="utf-8") as f:
+            base = json.load(f)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(generate_catalog(args.size, args.seed, base), f, ensure_ascii=False, indent=2)
+    print(f"已生成 {args.size} 个API: {args.output}")
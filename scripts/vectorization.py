@@ -1,69 +1,171 @@
 from langchain_core.documents import Document
+import argparse
 import json
 import sys
 import os
+from collections import Counter
+from typing import Dict, List, Optional
 from loguru import logger
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.index_manager import write_active_collection
 from src.vectorize.vectorizer import VectorStoreManager
 from src.utils.llm_factory import LLMFactory
 
-def vectorize_apis(vsm: VectorStoreManager):
-    """读取api.json，向量化并存储单个API的信息"""
+MANIFEST_VERSION = 1
+
+
+def manifest_path(vsm: VectorStoreManager, collection_name: str) -> str:
+    return os.path.join(vsm.persist_directory, f"{collection_name}.manifest.json")
+
+
+def load_manifest(path: str) -> Optional[dict]:
+    """读取索引清单，不存在或格式不兼容时返回None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"索引清单读取失败，将全量重建: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path: str, manifest: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def diff_documents(docs: List[Document], indexed: Dict[str, str]) -> dict:
+    """
+    对比当前文档与清单中已索引的内容哈希
+
+    Returns:
+        dict: added/changed为需要嵌入的文档列表，removed/unchanged为API ID列表
+    """
+    added, changed, unchanged = [], [], []
+    current_ids = set()
+    for doc in docs:
+        doc_id = doc.metadata["api_id"]
+        current_ids.add(doc_id)
+        if doc_id not in indexed:
+            added.append(doc)
+        elif indexed[doc_id] != doc.metadata["content_hash"]:
+            changed.append(doc)
+        else:
+            unchanged.append(doc_id)
+    removed = sorted(doc_id for doc_id in indexed if doc_id not in current_ids)
+    return {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
+
+
+def _embedding_model_name(vsm: VectorStoreManager) -> str:
+    return getattr(vsm.embeddings, "model_name", None) or type(vsm.embeddings).__name__
+
+
+def vectorize_apis(
+    vsm: VectorStoreManager,
+    api_json_path: str = "data/api.json",
+    collection_name: str = "api_docs",
+    dry_run: bool = False,
+    full: bool = False,
+    batch_size: int = 32
+) -> dict:
+    """
+    读取api.json，增量向量化并存储单个API的信息
+
+    每个API以稳定ID作为Chroma文档ID，只有新增或内容哈希变化的API会被重新嵌入并upsert，
+    api.json中已删除的API会从集合中删除。索引内容记录在向量存储目录下的清单文件中。
+    没有清单（首次运行或旧版本全量构建）、嵌入模型变化或指定full时全量重建。
+
+    Args:
+        vsm: 向量存储管理器
+        api_json_path: API定义文件路径
+        collection_name: 集合名称
+        dry_run: 只报告差异，不做任何修改
+        full: 强制全量重建
+        batch_size: 每批嵌入和upsert的文档数量
+
+    Returns:
+        dict: 各类变更的API ID列表
+    """
     logger.info("正在处理单个API的向量化...")
-    with open("data/api.json", "r", encoding="utf-8") as f:
+    with open(api_json_path, "r", encoding="utf-8") as f:
         api_docs_data = json.load(f)
 
-    docs = []
-    markdown_template = """
-### API名称: {name}
-
-**功能描述:**
-{description}
-
-**请求详情:**
-- **方法:** `{method}`
-- **路径:** `{endpoint}`
-
-**参数列表:**
-{params}
-
-**预期响应:**
-{response}
-"""
-
-    for api in api_docs_data:
-        param_list = [f"- **`{p.get('name')}`** (类型: {p.get('type')}, {'必需' if p.get('required') else '可选'}): {p.get('description')}" for p in api.get("params", [])]
-        param_str = "\n".join(param_list) if param_list else "无"
-        response_str = json.dumps(api.get("response", {}), ensure_ascii=False, indent=2)
-
-        content = markdown_template.format(
-            name=api.get("name"),
-            description=api.get("description"),
-            method=api.get("method"),
-            endpoint=api.get("endpoint"),
-            params=param_str,
-            response=response_str
-        )
-        metadata = {
-            "name": api.get("name"),
-            "description": api.get("description"),
-            "method": api.get("method"),
-            "endpoint": api.get("endpoint"),
-            "params_json": json.dumps(api.get("params", []), ensure_ascii=False)
-        }
-        docs.append(Document(page_content=content, metadata=metadata))
-    
-    vsm.create_vector_store(docs, collection_name='api_docs')
-    logger.info("单个API向量库[api_docs]创建/更新成功。")
+    docs = build_api_documents(api_docs_data)
+    duplicates = sorted(doc_id for doc_id, count in Counter(doc.metadata["api_id"] for doc in docs).items() if count > 1)
+    if duplicates:
+        raise ValueError(f"API ID重复，请在api.json中为这些API指定唯一的id字段: {duplicates}")
+
+    path = manifest_path(vsm, collection_name)
+    manifest = load_manifest(path)
+    model_name = _embedding_model_name(vsm)
+    rebuild = full or manifest is None or manifest.get("embedding_model") != model_name
+    indexed = {} if rebuild else manifest.get("entries", {})
+    diff = diff_documents(docs, indexed)
+    report = {
+        "rebuild": rebuild,
+        "added": [doc.metadata["api_id"] for doc in diff["added"]],
+        "changed": [doc.metadata["api_id"] for doc in diff["changed"]],
+        "removed": diff["removed"],
+        "unchanged": diff["unchanged"],
+    }
+    logger.info(
+        f"向量化差异{'（全量重建）' if rebuild else ''}: 新增 {len(report['added'])}，"
+        f"修改 {len(report['changed'])}，删除 {len(report['removed'])}，未变化 {len(report['unchanged'])}"
+    )
+    if dry_run:
+        return report
+
+    if rebuild:
+        vsm.clear_collection(collection_name)
+    vsm.load_vector_store(collection_name=collection_name)
+    if vsm.vector_store is None:
+        raise RuntimeError(f"无法加载向量集合: {collection_name}")
+
+    if diff["removed"]:
+        vsm.delete_documents(diff["removed"])
+    pending = diff["added"] + diff["changed"]
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        vsm.add_documents(batch, ids=[doc.metadata["api_id"] for doc in batch])
+        logger.info(f"已嵌入并写入 {min(start + batch_size, len(pending))}/{len(pending)} 个API")
+
+    # BM25索引在向量化时构建并持久化，服务启动时直接加载
+    vsm.build_lexical_index()
+    save_manifest(path, {
+        "version": MANIFEST_VERSION,
+        "collection": collection_name,
+        "embedding_model": model_name,
+        "entries": {doc.metadata["api_id"]: doc.metadata["content_hash"] for doc in docs},
+    })
+    # 服务重启后加载本集合，而不是之前热切换产生的旁路集合
+    write_active_collection(vsm.persist_directory, collection_name, collection_name)
+    logger.info(f"单个API向量库[{collection_name}]更新成功。")
+    return report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API向量化（默认增量更新）")
+    parser.add_argument("--api-json", default="data/api.json", help="API定义文件路径")
+    parser.add_argument("--dry-run", action="store_true", help="只报告需要新增/修改/删除的API，不做修改")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全量重建集合")
+    parser.add_argument("--batch-size", type=int, default=32, help="每批嵌入和写入的API数量")
+    args = parser.parse_args()
+
     # 初始化向量存储管理器
-    embeddings = LLMFactory.create_embeddings(provider='dashscope')
+    embeddings = LLMFactory.create_embeddings()
     vsm = VectorStoreManager(embeddings=embeddings)
 
     # 执行API向量化流程
-    vectorize_apis(vsm)
+    report = vectorize_apis(vsm, api_json_path=args.api_json, dry_run=args.dry_run, full=args.full, batch_size=args.batch_size)
+    if args.dry_run:
+        print(json.dumps({key: value for key, value in report.items() if key != "unchanged"}, ensure_ascii=False, indent=2))
 
     logger.info("\n所有向量化任务完成。")
\ No newline at end of file
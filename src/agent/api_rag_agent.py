@@ -1,6 +1,7 @@
+import asyncio
 import json
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -10,16 +11,44 @@ from loguru import logger
 from src.vectorize.vectorizer import VectorStoreManager
 from src.utils.llm_factory import LLMFactory
 from src.retrieval.api_retriever import ApiRetriever # Updated import
+from src.agent.api_schema import ApiSchema, ApiSchemaRegistry
+from src.utils.tracing import tracer
+from config.settings import settings
 
 class ApiRagAgent:
-    def __init__(self):
-        self.embeddings = LLMFactory.create_embeddings(provider='dashscope')
-        self.vsm = VectorStoreManager(embeddings=self.embeddings)
-        self.vsm.load_vector_store(collection_name="api_docs")
+    def __init__(
+        self,
+        vector_store_manager: Optional[VectorStoreManager] = None,
+        llm: Optional[Any] = None,
+        schema_registry: Optional[ApiSchemaRegistry] = None
+    ):
+        """
+        Args:
+            vector_store_manager: 已加载'api_docs'集合的向量存储管理器，为空时按默认配置创建。
+            llm: 参数填充使用的大模型，为空时按默认配置创建。
+            schema_registry: 由api.json预编译的API参数Schema注册表，为空时从集合元数据构建。
+        """
+        if vector_store_manager is None:
+            vector_store_manager = VectorStoreManager(embeddings=LLMFactory.create_embeddings())
+            vector_store_manager.load_vector_store(collection_name="api_docs")
+        self.vsm = vector_store_manager
+        # 与向量存储共用同一个（带缓存的）嵌入模型
+        self.embeddings = vector_store_manager.embeddings
         self.retriever = ApiRetriever(self.vsm) # Use the new ApiRetriever
-        self.llm = LLMFactory.create_llm(provider='dashscope')
+        self.llm = llm or LLMFactory.create_llm()
         self.param_fill_prompt = self._create_param_fill_prompt()
         self.api_chain = self.param_fill_prompt | self.llm | StrOutputParser()
+        # 每个API的参数定义、路径模板和规则提取器在索引加载时编译一次，请求时只做字典查找
+        self.schemas = schema_registry if schema_registry is not None else self._load_schema_registry()
+        logger.debug(f"已预编译 {len(self.schemas)} 个API的参数Schema")
+
+    def _load_schema_registry(self) -> ApiSchemaRegistry:
+        """从已加载的集合中读取所有API的元数据并编译参数Schema"""
+        try:
+            data = self.vsm.vector_store._collection.get(include=["metadatas"])
+        except Exception:
+            return ApiSchemaRegistry()
+        return ApiSchemaRegistry.from_metadatas(data.get("metadatas") or [])
 
     def _create_param_fill_prompt(self) -> ChatPromptTemplate:
         system_template = """
@@ -43,65 +72,164 @@ class ApiRagAgent:
             return None
         
         top_doc, score = retrieved_results[0]
-        logger.info(f"检索到最相关的API: '{top_doc.metadata.get('name')}'，分数为: {score:.4f}")
+        logger.info(
+            f"检索到最相关的API: '{top_doc.metadata.get('name')}'，"
+            f"分数为: {score:.4f}（{top_doc.metadata.get('score_source')}）"
+        )
+        return top_doc
+
+    async def _aget_api_doc_from_retrieval(self, query: str) -> Document | None:
+        """_get_api_doc_from_retrieval的异步版本"""
+        logger.debug(f"使用ApiRetriever异步检索与查询 '{query}' 相关的API...")
+        retrieved_results = await self.retriever.asearch(query=query, final_k=1)
+        if not retrieved_results:
+            logger.warning("ApiRetriever未能检索到任何文档。")
+            return None
+
+        top_doc, score = retrieved_results[0]
+        logger.info(
+            f"检索到最相关的API: '{top_doc.metadata.get('name')}'，"
+            f"分数为: {score:.4f}（{top_doc.metadata.get('score_source')}）"
+        )
         return top_doc
 
     def _fill_parameters(self, api_doc: Document, user_query: str) -> Dict[str, Any]:
-        """根据API文档和用户查询，填充参数并构建最终的API调用信息。"""
-        api_metadata = api_doc.metadata
-        api_params_def = json.loads(api_metadata.get("params_json", "[]"))
+        """
+        根据API文档和用户查询，填充参数并构建最终的API调用信息。
+
+        先用规则提取器提取日期、邮箱、ID、枚举等参数，大模型只负责规则无法确定的参数；
+        必填参数都已由规则提取时不调用大模型，未提取的可选参数记为missing；
+        API没有必填参数时，只要还有参数未提取仍交给大模型填充。
+        """
+        schema = self.schemas.for_metadata(api_doc.metadata)
 
         # 如果没有参数，直接返回组装好的结果
-        if not api_params_def:
-            return {
-                "description": api_metadata.get("description"),
-                "method": api_metadata.get("method"),
-                "url": api_metadata.get("endpoint", "")
-            }
+        if not schema.params:
+            return self._assemble_api_call(schema, {})
+
+        with tracer.span("param_fill", api=schema.name) as span:
+            extracted, pending = schema.extractor.extract(user_query)
+            llm_output, pending = self._skip_llm_output(schema, extracted, pending)
+            span.set("rule_params", len(extracted))
+            span.set("llm_params", len(pending))
+            if pending:
+                raw_text = self.api_chain.invoke(
+                    self._build_chain_inputs(schema, pending, user_query), config=tracer.llm_config(span)
+                )
+                llm_output = self._parse_llm_output(raw_text)
+        return self._assemble_api_call(schema, llm_output, extracted)
+
+    async def _afill_parameters(self, api_doc: Document, user_query: str) -> Dict[str, Any]:
+        """_fill_parameters的异步版本，通过api_chain.ainvoke调用大模型。"""
+        schema = self.schemas.for_metadata(api_doc.metadata)
+
+        if not schema.params:
+            return self._assemble_api_call(schema, {})
+
+        with tracer.span("param_fill", api=schema.name) as span:
+            extracted, pending = schema.extractor.extract(user_query)
+            llm_output, pending = self._skip_llm_output(schema, extracted, pending)
+            span.set("rule_params", len(extracted))
+            span.set("llm_params", len(pending))
+            if pending:
+                raw_text = await self.api_chain.ainvoke(
+                    self._build_chain_inputs(schema, pending, user_query), config=tracer.llm_config(span)
+                )
+                llm_output = self._parse_llm_output(raw_text)
+        return self._assemble_api_call(schema, llm_output, extracted)
+
+    @staticmethod
+    def _skip_llm_output(
+        schema: ApiSchema,
+        extracted: Dict[str, Any],
+        pending: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        判断规则提取后是否还需要调用大模型。
 
+        Returns:
+            (预置的参数输出, 需要大模型填充的参数定义)。必填参数都已提取时第二项为空，
+            未提取的可选参数在第一项中记为__MISSING__；否则第一项为空，第二项原样返回pending。
+        """
+        if not pending or not schema.required or schema.required - extracted.keys():
+            return {}, pending
+        return {param["name"]: "__MISSING__" for param in pending}, []
+
+    @staticmethod
+    def _build_chain_inputs(schema: ApiSchema, api_params_def: List[Dict[str, Any]], user_query: str) -> Dict[str, str]:
+        """构建参数填充Chain的输入。"""
         api_doc_for_prompt = json.dumps({
-            "name": api_metadata["name"],
-            "description": api_metadata["description"],
+            "name": schema.name,
+            "description": schema.description,
             "params": api_params_def
         }, ensure_ascii=False)
 
-        chain_inputs = {
+        return {
             "api_doc": api_doc_for_prompt,
             "user_query": user_query,
         }
-        
-        raw_text = self.api_chain.invoke(chain_inputs)
+
+    @staticmethod
+    def _parse_llm_output(raw_text: str) -> Dict[str, Any]:
+        """从大模型输出中提取参数JSON。"""
         match = re.search(r'\{.*\}', raw_text, re.DOTALL)
-        llm_output = json.loads(match.group(0)) if match else {}
+        return json.loads(match.group(0)) if match else {}
+
+    @staticmethod
+    def _assemble_api_call(
+        schema: ApiSchema,
+        llm_output: Dict[str, Any],
+        extracted: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        将API元数据和已填充的参数组装成最终的API调用信息。
+
+        extracted为规则提取到的参数值，优先于大模型输出；结果中的param_sources记录每个参数的来源
+        （rule/llm/missing）。
+        """
+        # 如果没有参数，直接返回组装好的结果
+        if not schema.params:
+            return {
+                "description": schema.description,
+                "method": schema.method,
+                "url": schema.endpoint
+            }
 
         final_body = {}
         missing_params = []
-        final_url = api_metadata.get("endpoint", "")
-
-        all_params = {p["name"]: p for p in api_params_def}
+        path_values = {}
+        extracted = extracted or {}
+        param_sources = {}
 
         # 填充路径和查询参数
-        for name, value in llm_output.items():
-            if f'{{{name}}}' in final_url:
-                if value and value != "__MISSING__":
-                    final_url = final_url.replace(f'{{{name}}}', str(value))
+        for name, value in {**llm_output, **extracted}.items():
+            filled = bool(value) and value != "__MISSING__"
+            if filled:
+                param_sources[name] = "rule" if name in extracted else "llm"
+            else:
+                param_sources[name] = "missing"
+            if name in schema.placeholders:
+                if filled:
+                    path_values[name] = value
                 else:
-                    missing_params.append(all_params[name])
+                    missing_params.append(dict(schema.params_by_name[name].definition))
             else:
-                if value and value != "__MISSING__":
+                if filled:
                     final_body[name] = value
                 else:
-                    missing_params.append(all_params[name])
+                    missing_params.append(dict(schema.params_by_name[name].definition))
 
+        final_url, _ = schema.render_path(path_values)
         final_task = {
-            "description": api_metadata.get("description"),
-            "method": api_metadata.get("method"),
+            "description": schema.description,
+            "method": schema.method,
             "url": final_url
         }
         if final_body:
             final_task["body"] = final_body
         if missing_params:
             final_task["missing"] = sorted(missing_params, key=lambda p: p['name'])
+        final_task["param_sources"] = param_sources
 
         return final_task
 
@@ -114,3 +242,92 @@ class ApiRagAgent:
 
         # 2. 填充参数
         return self._fill_parameters(api_doc, user_query)
+
+    async def agenerate_api_call(self, user_query: str) -> Dict[str, Any]:
+        """generate_api_call的异步版本，检索、精排和参数填充都不阻塞事件循环。"""
+        api_doc = await self._aget_api_doc_from_retrieval(user_query)
+        if not api_doc:
+            return {"error": "无法找到与您的需求匹配的API。"}
+
+        return await self._afill_parameters(api_doc, user_query)
+
+    async def astream_api_call(self, user_query: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        agenerate_api_call的流式版本，每个阶段完成时产出一个(事件, 数据)：
+        ("retrieved", 检索到的API及分数) -> ("params_rule", 规则提取的参数) ->
+        若干("params_token", 大模型输出片段) -> ("result", 最终API调用信息)；检索失败时产出("error", ...)。
+        """
+        retrieved_results = await self.retriever.asearch(query=user_query, final_k=1)
+        if not retrieved_results:
+            yield "error", {"error": "无法找到与您的需求匹配的API。"}
+            return
+
+        api_doc, score = retrieved_results[0]
+        api_metadata = api_doc.metadata
+        yield "retrieved", {
+            "name": api_metadata.get("name"),
+            "method": api_metadata.get("method"),
+            "endpoint": api_metadata.get("endpoint"),
+            "score": float(score),
+            "score_source": api_metadata.get("score_source"),
+        }
+
+        schema = self.schemas.for_metadata(api_metadata)
+        if not schema.params:
+            yield "result", self._assemble_api_call(schema, {})
+            return
+
+        with tracer.stream_span("param_fill", api=schema.name) as span:
+            extracted, pending = schema.extractor.extract(user_query)
+            llm_output, pending = self._skip_llm_output(schema, extracted, pending)
+            span.set("rule_params", len(extracted))
+            span.set("llm_params", len(pending))
+            if extracted:
+                yield "params_rule", extracted
+            if pending:
+                raw_text = ""
+                async for chunk in self.api_chain.astream(
+                    self._build_chain_inputs(schema, pending, user_query), config=tracer.llm_config(span)
+                ):
+                    if chunk:
+                        raw_text += chunk
+                        yield "params_token", chunk
+                llm_output = self._parse_llm_output(raw_text)
+        yield "result", self._assemble_api_call(schema, llm_output, extracted)
+
+    async def agenerate_api_calls(self, user_queries: List[str]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        批量生成API调用，按完成顺序逐个产出(输入下标, 结果)。
+
+        检索阶段整批完成（一次嵌入、一次向量检索、分组精排），
+        参数填充在settings.batch_param_fill_concurrency的并发上限内并行执行。
+        """
+        retrieved_batches = await self.retriever.abatch_search(user_queries, final_k=1)
+        semaphore = asyncio.Semaphore(settings.batch_param_fill_concurrency)
+
+        async def fill(index: int, user_query: str, retrieved_results: List[Tuple[Document, float]]):
+            if not retrieved_results:
+                return index, {"error": "无法找到与您的需求匹配的API。"}
+            api_doc, score = retrieved_results[0]
+            logger.debug(
+                f"批量请求#{index} 检索到API: '{api_doc.metadata.get('name')}'，"
+                f"分数为: {score:.4f}（{api_doc.metadata.get('score_source')}）"
+            )
+            async with semaphore:
+                try:
+                    return index, await self._afill_parameters(api_doc, user_query)
+                except Exception as e:
+                    logger.error(f"批量请求#{index} 参数填充失败: {e}")
+                    return index, {"error": "参数填充失败。"}
+
+        tasks = [
+            asyncio.ensure_future(fill(index, user_query, retrieved_results))
+            for index, (user_query, retrieved_results) in enumerate(zip(user_queries, retrieved_batches))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 调用方提前结束（如客户端断开）时，取消尚未完成的任务
+            for task in tasks:
+                task.cancel()
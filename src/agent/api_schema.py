@@ -0,0 +1,151 @@
+"""
+API参数Schema注册表
+Compiled, immutable per-API parameter schemas built once from api.json and looked up by api id or name
+"""
+
+import json
+import re
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from src.agent.param_extractor import ParamExtractor
+from src.vectorize.api_documents import api_id
+
+# 路径模板中的占位符，如 /api/v1/employees/{staffId}/project
+_PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+class ParamSpec:
+    """单个参数的定义"""
+
+    __slots__ = ("name", "location", "type", "required", "description", "definition")
+
+    def __init__(self, definition: Dict[str, Any]):
+        self.name: str = definition.get("name", "")
+        self.location: str = definition.get("in", "body")
+        self.type: str = definition.get("type", "string")
+        self.required: bool = bool(definition.get("required", False))
+        self.description: str = definition.get("description", "") or ""
+        # 原始定义，用于构建Prompt和响应中的missing列表
+        self.definition: Mapping[str, Any] = MappingProxyType(dict(definition))
+
+
+class ApiSchema:
+    """
+    单个API编译后的Schema
+
+    路径模板预先切分为字面片段和占位符交替的元组（奇数下标为占位符名），
+    填充路径只需一次join；必填参数集合、按名称的参数索引和规则参数提取器都在构建时准备好。
+    """
+
+    __slots__ = (
+        "api_id", "name", "description", "method", "endpoint", "params", "params_by_name",
+        "required", "path_template", "placeholders", "extractor", "_params_def"
+    )
+
+    def __init__(self, api: Dict[str, Any], params_def: List[Dict[str, Any]]):
+        self.api_id: str = api.get("api_id") or api_id(api)
+        self.name: str = api.get("name", "")
+        self.description: str = api.get("description", "")
+        self.method: str = str(api.get("method", "GET")).upper()
+        self.endpoint: str = api.get("endpoint", "") or ""
+        self.params: Tuple[ParamSpec, ...] = tuple(ParamSpec(param) for param in params_def)
+        self.params_by_name: Mapping[str, ParamSpec] = MappingProxyType({spec.name: spec for spec in self.params})
+        self.required: FrozenSet[str] = frozenset(spec.name for spec in self.params if spec.required)
+        self.path_template: Tuple[str, ...] = tuple(_PLACEHOLDER.split(self.endpoint))
+        self.placeholders: FrozenSet[str] = frozenset(self.path_template[1::2])
+        self._params_def: Tuple[Mapping[str, Any], ...] = tuple(spec.definition for spec in self.params)
+        self.extractor = ParamExtractor([dict(definition) for definition in self._params_def])
+
+    @classmethod
+    def from_definition(cls, api: Dict[str, Any]) -> "ApiSchema":
+        """由api.json中的API定义构建"""
+        return cls(api, api.get("params", []) or [])
+
+    @classmethod
+    def from_metadata(cls, metadata: Dict[str, Any]) -> "ApiSchema":
+        """由向量库文档元数据构建（params_json只在这里解析一次）"""
+        try:
+            params_def = json.loads(metadata.get("params_json", "[]") or "[]")
+        except (json.JSONDecodeError, TypeError):
+            params_def = []
+        if not isinstance(params_def, list):
+            params_def = []
+        return cls(metadata, params_def)
+
+    @property
+    def params_def(self) -> List[Dict[str, Any]]:
+        """参数定义列表（副本）"""
+        return [dict(definition) for definition in self._params_def]
+
+    def render_path(self, values: Mapping[str, Any]) -> Tuple[str, List[str]]:
+        """
+        用参数值填充路径模板
+
+        Returns:
+            Tuple[str, List[str]]: (填充后的路径, 没有取值的占位符名称)，未取值的占位符原样保留
+        """
+        if len(self.path_template) == 1:
+            return self.endpoint, []
+        parts = list(self.path_template)
+        missing = []
+        for i in range(1, len(parts), 2):
+            value = values.get(parts[i])
+            if value:
+                parts[i] = str(value)
+            else:
+                missing.append(parts[i])
+                parts[i] = "{" + parts[i] + "}"
+        return "".join(parts), missing
+
+
+class ApiSchemaRegistry:
+    """
+    API Schema注册表，启动（或索引热切换）时从API定义一次性构建，之后只读
+
+    同时按api_id和名称索引；注册表中没有的API（如测试中直接使用的集合）按params_json懒编译并缓存。
+    """
+
+    def __init__(self, schemas: Iterable[ApiSchema] = ()):
+        by_key: Dict[str, ApiSchema] = {}
+        for schema in schemas:
+            by_key[schema.api_id] = schema
+            by_key.setdefault(schema.name, schema)
+        self._by_key: Mapping[str, ApiSchema] = MappingProxyType(by_key)
+        self._by_params_json: Dict[Tuple[str, str, str], ApiSchema] = {}
+
+    @classmethod
+    def from_definitions(cls, api_definitions: Iterable[Dict[str, Any]]) -> "ApiSchemaRegistry":
+        return cls(ApiSchema.from_definition(api) for api in api_definitions)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ApiSchemaRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_definitions(json.load(f))
+
+    @classmethod
+    def from_metadatas(cls, metadatas: Iterable[Optional[Dict[str, Any]]]) -> "ApiSchemaRegistry":
+        """由向量库集合中所有文档的元数据构建"""
+        return cls(ApiSchema.from_metadata(metadata) for metadata in metadatas if metadata)
+
+    def __len__(self) -> int:
+        return len({id(schema) for schema in self._by_key.values()})
+
+    def get(self, key: str) -> Optional[ApiSchema]:
+        """按api_id或名称查找"""
+        return self._by_key.get(key)
+
+    def for_metadata(self, metadata: Dict[str, Any]) -> ApiSchema:
+        """
+        查找检索结果对应的Schema：先按api_id，再按名称；都没有时按元数据编译并缓存
+
+        注册表与集合来自同一代索引时，前两步即可命中，不会解析params_json。
+        """
+        schema = self._by_key.get(metadata.get("api_id") or "") or self._by_key.get(metadata.get("name") or "")
+        if schema is not None:
+            return schema
+        key = (metadata.get("name") or "", metadata.get("endpoint") or "", metadata.get("params_json") or "[]")
+        schema = self._by_params_json.get(key)
+        if schema is None:
+            schema = self._by_params_json[key] = ApiSchema.from_metadata(metadata)
+        return schema
@@ -0,0 +1,147 @@
+"""
+规则参数提取
+Deterministic extraction of dates, emails, ids, enum values and unit-suffixed numbers, compiled per API from params_json hints
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_DATE = re.compile(r"(?<!\d)(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})(?:\s*[日号])?(?!\d)")
+_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}|[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+")
+# 形如 s_123、p_abc、u_001 的业务ID
+_ID = re.compile(r"(?<![A-Za-z0-9_@.])([A-Za-z]{1,4})_([A-Za-z0-9]+)(?![A-Za-z0-9_@])")
+# 参数描述中括号内列出的枚举值，如 (ANNUAL, SICK, PERSONAL)、（progress/summary/detail）
+_ENUM_HINT = re.compile(r"[(（]\s*([A-Za-z][A-Za-z0-9_]*(?:\s*[,，/|、]\s*[A-Za-z][A-Za-z0-9_]*)+)\s*[)）]")
+_ENUM_SPLIT = re.compile(r"\s*[,，/|、]\s*")
+# 数值参数描述中的单位，如 加班时长（小时）
+_UNIT_HINT = re.compile(r"[(（]\s*([^()（）\d\s]{1,4})\s*[)）]")
+
+
+class ParamRule:
+    """单个参数的提取规则"""
+
+    __slots__ = ("name", "kind", "required", "pattern", "choices")
+
+    def __init__(self, name: str, kind: str, required: bool, pattern: Optional[re.Pattern] = None,
+                 choices: Sequence[str] = ()):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.pattern = pattern
+        self.choices = tuple(choices)
+
+    @classmethod
+    def from_param(cls, param: Dict[str, Any]) -> Optional["ParamRule"]:
+        """根据参数的类型、名称和描述推断提取规则，无法推断时返回None（交给大模型）"""
+        name = param.get("name", "")
+        description = param.get("description", "") or ""
+        param_type = (param.get("type") or "string").lower()
+        required = bool(param.get("required", False))
+        lower_name = name.lower()
+
+        enum_hint = _ENUM_HINT.search(description)
+        if enum_hint:
+            choices = _ENUM_SPLIT.split(enum_hint.group(1))
+            alternatives = "|".join(re.escape(choice) for choice in sorted(choices, key=len, reverse=True))
+            pattern = re.compile(rf"(?<![A-Za-z0-9_])({alternatives})(?![A-Za-z0-9_])", re.IGNORECASE)
+            return cls(name, "enum", required, pattern, choices)
+        if "yyyy-mm-dd" in description.lower() or lower_name.endswith("date"):
+            return cls(name, "date", required, _DATE)
+        if "email" in lower_name or "邮箱" in description:
+            return cls(name, "email", required, _EMAIL)
+        if param_type in ("number", "integer", "int", "float"):
+            unit_hint = _UNIT_HINT.search(description)
+            if unit_hint:
+                unit = re.escape(unit_hint.group(1))
+                return cls(name, "number", required, re.compile(rf"(\d+(?:\.\d+)?)\s*个?\s*{unit}"))
+            return None
+        if lower_name.endswith("id") and len(name) > 2:
+            return cls(name, "id", required, _ID)
+        return None
+
+    def find(self, query: str) -> List[Any]:
+        """返回查询中所有候选值（去重，保持出现顺序）"""
+        values: List[Any] = []
+        for match in self.pattern.finditer(query):
+            if self.kind == "enum":
+                token = match.group(1).lower()
+                value = next(choice for choice in self.choices if choice.lower() == token)
+            elif self.kind == "date":
+                year, month, day = match.groups()
+                value = f"{year}-{int(month):02d}-{int(day):02d}"
+            elif self.kind == "number":
+                number = float(match.group(1))
+                value = int(number) if number.is_integer() else number
+            elif self.kind == "id":
+                value = match.group(0)
+            else:
+                value = match.group(0)
+            if value not in values:
+                values.append(value)
+        return values
+
+
+class ParamExtractor:
+    """
+    单个API的规则参数提取器
+
+    按params_json中的类型和描述提示为每个参数预编译规则：日期（YYYY-MM-DD）、邮箱、业务ID（s_123）、
+    描述中列出的枚举值、带单位的数值。同类参数有多个时（如fromDate/toDate），只有查询中候选值的数量
+    与参数数量一致才按顺序赋值；业务ID优先按前缀与参数名首字母对应（s_123 -> staffId）。
+    有歧义的参数不做猜测，交给大模型。
+    """
+
+    def __init__(self, params_def: Sequence[Dict[str, Any]]):
+        """
+        Args:
+            params_def: API的参数定义列表
+        """
+        self.params_def = list(params_def)
+        self.rules: List[ParamRule] = []
+        for param in self.params_def:
+            rule = ParamRule.from_param(param)
+            if rule is not None:
+                self.rules.append(rule)
+
+    def extract(self, user_query: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        从用户查询中提取参数
+
+        Args:
+            user_query: 用户查询
+
+        Returns:
+            Tuple[Dict[str, Any], List[Dict[str, Any]]]: (规则提取到的参数值, 仍需大模型填充的参数定义)，
+            所有参数（包括可选参数）都已提取时第二项为空列表
+        """
+        extracted: Dict[str, Any] = {}
+        by_kind: Dict[str, List[ParamRule]] = {}
+        for rule in self.rules:
+            by_kind.setdefault(rule.kind, []).append(rule)
+
+        for kind, rules in by_kind.items():
+            if kind == "enum":
+                for rule in rules:
+                    values = rule.find(user_query)
+                    if len(values) == 1:
+                        extracted[rule.name] = values[0]
+                continue
+            values = rules[0].find(user_query)
+            if kind == "id" and len(rules) > 1:
+                extracted.update(self._assign_ids(rules, values))
+            elif len(values) == len(rules):
+                extracted.update({rule.name: value for rule, value in zip(rules, values)})
+
+        pending = [param for param in self.params_def if param.get("name") not in extracted]
+        return extracted, pending
+
+    @staticmethod
+    def _assign_ids(rules: List[ParamRule], values: List[str]) -> Dict[str, str]:
+        """多个ID参数时按前缀首字母对应参数名首字母，唯一对应才赋值"""
+        assigned = {}
+        for rule in rules:
+            matches = [value for value in values if value[0].lower() == rule.name[0].lower()]
+            owners = [other for other in rules if other.name[0].lower() == rule.name[0].lower()]
+            if len(matches) == 1 and len(owners) == 1:
+                assigned[rule.name] = matches[0]
+        return assigned
@@ -0,0 +1,224 @@
+"""
+缓存存储后端
+Pluggable key-value backends with TTL and LRU eviction
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Tuple
+
+from loguru import logger
+
+
+class CacheBackend(ABC):
+    """缓存后端接口。值必须可被JSON序列化，过期（TTL）和容量淘汰（LRU）由后端负责。"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            max_entries: 最大缓存条目数，超出后淘汰最久未被访问的条目
+            ttl_seconds: 条目存活时间（秒），为空或<=0时表示永不过期
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.evictions = 0
+        self._eviction_listeners: List[Callable[[List[str]], None]] = []
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.ttl_seconds if self.ttl_seconds else None
+
+    def add_eviction_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """注册条目移除回调，条目因LRU淘汰、过期、删除或清空被移除时以键列表调用"""
+        self._eviction_listeners.append(listener)
+
+    def _notify_removed(self, keys: List[str]) -> None:
+        # 在释放后端锁之后调用，回调中可以再访问后端
+        if not keys:
+            return
+        for listener in self._eviction_listeners:
+            try:
+                listener(keys)
+            except Exception as e:
+                logger.warning(f"缓存条目移除回调执行失败: {e}")
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """读取一个未过期的条目，并将其标记为最近使用"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """写入一个条目"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除一个条目"""
+
+    @abstractmethod
+    def items(self, prefix: str = "") -> List[Tuple[str, Any]]:
+        """列出所有键以prefix开头的未过期条目（不影响LRU顺序）"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """清空所有条目"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """进程内字典后端"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.time():
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+        self._notify_removed([key])
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (self._expires_at(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+        self._notify_removed(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+        if removed:
+            self._notify_removed([key])
+
+    def items(self, prefix: str = "") -> List[Tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value) for key, (expires_at, value) in self._entries.items()
+                if key.startswith(prefix) and (expires_at is None or expires_at > now)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+        self._notify_removed(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """本地磁盘SQLite文件后端，服务重启后缓存依然有效"""
+
+    def __init__(self, path: str, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            path: SQLite数据库文件路径
+            max_entries: 最大缓存条目数
+            ttl_seconds: 条目存活时间（秒）
+        """
+        super().__init__(max_entries, ttl_seconds)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries(last_access)")
+        self._conn.commit()
+        logger.info(f"SQLite缓存后端初始化成功: {path}")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            expired = expires_at is not None and expires_at <= now
+            if expired:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            else:
+                self._conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        if expired:
+            self._notify_removed([key])
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, self._expires_at(), time.time())
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.max_entries
+            evicted = []
+            if overflow > 0:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM cache_entries ORDER BY last_access ASC LIMIT ?", (overflow,)
+                ).fetchall()]
+                self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in evicted])
+                self.evictions += len(evicted)
+            self._conn.commit()
+        self._notify_removed(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount > 0
+            self._conn.commit()
+        if removed:
+            self._notify_removed([key])
+
+    def items(self, prefix: str = "") -> List[Tuple[str, Any]]:
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM cache_entries "
+                "WHERE substr(key, 1, ?) = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (len(prefix), prefix, now)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM cache_entries").fetchall()]
+            self._conn.execute("DELETE FROM cache_entries")
+            self._conn.commit()
+        self._notify_removed(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
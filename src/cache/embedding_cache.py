@@ -0,0 +1,282 @@
+"""
+查询嵌入缓存
+LRU (+ optional memory-mapped float32 file) cache in front of any LangChain Embeddings
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from config.settings import settings
+from src.utils.async_utils import run_blocking
+from src.utils.client_registry import client_registry
+from src.utils.tracing import tracer
+
+
+class MemmapEmbeddingStore:
+    """
+    基于内存映射float32文件的持久化向量存储
+
+    向量写入`<path>.f32`（行主序矩阵），键按行号顺序追加写入`<path>.keys`。
+    文件写满后按倍数扩容，达到max_entries后不再写入新向量。
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, initial_capacity: int = 1024):
+        """
+        Args:
+            path: 文件路径前缀
+            max_entries: 最多持久化的向量数量
+            initial_capacity: 初始行容量
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.initial_capacity = initial_capacity
+        self._vectors_path = f"{path}.f32"
+        self._keys_path = f"{path}.keys"
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not (os.path.exists(self._keys_path) and os.path.exists(self._vectors_path)):
+            return
+        with open(self._keys_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        if not lines:
+            return
+        header, keys = lines[0], lines[1:]
+        try:
+            self._dim = int(header)
+            capacity = os.path.getsize(self._vectors_path) // (4 * self._dim)
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+        except (ValueError, ZeroDivisionError) as e:
+            logger.warning(f"嵌入缓存文件损坏，将重新创建: {e}")
+            self._reset()
+            return
+        self._rows = {key: row for row, key in enumerate(keys[:capacity])}
+        logger.info(f"已加载持久化嵌入缓存: {len(self._rows)} 条，维度: {self._dim}")
+
+    def _reset(self) -> None:
+        self._rows.clear()
+        self._dim = None
+        self._matrix = None
+        for path in (self._vectors_path, self._keys_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _ensure_capacity(self, rows_needed: int) -> None:
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if rows_needed <= capacity:
+            return
+        new_capacity = max(self.initial_capacity, capacity * 2)
+        while new_capacity < rows_needed:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, self.max_entries)
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(new_capacity * self._dim * 4)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self._dim))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._matrix[row])
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            if key in self._rows or len(self._rows) >= self.max_entries:
+                return
+            if self._dim is None:
+                self._dim = int(vector.shape[0])
+                with open(self._keys_path, "w", encoding="utf-8") as f:
+                    f.write(f"{self._dim}\n")
+            elif vector.shape[0] != self._dim:
+                return
+            row = len(self._rows)
+            self._ensure_capacity(row + 1)
+            self._matrix[row] = vector
+            # 先把向量落盘再追加键：中途崩溃最多丢掉这一条，不会留下指向空向量的键
+            self._matrix.flush()
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.write(f"{key}\n")
+            self._rows[key] = row
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class EmbeddingCacheStore:
+    """进程内共享的嵌入缓存存储：内存LRU + 可选的持久化层，并记录命中统计"""
+
+    def __init__(self, max_entries: int, persistent: Optional[MemmapEmbeddingStore] = None):
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return vector
+        if self.persistent is not None:
+            vector = self.persistent.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return vector
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        self._remember(key, vector)
+        if self.persistent is not None:
+            self.persistent.put(key, vector)
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["disk_entries"] = len(self.persistent) if self.persistent is not None else 0
+        return stats
+
+
+def _model_name(embeddings: Embeddings) -> str:
+    for attr in ("model", "model_name"):
+        value = getattr(embeddings, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(embeddings).__name__
+
+
+def get_embedding_cache_store(model_name: str, kind: str = "query") -> EmbeddingCacheStore:
+    """
+    按模型名称和文本类型获取进程内共享的嵌入缓存存储
+
+    查询（query）和文档（document）使用各自的存储：内存容量、持久化文件和命中统计互不影响，
+    建索引时的大批文档嵌入不会挤掉热点查询。
+    """
+    def create_store() -> EmbeddingCacheStore:
+        persistent = None
+        if settings.embedding_cache_path:
+            safe_name = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+            if kind != "query":
+                safe_name = f"{safe_name}.{kind}"
+            persistent = MemmapEmbeddingStore(
+                os.path.join(settings.embedding_cache_path, safe_name),
+                max_entries=settings.embedding_cache_disk_max_entries
+            )
+        max_entries = (
+            settings.embedding_cache_max_entries if kind == "query"
+            else settings.embedding_cache_document_max_entries
+        )
+        return EmbeddingCacheStore(max_entries, persistent)
+
+    return client_registry.get_or_create(("embedding_cache", model_name, kind), create_store)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    嵌入缓存包装器，可包裹任意LangChain Embeddings
+
+    缓存键为(模型名称, 文本类型, 文本哈希)。查询和文档分开缓存，
+    因为部分提供商（如DashScope）对两者使用不同的text_type；两者也使用各自的存储，
+    文档嵌入不占用查询缓存的LRU容量和持久化文件。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        store: Optional[EmbeddingCacheStore] = None,
+        document_store: Optional[EmbeddingCacheStore] = None
+    ):
+        """
+        Args:
+            embeddings: 被包装的嵌入模型
+            store: 查询嵌入的缓存存储，默认按模型名称使用进程内共享存储
+            document_store: 文档嵌入的缓存存储，默认按模型名称使用进程内共享存储
+        """
+        self.embeddings = embeddings
+        self.model_name = _model_name(embeddings)
+        self.store = store or get_embedding_cache_store(self.model_name)
+        self.document_store = document_store or get_embedding_cache_store(self.model_name, "document")
+
+    def _key(self, kind: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{kind}:{digest}"
+
+    def embed_query(self, text: str) -> List[float]:
+        with tracer.span("embedding"):
+            key = self._key("query", text)
+            vector = self.store.get(key)
+            tracer.record_cache("embedding", vector is not None)
+            if vector is None:
+                vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+                self.store.put(key, vector)
+            return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        vectors = [self.document_store.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, values in zip(missing, computed):
+                vectors[i] = np.asarray(values, dtype=np.float32)
+                self.document_store.put(keys[i], vectors[i])
+        return [vector.tolist() for vector in vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with tracer.span("embedding"):
+            key = self._key("query", text)
+            vector = self.store.get(key)
+            tracer.record_cache("embedding", vector is not None)
+            if vector is None:
+                if type(self.embeddings).aembed_query is not Embeddings.aembed_query:
+                    # 被包装的模型有自己的异步实现（如本地模型的微批次调度）
+                    values = await self.embeddings.aembed_query(text)
+                else:
+                    values = await run_blocking(self.embeddings.embed_query, text)
+                vector = np.asarray(values, dtype=np.float32)
+                self.store.put(key, vector)
+            return vector.tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_blocking(self.embed_documents, texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计，顶层为查询嵌入缓存，documents为文档嵌入缓存"""
+        return {"model": self.model_name, **self.store.stats(), "documents": self.document_store.stats()}
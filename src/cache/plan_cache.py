@@ -0,0 +1,293 @@
+"""
+任务规划缓存
+Two-tier (exact + semantic) response cache for the query rewriter and TaskPlanner
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config.settings import settings
+from src.cache.backends import CacheBackend, InMemoryCacheBackend, SQLiteCacheBackend
+from src.utils.async_utils import run_blocking
+from src.utils.text_utils import normalize_query
+from src.utils.tracing import tracer
+
+
+def _unit_vector(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class _SemanticIndex:
+    """一个API目录版本下语义匹配层的内存索引：键列表 + 归一化后的float32向量矩阵（非线程安全，由PlanCache加锁）"""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def upsert(self, key: str, vector: np.ndarray) -> None:
+        if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+            # 首次写入或嵌入模型维度变化：按新维度重建
+            self.keys, self._rows = [], {}
+            self._matrix = np.empty((16, vector.shape[0]), dtype=np.float32)
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self._matrix):
+                grown = np.empty((row * 2, self._matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self.keys.append(key)
+            self._rows[key] = row
+        self._matrix[row] = vector
+
+    def remove(self, key: str) -> None:
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self.keys) - 1
+        if row != last:
+            # 用最后一行填补空位，保持矩阵紧凑
+            moved = self.keys[last]
+            self.keys[row] = moved
+            self._rows[moved] = row
+            self._matrix[row] = self._matrix[last]
+        self.keys.pop()
+
+    def best_match(self, vector: np.ndarray) -> Optional[Tuple[str, float]]:
+        if not self.keys or self._matrix.shape[1] != vector.shape[0]:
+            return None
+        similarities = self._matrix[:len(self.keys)] @ vector
+        best = int(np.argmax(similarities))
+        return self.keys[best], float(similarities[best])
+
+
+class PlanCache:
+    """
+    两级任务规划缓存
+
+    - 第一级：原始查询归一化后精确匹配，命中时跳过查询改写和任务规划两次LLM调用。
+    - 第二级：改写后查询的嵌入向量与历史改写查询做余弦相似度匹配，超过阈值时跳过任务规划。
+      每个API目录版本在内存中维护一个归一化向量矩阵，随写入和后端淘汰增量更新，
+      只在该版本第一次被访问时（冷启动）从后端读取全部条目。
+
+    所有缓存键都包含api.json目录的哈希值，API目录变化后旧缓存自动失效。
+    后端读写都是同步的，异步接口（alookup_exact/alookup_semantic/astore）通过run_blocking放到线程池执行。
+    """
+
+    EXACT_PREFIX = "exact"
+    SEMANTIC_PREFIX = "semantic"
+
+    def __init__(self, backend: CacheBackend, similarity_threshold: Optional[float] = None):
+        """
+        Args:
+            backend: 缓存存储后端
+            similarity_threshold: 语义匹配的余弦相似度阈值
+        """
+        self.backend = backend
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else settings.plan_cache_similarity_threshold
+        )
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+        self._semantic_indexes: Dict[str, _SemanticIndex] = {}
+        self.backend.add_eviction_listener(self._forget_semantic)
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """归一化查询：全半角统一、小写、合并空白、去掉首尾标点"""
+        return normalize_query(query)
+
+    @staticmethod
+    def catalog_hash(api_json: List[Dict[str, Any]]) -> str:
+        """计算API目录的哈希值"""
+        payload = json.dumps(api_json, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def _key(cls, prefix: str, catalog_hash: str, query: str) -> str:
+        digest = hashlib.sha256(cls.normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{prefix}:{catalog_hash}:{digest}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _semantic_index(self, catalog_hash: str) -> _SemanticIndex:
+        """取出目录版本对应的内存索引，冷启动时从后端加载"""
+        with self._lock:
+            index = self._semantic_indexes.get(catalog_hash)
+        if index is not None:
+            return index
+        entries = self.backend.items(f"{self.SEMANTIC_PREFIX}:{catalog_hash}:")
+        with self._lock:
+            index = self._semantic_indexes.get(catalog_hash)
+            if index is None:
+                index = _SemanticIndex()
+                for key, value in entries:
+                    index.upsert(key, _unit_vector(value["embedding"]))
+                self._semantic_indexes[catalog_hash] = index
+                logger.debug(f"任务规划缓存语义索引已加载，目录版本: {catalog_hash}，条目数: {len(index)}")
+        return index
+
+    def _forget_semantic(self, keys: List[str]) -> None:
+        """后端移除条目时同步删除内存索引中的对应行"""
+        with self._lock:
+            for key in keys:
+                prefix, _, rest = key.partition(":")
+                if prefix != self.SEMANTIC_PREFIX:
+                    continue
+                catalog_hash = rest.partition(":")[0]
+                index = self._semantic_indexes.get(catalog_hash)
+                if index is not None:
+                    index.remove(key)
+
+    def lookup_exact(self, query: str, catalog_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        第一级：精确匹配
+
+        Returns:
+            Optional[Dict[str, Any]]: 命中时返回 {"rewritten_query": ..., "plan": ...}
+        """
+        entry = self.backend.get(self._key(self.EXACT_PREFIX, catalog_hash, query))
+        if entry is not None:
+            self._count("exact_hits")
+            tracer.record_cache("plan", True)
+            logger.info(f"任务规划缓存精确命中: '{query}'")
+        return entry
+
+    def lookup_semantic(
+        self,
+        rewritten_query: str,
+        embedding: List[float],
+        catalog_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        第二级：语义匹配。在同一API目录版本下，找出与改写后查询最相似的历史条目。
+
+        Returns:
+            Optional[Dict[str, Any]]: 相似度超过阈值时返回 {"rewritten_query": ..., "plan": ..., "similarity": ...}
+        """
+        query_vec = _unit_vector(embedding)
+        index = self._semantic_index(catalog_hash)
+        while True:
+            with self._lock:
+                match = index.best_match(query_vec)
+            if match is None or match[1] < self.similarity_threshold:
+                break
+            key, best_similarity = match
+            value = self.backend.get(key)  # 刷新LRU顺序；已过期的条目会经回调从索引中移除
+            if value is None:
+                self._forget_semantic([key])
+                continue
+            self._count("semantic_hits")
+            tracer.record_cache("plan", True)
+            logger.info(
+                f"任务规划缓存语义命中: '{rewritten_query}' ≈ '{value['rewritten_query']}'，"
+                f"相似度: {best_similarity:.4f}"
+            )
+            return {
+                "rewritten_query": value["rewritten_query"],
+                "plan": value["plan"],
+                "similarity": best_similarity
+            }
+        self.record_miss()
+        return None
+
+    def record_miss(self) -> None:
+        """记录一次两级缓存都未命中（需要完整调用任务规划）"""
+        self._count("misses")
+        tracer.record_cache("plan", False)
+
+    def store(
+        self,
+        query: str,
+        rewritten_query: str,
+        plan: Dict[str, Any],
+        catalog_hash: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """写入一次成功的规划结果。embedding为空时只写入精确匹配层。"""
+        self.backend.set(
+            self._key(self.EXACT_PREFIX, catalog_hash, query),
+            {"rewritten_query": rewritten_query, "plan": plan}
+        )
+        if embedding is not None:
+            key = self._key(self.SEMANTIC_PREFIX, catalog_hash, rewritten_query)
+            index = self._semantic_index(catalog_hash)
+            self.backend.set(
+                key,
+                {"rewritten_query": rewritten_query, "plan": plan, "embedding": [float(x) for x in embedding]}
+            )
+            with self._lock:
+                index.upsert(key, _unit_vector(embedding))
+        self._count("stores")
+
+    async def alookup_exact(self, query: str, catalog_hash: str) -> Optional[Dict[str, Any]]:
+        """lookup_exact的异步版本，后端读取在线程池中执行"""
+        return await run_blocking(self.lookup_exact, query, catalog_hash)
+
+    async def alookup_semantic(
+        self,
+        rewritten_query: str,
+        embedding: List[float],
+        catalog_hash: str
+    ) -> Optional[Dict[str, Any]]:
+        """lookup_semantic的异步版本，冷启动加载和命中条目的读取在线程池中执行"""
+        return await run_blocking(self.lookup_semantic, rewritten_query, embedding, catalog_hash)
+
+    async def astore(
+        self,
+        query: str,
+        rewritten_query: str,
+        plan: Dict[str, Any],
+        catalog_hash: str,
+        embedding: Optional[List[float]] = None
+    ) -> None:
+        """store的异步版本，后端写入在线程池中执行"""
+        await run_blocking(self.store, query, rewritten_query, plan, catalog_hash, embedding)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中/未命中计数"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        stats["entries"] = len(self.backend)
+        with self._lock:
+            stats["semantic_index_entries"] = sum(len(index) for index in self._semantic_indexes.values())
+        stats["evictions"] = self.backend.evictions
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def create_plan_cache() -> Optional[PlanCache]:
+    """根据配置创建任务规划缓存，未启用时返回None"""
+    if not settings.enable_plan_cache:
+        logger.info("任务规划缓存未启用")
+        return None
+
+    if settings.plan_cache_backend == "sqlite":
+        backend: CacheBackend = SQLiteCacheBackend(
+            settings.plan_cache_path,
+            max_entries=settings.plan_cache_max_entries,
+            ttl_seconds=settings.plan_cache_ttl_seconds
+        )
+    else:
+        backend = InMemoryCacheBackend(
+            max_entries=settings.plan_cache_max_entries,
+            ttl_seconds=settings.plan_cache_ttl_seconds
+        )
+    logger.info(f"任务规划缓存初始化成功，后端: {settings.plan_cache_backend}")
+    return PlanCache(backend)
@@ -0,0 +1,84 @@
+"""
+重排序结果缓存
+LRU cache of reranker output keyed by (query, ordered candidate set, model)
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from config.settings import settings
+from src.utils.text_utils import normalize_query
+from src.vectorize.api_documents import document_id
+from src.vectorize.index_version import read_index_version
+
+
+class RerankCache:
+    """
+    重排序结果的LRU缓存
+
+    缓存键为(归一化查询, 有序候选文档ID, 模型名称, top_n)，缓存值为
+    (候选文档下标, 重排序分数)列表，命中时按下标映射回本次调用的文档对象。
+    向量索引版本变化（集合重建）时整体清空。
+    """
+
+    def __init__(self, max_entries: int, version_provider: Optional[Callable[[], str]] = None):
+        """
+        Args:
+            max_entries: 最大缓存条目数
+            version_provider: 返回当前索引版本的函数，默认读取向量存储目录的版本标记
+        """
+        self.max_entries = max_entries
+        self.version_provider = version_provider or (lambda: read_index_version(settings.vector_store_path))
+        self._entries: "OrderedDict[str, List[Tuple[int, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(query: str, documents: Sequence[Document], model_name: str, top_n: int) -> str:
+        parts = [model_name, str(top_n), normalize_query(query), *(document_id(doc) for doc in documents)]
+        return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def _check_version(self) -> None:
+        version = self.version_provider()
+        if version != self._version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: str) -> Optional[List[Tuple[int, float]]]:
+        with self._lock:
+            self._check_version()
+            ranking = self._entries.get(key)
+            if ranking is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return ranking
+
+    def set(self, key: str, ranking: List[Tuple[int, float]]) -> None:
+        with self._lock:
+            self._check_version()
+            self._entries[key] = ranking
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["index_version"] = self._version
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
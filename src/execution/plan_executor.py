@@ -0,0 +1,392 @@
+"""
+任务计划执行器
+Executes TaskPlanner workflows (nested sequential/parallel trees of api_name tasks) over async HTTP
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import quote
+
+import httpx
+from loguru import logger
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+from config.settings import settings
+from src.utils.client_registry import client_registry
+
+# 步骤之间的参数别名: 参数名 -> 前序步骤输出中可作为该参数取值的字段
+# 如`获取员工项目信息`返回的staffId，即后续请假、加班申请中的userId
+PARAM_ALIASES = {
+    "userId": ["staffId"],
+}
+
+# 幂等方法：读超时、5xx时可以安全重试；非幂等方法只在请求确定未发出（连接失败）或429时重试
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class StepFailed(Exception):
+    """某个步骤最终失败（已用尽重试），终止整个计划"""
+
+    def __init__(self, step: Dict[str, Any]):
+        super().__init__(f"步骤'{step.get('api_name')}'执行失败: {step.get('error')}")
+        self.step = step
+
+
+class HostConnectionPool:
+    """
+    进程内共享的计划执行连接池：一个httpx异步客户端和按主机的并发信号量
+
+    所有/plan/execute请求共用同一个池，每个主机的并发上限跨请求生效，连接也得以复用。
+    httpx客户端和asyncio信号量都绑定创建时的事件循环，事件循环变化时（如测试中多次asyncio.run）重新创建，
+    并关闭旧的客户端，释放它持有的连接。
+    """
+
+    def __init__(self, max_connections_per_host: int):
+        self.max_connections_per_host = max_connections_per_host
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # 正在关闭的旧客户端任务，持有引用避免任务在完成前被回收
+        self._closing: Set[asyncio.Task] = set()
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._client is None:
+            stale_client, stale_loop = self._client, self._loop
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.http_pool_maxsize,
+                    max_keepalive_connections=settings.http_pool_maxsize
+                )
+            )
+            self._semaphores = {}
+            if stale_client is not None:
+                self._close_stale(stale_client, stale_loop, loop)
+
+    def _close_stale(
+        self,
+        client: httpx.AsyncClient,
+        stale_loop: Optional[asyncio.AbstractEventLoop],
+        loop: asyncio.AbstractEventLoop
+    ) -> None:
+        """关闭绑定旧事件循环的客户端：旧循环仍在运行时在旧循环上关闭，已停止时在当前循环上关闭"""
+        if stale_loop is not None and stale_loop.is_running() and not stale_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), stale_loop)
+            return
+        task = loop.create_task(client.aclose())
+        self._closing.add(task)
+        task.add_done_callback(self._on_stale_closed)
+
+    def _on_stale_closed(self, task: "asyncio.Task") -> None:
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"关闭旧事件循环上的计划执行HTTP客户端失败: {task.exception()}")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self._bind()
+        return self._client
+
+    def host_semaphore(self, url: str) -> asyncio.Semaphore:
+        self._bind()
+        host = httpx.URL(url).netloc.decode("ascii")
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return semaphore
+
+    async def aclose(self) -> None:
+        """关闭共享的httpx客户端（服务关闭时调用）"""
+        client, self._client, self._loop = self._client, None, None
+        self._semaphores = {}
+        if client is not None:
+            await client.aclose()
+
+
+def get_connection_pool(max_connections_per_host: Optional[int] = None) -> HostConnectionPool:
+    """
+    获取共享的计划执行连接池，同一并发上限的执行器共用一个池
+
+    Args:
+        max_connections_per_host: 每个主机的最大并发请求数，缺省为settings.plan_exec_max_connections_per_host
+
+    Returns:
+        HostConnectionPool: 共享连接池
+    """
+    limit = max_connections_per_host or settings.plan_exec_max_connections_per_host
+    return client_registry.get_or_create(("plan_exec_pool", limit), lambda: HostConnectionPool(limit))
+
+
+class _ExecutionRun:
+    """一次计划执行的状态：HTTP客户端、共享的按主机并发信号量、步骤编号、步骤记录和各步骤输出"""
+
+    def __init__(self, client: httpx.AsyncClient, pool: HostConnectionPool, plan: Dict[str, Any]):
+        self.client = client
+        self.pool = pool
+        self.step_ids: Dict[int, int] = {}
+        self.steps: List[Dict[str, Any]] = []
+        self.outputs: Dict[int, Any] = {}
+        self.context: Dict[str, Any] = {}
+        self._number_steps(plan)
+
+    def _number_steps(self, node: Dict[str, Any]) -> None:
+        """按计划中的先序顺序为任务节点编号，同一API在计划中出现多次时各自有独立的编号"""
+        if node.get("api_name"):
+            self.step_ids[id(node)] = len(self.step_ids)
+            return
+        for task in node.get("tasks") or []:
+            self._number_steps(task)
+
+
+class PlanExecutor:
+    """
+    执行TaskPlanner生成的任务计划
+
+    - 按`api_name`在API定义中找到方法、路径和参数定义，参数按path/query/body位置组装请求；
+    - `sequential`节点依次执行，`parallel`节点的子节点并发执行，同一主机的并发请求数受限（跨请求共享，见HostConnectionPool）；
+    - 参数取值顺序：任务节点中的`params` -> 调用方传入的已知数据及前序步骤输出 -> PARAM_ALIASES别名；
+      并行分支各自基于分支开始时的上下文执行，全部完成后按计划顺序合并输出；
+    - 任一步骤最终失败时取消同一并行组中仍在执行的步骤，并终止整个计划；整体超时同样取消未完成的步骤。
+    """
+
+    def __init__(
+        self,
+        api_definitions: List[Dict[str, Any]],
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        max_connections_per_host: Optional[int] = None,
+        request_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        param_aliases: Optional[Dict[str, List[str]]] = None
+    ):
+        """
+        Args:
+            api_definitions: API定义列表（api.json）
+            base_url: 业务API的基础地址，API定义中的base_url优先
+            client: 可选的httpx异步客户端；不传时使用共享连接池中的客户端
+            max_connections_per_host: 每个主机的最大并发请求数
+            request_timeout: 单次请求超时（秒）
+            timeout: 整个计划的超时（秒）
+            max_retries: 单个步骤的最大重试次数
+            retry_backoff: 初始退避时间（秒）
+            param_aliases: 参数别名规则，缺省为PARAM_ALIASES
+        """
+        self.apis = {api.get("name"): api for api in api_definitions}
+        self.base_url = base_url or settings.plan_exec_base_url
+        self.client = client
+        self.pool = get_connection_pool(max_connections_per_host)
+        self.request_timeout = request_timeout or settings.plan_exec_request_timeout
+        self.timeout = timeout or settings.plan_exec_timeout
+        self.max_retries = max_retries if max_retries is not None else settings.plan_exec_max_retries
+        self.retry_backoff = retry_backoff if retry_backoff is not None else settings.plan_exec_retry_backoff
+        self.param_aliases = param_aliases if param_aliases is not None else PARAM_ALIASES
+
+    async def execute(self, plan: Dict[str, Any], inputs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        执行任务计划
+
+        Args:
+            plan: TaskPlanner输出的任务计划
+            inputs: 调用方已知的参数键值对，作为初始上下文
+
+        Returns:
+            Dict[str, Any]: {"status": success/failed/timeout, "steps": 步骤记录（按开始顺序，含step_id）,
+                             "outputs": 步骤编号 -> 响应数据, "context": 最终上下文, "elapsed_ms": 总耗时}
+
+        Raises:
+            ValueError: 任务计划为空或结构无效
+        """
+        if not isinstance(plan, dict) or not (plan.get("tasks") or plan.get("api_name")):
+            raise ValueError("任务计划为空或缺少tasks")
+
+        started = time.perf_counter()
+        run = _ExecutionRun(self.client or self.pool.client, self.pool, plan)
+        run.context = dict(inputs or {})
+        status = "success"
+        try:
+            run.context = await asyncio.wait_for(self._run_node(run, plan, run.context), self.timeout)
+        except StepFailed as e:
+            status = "failed"
+            logger.warning(f"任务计划执行失败: {e}")
+        except asyncio.TimeoutError:
+            status = "timeout"
+            logger.warning(f"任务计划执行超时({self.timeout}秒)，未完成的步骤已取消。")
+
+        return {
+            "status": status,
+            "steps": run.steps,
+            "outputs": run.outputs,
+            "context": run.context,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    async def _run_node(self, run: _ExecutionRun, node: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        """执行一个计划节点，返回执行后的上下文"""
+        if node.get("api_name"):
+            return await self._run_step(run, node, context)
+
+        tasks = node.get("tasks") or []
+        if node.get("type") == "parallel":
+            return await self._run_parallel(run, tasks, context)
+        for task in tasks:
+            context = await self._run_node(run, task, context)
+        return context
+
+    async def _run_parallel(
+        self,
+        run: _ExecutionRun,
+        nodes: List[Dict[str, Any]],
+        context: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """并发执行并行组；任一分支失败或外部取消时，取消其余分支"""
+        branches = [asyncio.create_task(self._run_node(run, node, dict(context))) for node in nodes]
+        try:
+            await asyncio.wait(branches, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            pending = [branch for branch in branches if not branch.done()]
+            for branch in pending:
+                branch.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        for branch in branches:
+            if not branch.cancelled() and branch.exception() is not None:
+                raise branch.exception()
+        merged = dict(context)
+        for branch in branches:
+            merged.update(branch.result())
+        return merged
+
+    async def _run_step(self, run: _ExecutionRun, task: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个API调用步骤，返回合并了响应输出的上下文"""
+        api_name = task["api_name"]
+        step_id = run.step_ids[id(task)]
+        step: Dict[str, Any] = {"step_id": step_id, "api_name": api_name, "status": "running", "attempts": 0}
+        run.steps.append(step)
+        started = time.perf_counter()
+        try:
+            api = self.apis.get(api_name)
+            if api is None:
+                step.update(status="failed", error="API定义中不存在该API")
+                raise StepFailed(step)
+
+            method, url, query, body, missing = self._build_request(api, task, context)
+            step["request"] = {"method": method, "url": url, "params": query, "body": body}
+            if missing:
+                step.update(status="failed", error=f"缺少必填参数: {', '.join(missing)}")
+                raise StepFailed(step)
+
+            try:
+                response = await self._send(run, step, method, url, query, body)
+            except httpx.HTTPStatusError as e:
+                step.update(status="failed", status_code=e.response.status_code, error=e.response.text[:500])
+                raise StepFailed(step)
+            except httpx.HTTPError as e:
+                step.update(status="failed", error=f"{type(e).__name__}: {e}")
+                raise StepFailed(step)
+
+            output = self._parse_output(response)
+            step.update(status="success", status_code=response.status_code, response=output)
+            run.outputs[step_id] = output
+            logger.info(f"步骤'{api_name}'执行成功({response.status_code})，尝试次数: {step['attempts']}")
+            return self._merge_output(context, output)
+        except asyncio.CancelledError:
+            step["status"] = "cancelled"
+            raise
+        finally:
+            step["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _build_request(self, api: Dict[str, Any], task: Dict[str, Any], context: Dict[str, Any]):
+        """按参数定义组装请求，返回(方法, URL, 查询参数, 请求体, 缺失的必填参数)"""
+        method = (api.get("method") or "GET").upper()
+        path = api.get("endpoint") or ""
+        query: Dict[str, Any] = {}
+        body: Dict[str, Any] = {}
+        missing: List[str] = []
+        for param in api.get("params", []):
+            name = param.get("name")
+            value = self._resolve_param(name, task, context)
+            if value is None:
+                if param.get("required"):
+                    missing.append(name)
+                continue
+            location = param.get("in", "body")
+            if location == "path":
+                path = path.replace("{" + name + "}", quote(str(value), safe=""))
+            elif location == "query":
+                query[name] = value
+            else:
+                body[name] = value
+        url = (api.get("base_url") or self.base_url).rstrip("/") + path
+        return method, url, query, body, missing
+
+    def _resolve_param(self, name: str, task: Dict[str, Any], context: Dict[str, Any]) -> Any:
+        task_params = task.get("params") or {}
+        if task_params.get(name) is not None:
+            return task_params[name]
+        if context.get(name) is not None:
+            return context[name]
+        for alias in self.param_aliases.get(name, []):
+            if context.get(alias) is not None:
+                return context[alias]
+        return None
+
+    async def _send(
+        self,
+        run: _ExecutionRun,
+        step: Dict[str, Any],
+        method: str,
+        url: str,
+        query: Dict[str, Any],
+        body: Dict[str, Any]
+    ) -> httpx.Response:
+        """发送请求：按主机限流，按错误类型和方法幂等性决定是否重试"""
+        semaphore = run.pool.host_semaphore(url)
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_retries + 1),
+            wait=wait_exponential(multiplier=self.retry_backoff, max=self.retry_backoff * 8),
+            retry=retry_if_exception(lambda e: _is_retryable(e, method)),
+            reraise=True
+        )
+        async for attempt in retrying:
+            with attempt:
+                step["attempts"] += 1
+                async with semaphore:
+                    response = await run.client.request(
+                        method, url, params=query or None, json=body or None, timeout=self.request_timeout
+                    )
+                response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _parse_output(response: httpx.Response) -> Any:
+        if not response.content:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    @staticmethod
+    def _merge_output(context: Dict[str, Any], output: Any) -> Dict[str, Any]:
+        """把响应中的字段并入上下文，兼容{"data": {...}}形式的响应包装"""
+        if not isinstance(output, dict):
+            return context
+        merged = dict(context)
+        merged.update(output)
+        if isinstance(output.get("data"), dict):
+            merged.update(output["data"])
+        return merged
+
+
+def _is_retryable(error: BaseException, method: str) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code == 429 or (status_code >= 500 and method in IDEMPOTENT_METHODS)
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(error, httpx.TransportError) and method in IDEMPOTENT_METHODS
@@ -1,20 +1,33 @@
+import asyncio
 import json
 import sys
 import os
+from contextlib import contextmanager
 import uvicorn
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, NamedTuple, Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from loguru import logger
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.planning.task_planner import TaskPlanner
+from src.planning.task_planner import TaskPlanner, PREREQUISITE_RULES
+from src.planning.candidate_selector import CandidateSelector
 from src.agent.api_rag_agent import ApiRagAgent
+from src.agent.api_schema import ApiSchemaRegistry
+from src.execution.plan_executor import PlanExecutor
 from src.utils.llm_factory import LLMFactory
 from src.utils.groovy_script_generator import GroovyScriptGenerator
+from src.utils.async_utils import run_blocking
+from src.utils.client_registry import client_registry
+from src.utils.sse import SSE_HEADERS, chunk_text, sse_event
+from src.utils.tracing import ServerTimingMiddleware, tracer
+from src.cache.plan_cache import create_plan_cache
+from src.cache.embedding_cache import CachedEmbeddings
+from src.vectorize.index_manager import IndexGeneration, IndexManager, watch_api_json
 from config.settings import settings
 
 def setup_logging():
@@ -42,28 +55,40 @@ def setup_logging():
 # --- 全局变量初始化 ---
 api_agent = None
 planner = None
+plan_executor = None
 api_json_definitions = None
 llm = None
 query_rewriter_chain = None
+plan_cache = None
+api_catalog_hash = None
+index_manager = None
+index_watcher_task = None
 
 app = FastAPI(
     title="智能API路由与调用服务",
     description="提供任务规划、API参数填充和Groovy脚本生成三大功能。",
     version="13.0.0"
 )
+# 在响应头中输出本次请求各阶段的耗时（Server-Timing）
+app.add_middleware(ServerTimingMiddleware)
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行的事件"""
-    global api_agent, planner, api_json_definitions, llm, query_rewriter_chain
+    global llm, query_rewriter_chain, plan_cache, index_manager, index_watcher_task
     setup_logging()
     logger.info("正在初始化服务，加载模型和数据...")
     try:
-        llm = LLMFactory.create_llm(provider='dashscope')
-        api_agent = ApiRagAgent()
-        planner = TaskPlanner(llm)
-        with open("data/api.json", "r", encoding="utf-8") as f:
-            api_json_definitions = json.load(f)
+        llm = LLMFactory.create_llm()
+        index_manager = IndexManager(embeddings=LLMFactory.create_embeddings())
+        index_manager.add_preparer(_prepare_index_generation)
+        index_manager.add_listener(_bind_index_generation)
+        index_manager.load_initial()
+        plan_cache = create_plan_cache()
+        if settings.enable_index_watcher:
+            index_watcher_task = asyncio.create_task(
+                watch_api_json(index_manager, settings.index_watch_interval_seconds)
+            )
 
         rewrite_prompt = ChatPromptTemplate.from_template(
             """# 角色
@@ -92,12 +117,78 @@ async def startup_event():
         logger.exception(f"服务初始化过程中发生严重错误: {e}")
         raise
 
+def _prepare_index_generation(generation: IndexGeneration) -> None:
+    """
+    为新一代索引创建Schema注册表、Agent、候选API选择器、规划器和计划执行器，存入generation.services
+
+    由IndexManager在新一代生效前调用；热切换时与建索引一起在线程池中执行，不阻塞事件循环。
+    """
+    vsm = generation.vector_store_manager
+    schema_registry = ApiSchemaRegistry.from_definitions(generation.api_definitions)
+    candidate_selector = None
+    if settings.enable_planner_candidate_selection:
+        candidate_selector = CandidateSelector(vsm, prerequisites=PREREQUISITE_RULES)
+    generation.services.update(
+        agent=ApiRagAgent(vector_store_manager=vsm, llm=llm, schema_registry=schema_registry),
+        planner=TaskPlanner(llm, candidate_selector=candidate_selector),
+        executor=PlanExecutor(generation.api_definitions)
+    )
+
+def _bind_index_generation(generation: IndexGeneration) -> None:
+    """
+    把新一代索引的Agent、规划器、计划执行器与API定义一起替换到全局引用
+
+    由IndexManager在切换时同步调用，只做引用赋值，中间没有await，其他协程不会看到只切换了一半的状态。
+    """
+    global api_agent, planner, plan_executor, api_json_definitions, api_catalog_hash
+    api_agent = generation.services["agent"]
+    planner = generation.services["planner"]
+    plan_executor = generation.services["executor"]
+    api_json_definitions = generation.api_definitions
+    api_catalog_hash = generation.catalog_hash
+
+class PinnedIndex(NamedTuple):
+    agent: ApiRagAgent
+    planner: TaskPlanner
+    api_definitions: List[Dict[str, Any]]
+    catalog_hash: str
+    executor: PlanExecutor
+
+@contextmanager
+def _pinned_index():
+    """
+    固定本次请求使用的索引代
+
+    请求期间发生热切换时，仍使用进入时的Agent、规划器、计划执行器和API定义；旧代的集合在所有固定它的请求结束后才删除。
+    """
+    generation = index_manager.acquire() if index_manager is not None else None
+    try:
+        yield PinnedIndex(api_agent, planner, api_json_definitions, api_catalog_hash, plan_executor)
+    finally:
+        if generation is not None:
+            index_manager.release(generation)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭时释放共享的模型客户端和HTTP连接池"""
+    if index_watcher_task is not None:
+        index_watcher_task.cancel()
+    await client_registry.aclear()
+    logger.info("共享客户端已释放。")
+
 class PlanRequestBody(BaseModel):
     query: str
 
+class PlanExecuteRequestBody(BaseModel):
+    plan: Dict[str, Any] = Field(..., description="/plan返回的任务计划")
+    known_data: Dict[str, Any] = Field(default_factory=dict, description="调用端已知的参数键值对")
+
 class ApiCallRequestBody(BaseModel):
     query: str
 
+class BatchApiCallRequestBody(BaseModel):
+    queries: List[str] = Field(..., description="需要批量生成API调用的自然语言需求列表")
+
 class GroovyRequestBody(BaseModel):
     query: str
     known_data: Dict[str, Any] = Field(default_factory=dict, description="调用端已知的参数键值对")
@@ -108,25 +199,255 @@ async def create_plan(request: PlanRequestBody):
     if not user_query:
         raise HTTPException(status_code=400, detail="Query不能为空")
 
+    speculative_recall = None
     try:
-        logger.info(f"接收到原始请求: '{user_query}'，正在进行查询改写...")
-        rewritten_query = query_rewriter_chain.invoke({"user_query": user_query})
-        logger.info(f"改写后的查询: '{rewritten_query}'")
+        with _pinned_index() as index:
+            cache = _PlanCacheSession(index, user_query)
+            cached = await cache.lookup_exact()
+            if cached is not None:
+                return cached["plan"]
 
-        logger.info(f"调用TaskPlanner...")
-        plan = planner.plan(rewritten_query, api_json_definitions)
-        
-        if not plan or "error" in plan or not plan.get("tasks"):
-            error_detail = {"error": "无法为您的需求生成有效的执行计划。", "planner_details": plan}
-            logger.warning(f"TaskPlanner处理失败: {error_detail}")
-            raise HTTPException(status_code=404, detail=error_detail)
-        
-        logger.info(f"成功生成任务规划: {plan}")
-        return plan
+            # 流水线模式：候选API召回先用原始查询，与查询改写并行
+            selector = getattr(index.planner, "candidate_selector", None)
+            if settings.enable_plan_pipelining and isinstance(selector, CandidateSelector) \
+                    and len(index.api_definitions or []) > selector.top_n:
+                speculative_recall = asyncio.create_task(_speculative_recall(selector, user_query))
+
+            logger.info(f"接收到原始请求: '{user_query}'，正在进行查询改写...")
+            rewritten_query = await _rewrite_query(user_query)
+            logger.info(f"改写后的查询: '{rewritten_query}'")
+
+            cached = await cache.lookup_semantic(rewritten_query)
+            if cached is not None:
+                return cached["plan"]
+
+            candidates = None
+            if speculative_recall is not None:
+                candidates = await _resolve_candidates(
+                    selector, speculative_recall, rewritten_query, index.api_definitions
+                )
+
+            logger.info(f"调用TaskPlanner...")
+            plan = await index.planner.aplan(rewritten_query, index.api_definitions, candidates=candidates)
+            
+            if not plan or "error" in plan or not plan.get("tasks"):
+                error_detail = {"error": "无法为您的需求生成有效的执行计划。", "planner_details": plan}
+                logger.warning(f"TaskPlanner处理失败: {error_detail}")
+                raise HTTPException(status_code=404, detail=error_detail)
+            
+            logger.info(f"成功生成任务规划: {plan}")
+            await cache.store(rewritten_query, plan)
+            return plan
 
     except Exception as e:
         logger.exception(f"处理规划请求时发生未知错误: {e}")
         raise HTTPException(status_code=500, detail={"error": "处理请求时发生内部错误。"})
+    finally:
+        if speculative_recall is not None and not speculative_recall.done():
+            speculative_recall.cancel()
+
+async def _rewrite_query(user_query: str) -> str:
+    """调用查询改写链，记录rewrite阶段的span和token用量"""
+    with tracer.span("rewrite") as span:
+        return await query_rewriter_chain.ainvoke({"user_query": user_query}, config=tracer.llm_config(span))
+
+async def _speculative_recall(selector: CandidateSelector, user_query: str):
+    """用原始查询做候选API召回（与查询改写并行，记为recall阶段），失败时返回None，由规划器自行筛选"""
+    try:
+        with tracer.span("recall"):
+            return await selector.arecall(user_query)
+    except Exception as e:
+        logger.warning(f"原始查询候选API召回失败: {e}")
+        return None
+
+async def _resolve_candidates(
+    selector: CandidateSelector,
+    speculative_recall: "asyncio.Task",
+    rewritten_query: str,
+    api_definitions: List[Dict[str, Any]]
+):
+    """
+    取出原始查询的召回结果，改写后的查询候选集有实质差异时重新召回
+
+    Returns:
+        候选API定义列表；召回失败时返回None，由规划器按原流程处理
+    """
+    recalled = await speculative_recall
+    if recalled is None:
+        return None
+    if await selector.aneeds_refinement(recalled, rewritten_query):
+        logger.info("改写后的查询候选集与原始查询差异较大，重新召回候选API。")
+        try:
+            with tracer.span("refine"):
+                recalled = await selector.arecall(rewritten_query)
+        except Exception as e:
+            logger.warning(f"改写后查询的候选API召回失败: {e}")
+            return None
+    return selector.select_from_recall(recalled, api_definitions)
+
+@app.post("/plan/stream", summary="生成任务规划（SSE流式返回）")
+async def create_plan_stream(request: PlanRequestBody):
+    """
+    /plan的Server-Sent Events版本，每个阶段完成时推送一个事件：
+    rewrite_token（改写的流式片段）、rewritten_query、cache_hit、candidates、plan_token（规划的流式片段）、
+    plan（最终计划）或error，最后以done结束。首字节在改写模型输出第一个token时即到达。
+    """
+    user_query = request.query
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query不能为空")
+
+    async def stages():
+        with _pinned_index() as index:
+            cache = _PlanCacheSession(index, user_query)
+            cached = await cache.lookup_exact()
+            if cached is not None:
+                yield sse_event("cache_hit", {"layer": "exact"})
+                yield sse_event("plan", cached["plan"])
+                return
+
+            logger.info(f"接收到原始请求(流式): '{user_query}'，正在进行查询改写...")
+            rewritten_query = ""
+            with tracer.stream_span("rewrite") as span:
+                async for chunk in query_rewriter_chain.astream(
+                    {"user_query": user_query}, config=tracer.llm_config(span)
+                ):
+                    text = chunk_text(chunk)
+                    if text:
+                        rewritten_query += text
+                        yield sse_event("rewrite_token", {"text": text})
+            yield sse_event("rewritten_query", {"query": rewritten_query})
+
+            cached = await cache.lookup_semantic(rewritten_query)
+            if cached is not None:
+                yield sse_event("cache_hit", {"layer": "semantic"})
+                yield sse_event("plan", cached["plan"])
+                return
+
+            plan = None
+            async for kind, payload in index.planner.astream_plan(rewritten_query, index.api_definitions):
+                if kind == "candidates":
+                    yield sse_event("candidates", {"apis": payload})
+                elif kind == "token":
+                    yield sse_event("plan_token", {"text": payload})
+                else:
+                    plan = payload
+
+            if not plan or "error" in plan or not plan.get("tasks"):
+                logger.warning(f"TaskPlanner处理失败(流式): {plan}")
+                yield sse_event("error", {"error": "无法为您的需求生成有效的执行计划。", "planner_details": plan})
+                return
+
+            logger.info(f"成功生成任务规划(流式): {plan}")
+            await cache.store(rewritten_query, plan)
+            yield sse_event("plan", plan)
+
+    return _sse_response(stages(), "流式规划请求")
+
+def _sse_response(stages: AsyncIterator[str], description: str) -> StreamingResponse:
+    """把按阶段产出的SSE事件包装成流式响应，异常转为error事件，最后总是推送done事件"""
+    async def events():
+        try:
+            async for event in stages:
+                yield event
+        except Exception as e:
+            logger.exception(f"处理{description}时发生未知错误: {e}")
+            yield sse_event("error", {"error": "处理请求时发生内部错误。"})
+        yield sse_event("done", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+class _PlanCacheSession:
+    """
+    一次规划请求的缓存流程，/plan与/plan/stream共用：精确匹配 → 改写后语义匹配 → 写入新规划。
+    未启用任务规划缓存时每一步都是空操作；后端读写通过PlanCache的异步接口在线程池中执行。
+    """
+
+    def __init__(self, index: PinnedIndex, user_query: str):
+        self.cache = plan_cache
+        self.index = index
+        self.user_query = user_query
+        self.query_embedding = None
+
+    async def lookup_exact(self) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        return await self.cache.alookup_exact(self.user_query, self.index.catalog_hash)
+
+    async def lookup_semantic(self, rewritten_query: str) -> Optional[Dict[str, Any]]:
+        """按改写后的查询做语义匹配，命中时把原始查询写入精确匹配层"""
+        if self.cache is None:
+            return None
+        self.query_embedding = await _embed_for_plan_cache(self.index.agent, rewritten_query)
+        if self.query_embedding is None:
+            self.cache.record_miss()
+            return None
+        cached = await self.cache.alookup_semantic(rewritten_query, self.query_embedding, self.index.catalog_hash)
+        if cached is not None:
+            await self.cache.astore(
+                self.user_query, cached["rewritten_query"], cached["plan"], self.index.catalog_hash
+            )
+        return cached
+
+    async def store(self, rewritten_query: str, plan: Dict[str, Any]) -> None:
+        if self.cache is not None:
+            await self.cache.astore(
+                self.user_query, rewritten_query, plan, self.index.catalog_hash, self.query_embedding
+            )
+
+async def _embed_for_plan_cache(agent: ApiRagAgent, text: str):
+    """为任务规划缓存的语义匹配层计算查询向量，失败时返回None（只使用精确匹配层）。"""
+    try:
+        return await run_blocking(agent.embeddings.embed_query, text)
+    except Exception as e:
+        logger.warning(f"计算任务规划缓存查询向量失败，跳过语义匹配: {e}")
+        return None
+
+@app.get("/plan/cache/stats", summary="任务规划缓存统计")
+async def get_plan_cache_stats():
+    if plan_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **plan_cache.stats()}
+
+@app.get("/embeddings/cache/stats", summary="查询嵌入缓存统计")
+async def get_embedding_cache_stats():
+    embeddings = api_agent.embeddings if api_agent is not None else None
+    if not isinstance(embeddings, CachedEmbeddings):
+        return {"enabled": False}
+    return {"enabled": True, **embeddings.stats()}
+
+@app.get("/rerank/cache/stats", summary="重排序结果缓存统计")
+async def get_rerank_cache_stats():
+    reranker = api_agent.retriever.reranker if api_agent is not None else None
+    if reranker is None or reranker.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model": reranker.model_name, **reranker.cache.stats()}
+
+@app.get("/rerank/gate/stats", summary="重排序置信度门控统计")
+async def get_rerank_gate_stats():
+    gate = api_agent.retriever.gate if api_agent is not None else None
+    if gate is None:
+        return {"enabled": False}
+    return gate.stats()
+
+@app.get("/metrics", summary="Prometheus格式的流水线阶段耗时、token用量和缓存命中指标")
+async def get_metrics():
+    return PlainTextResponse(tracer.metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admin/index", summary="当前API索引代信息")
+async def get_index_info():
+    if index_manager is None:
+        return {"enabled": False}
+    return {"enabled": True, **index_manager.stats()}
+
+@app.post("/admin/index/reload", summary="重新加载api.json并热切换API索引")
+async def reload_index(force: bool = False):
+    if index_manager is None:
+        raise HTTPException(status_code=503, detail="索引管理器未初始化")
+    try:
+        return await index_manager.areload(force=force)
+    except Exception as e:
+        logger.exception(f"API索引热切换失败: {e}")
+        raise HTTPException(status_code=500, detail={"error": "API索引重建失败，继续使用当前索引。"})
 
 @app.post("/generate-api-call", summary="生成单次API调用")
 async def generate_api_call(request: ApiCallRequestBody):
@@ -136,7 +457,8 @@ async def generate_api_call(request: ApiCallRequestBody):
 
     try:
         logger.info(f"接收到API调用生成请求: '{user_query}'，调用ApiRagAgent...")
-        result = api_agent.generate_api_call(user_query)
+        with _pinned_index() as index:
+            result = await index.agent.agenerate_api_call(user_query)
         
         if "error" in result:
             logger.warning(f"Agent处理失败: {result['error']}")
@@ -149,6 +471,84 @@ async def generate_api_call(request: ApiCallRequestBody):
         logger.exception(f"处理API调用生成请求时发生未知错误: {e}")
         raise HTTPException(status_code=500, detail={"error": "处理请求时发生内部错误。"})
 
+@app.post("/generate-api-call/stream", summary="生成单次API调用（SSE流式返回）")
+async def generate_api_call_stream(request: ApiCallRequestBody):
+    """
+    /generate-api-call的Server-Sent Events版本，依次推送retrieved（检索到的API及分数）、
+    params_rule（规则提取的参数）、params_token（大模型参数JSON的流式片段）、result（最终API调用信息）
+    或error事件，最后以done结束。
+    """
+    user_query = request.query
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Query不能为空")
+
+    async def stages():
+        logger.info(f"接收到API调用生成请求(流式): '{user_query}'")
+        with _pinned_index() as index:
+            async for kind, payload in index.agent.astream_api_call(user_query):
+                if kind == "params_token":
+                    yield sse_event(kind, {"text": payload})
+                else:
+                    yield sse_event(kind, payload)
+
+    return _sse_response(stages(), "流式API调用生成请求")
+
+@app.post("/generate-api-call/batch", summary="批量生成API调用（NDJSON流式返回）")
+async def generate_api_call_batch(request: BatchApiCallRequestBody):
+    queries = request.queries
+    if not queries:
+        raise HTTPException(status_code=400, detail="queries不能为空")
+    if len(queries) > settings.batch_max_queries:
+        raise HTTPException(status_code=400, detail=f"单次最多支持{settings.batch_max_queries}个查询")
+
+    valid = [(input_index, query) for input_index, query in enumerate(queries) if query and query.strip()]
+    logger.info(f"接收到批量API调用生成请求，共 {len(queries)} 个查询，有效 {len(valid)} 个")
+
+    async def ndjson_lines():
+        for input_index, query in enumerate(queries):
+            if not query or not query.strip():
+                yield _ndjson_line({"index": input_index, "query": query, "error": "Query不能为空"})
+
+        if not valid:
+            return
+        try:
+            with _pinned_index() as index:
+                async for position, result in index.agent.agenerate_api_calls([query for _, query in valid]):
+                    input_index, query = valid[position]
+                    line = {"index": input_index, "query": query}
+                    if "error" in result:
+                        line["error"] = result["error"]
+                    else:
+                        line["result"] = result
+                    yield _ndjson_line(line)
+        except Exception as e:
+            logger.exception(f"处理批量API调用生成请求时发生未知错误: {e}")
+            yield _ndjson_line({"error": "处理请求时发生内部错误。"})
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+def _ndjson_line(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+@app.post("/plan/execute", summary="执行任务规划")
+async def execute_plan(request: PlanExecuteRequestBody):
+    """
+    执行/plan生成的任务计划：parallel节点并发执行，前序步骤的输出（如staffId）传递给后续步骤。
+    返回每个步骤的请求、响应和状态；某一步骤最终失败或整体超时时，未完成的步骤被取消。
+    请求只发往配置的plan_exec_base_url或API定义中的base_url，调用方不能指定目标地址。
+    """
+    try:
+        with _pinned_index() as index:
+            result = await index.executor.execute(request.plan, request.known_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e)})
+    except Exception as e:
+        logger.exception(f"处理任务计划执行请求时发生未知错误: {e}")
+        raise HTTPException(status_code=500, detail={"error": "处理请求时发生内部错误。"})
+
+    logger.info(f"任务计划执行完成，状态: {result['status']}，耗时: {result['elapsed_ms']}ms")
+    return result
+
 @app.post("/generate-groovy-script", summary="生成Groovy脚本")
 async def generate_groovy_script(request: GroovyRequestBody):
     user_query = request.query
@@ -160,13 +560,15 @@ async def generate_groovy_script(request: GroovyRequestBody):
         logger.info(f"接收到Groovy脚本生成请求: '{user_query}'，已知数据: {known_data}")
         
         # 1. 找到对应的API定义
-        api_doc = api_agent._get_api_doc_from_retrieval(user_query)
-        if not api_doc:
-            raise HTTPException(status_code=404, detail={"error": "无法找到与您的需求匹配的API。"})
-        api_definition = api_doc.metadata
+        with _pinned_index() as index:
+            api_doc = await index.agent._aget_api_doc_from_retrieval(user_query)
+            if not api_doc:
+                raise HTTPException(status_code=404, detail={"error": "无法找到与您的需求匹配的API。"})
+            api_definition = api_doc.metadata
+            schema = index.agent.schemas.for_metadata(api_definition)
 
         # 2. 生成Groovy脚本
-        script = GroovyScriptGenerator.generate(api_definition, known_data)
+        script = GroovyScriptGenerator.generate(api_definition, known_data, schema)
         
         logger.info(f"成功为API '{api_definition.get('name')}' 生成Groovy脚本。")
         return {"groovy_script": script}
@@ -0,0 +1,146 @@
+"""
+规划候选API筛选
+Retrieval pre-filter that prunes the API catalog before it is sent to the planner
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from config.settings import settings
+from src.retrieval.bm25_index import tokenize
+from src.utils.async_utils import run_blocking
+from src.vectorize.vectorizer import VectorStoreManager
+
+
+class CandidateSelector:
+    """
+    在任务规划之前，用向量检索从API目录中挑出与用户需求相关的候选API。
+
+    候选集 = 向量检索top-N + 业务规则中声明的（传递）前置依赖API。
+    当召回置信度过低（最相近的API距离仍超过阈值）时，回退为完整目录，保证规划质量不下降。
+    """
+
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreManager,
+        prerequisites: Optional[Dict[str, List[str]]] = None,
+        top_n: Optional[int] = None,
+        max_distance: Optional[float] = None
+    ):
+        """
+        Args:
+            vector_store_manager: 已加载'api_docs'集合的向量存储管理器
+            prerequisites: 前置依赖规则，API名称 -> 调用它之前必须先调用的API名称列表
+            top_n: 向量检索召回的候选API数量
+            max_distance: top-1召回结果允许的最大向量距离，超过则回退到完整目录
+        """
+        self.vsm = vector_store_manager
+        self.prerequisites = prerequisites or {}
+        self.top_n = top_n or settings.planner_candidate_k
+        self.max_distance = max_distance if max_distance is not None else settings.planner_candidate_max_distance
+
+    def select(self, query: str, api_json: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        筛选候选API
+
+        Args:
+            query: 用户需求（通常是改写后的查询）
+            api_json: 完整的API定义列表
+
+        Returns:
+            List[Dict[str, Any]]: 候选API定义列表（保持原目录顺序）
+        """
+        if len(api_json) <= self.top_n:
+            return api_json
+        try:
+            recalled = self.vsm.similarity_search_with_score(query, k=self.top_n)
+        except Exception as e:
+            logger.error(f"候选API检索失败，使用完整API目录: {e}")
+            return api_json
+        return self.select_from_recall(recalled, api_json)
+
+    async def aselect(self, query: str, api_json: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """select的异步版本"""
+        if len(api_json) <= self.top_n:
+            return api_json
+        try:
+            recalled = await self.arecall(query)
+        except Exception as e:
+            logger.error(f"候选API检索失败，使用完整API目录: {e}")
+            return api_json
+        return self.select_from_recall(recalled, api_json)
+
+    async def arecall(self, query: str) -> List[Tuple[Document, float]]:
+        """候选API向量召回（异步），流水线模式下与查询改写并行执行"""
+        return await self.vsm.asimilarity_search_with_score(query, k=self.top_n)
+
+    def needs_refinement(self, recalled: List[Tuple[Document, float]], rewritten_query: str) -> bool:
+        """
+        判断用原始查询召回的候选集是否需要用改写后的查询重新召回
+
+        原始查询召回置信度过低时需要；否则用BM25对改写后的查询做一次亚毫秒级的词法检索，
+        其top结果落在已有候选集中的比例低于plan_refine_min_overlap时，认为候选集有实质差异。
+        没有词法索引时退化为比较召回文档与改写后查询的词重合度。
+        """
+        if not recalled or recalled[0][1] > self.max_distance:
+            return True
+        lexical = self.vsm.lexical_search(rewritten_query, k=settings.plan_refine_check_k)
+        return self._diverges(recalled, rewritten_query, lexical)
+
+    async def aneeds_refinement(self, recalled: List[Tuple[Document, float]], rewritten_query: str) -> bool:
+        """needs_refinement的异步版本：词法检索（索引未加载时会先构建）在线程池中执行，不阻塞事件循环"""
+        if not recalled or recalled[0][1] > self.max_distance:
+            return True
+        lexical = await run_blocking(self.vsm.lexical_search, rewritten_query, k=settings.plan_refine_check_k)
+        return self._diverges(recalled, rewritten_query, lexical)
+
+    @staticmethod
+    def _diverges(
+        recalled: List[Tuple[Document, float]],
+        rewritten_query: str,
+        lexical: List[Tuple[Document, float]]
+    ) -> bool:
+        recalled_names = {doc.metadata.get("name") for doc, _ in recalled}
+        if lexical:
+            covered = sum(doc.metadata.get("name") in recalled_names for doc, _ in lexical)
+            return covered / len(lexical) < settings.plan_refine_min_overlap
+
+        query_tokens = set(tokenize(rewritten_query))
+        recalled_tokens = set(tokenize(" ".join(doc.page_content for doc, _ in recalled)))
+        if not query_tokens:
+            return False
+        return len(query_tokens & recalled_tokens) / len(query_tokens) < settings.plan_refine_min_overlap
+
+    def select_from_recall(
+        self,
+        recalled: List[Tuple[Document, float]],
+        api_json: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """根据召回结果筛选候选API（置信度过低时返回完整目录）"""
+        if not recalled or recalled[0][1] > self.max_distance:
+            top_distance = recalled[0][1] if recalled else None
+            logger.info(f"候选API召回置信度过低(top-1距离: {top_distance})，使用完整API目录。")
+            return api_json
+
+        names = self.expand_prerequisites(doc.metadata.get("name") for doc, _ in recalled)
+        candidates = [api for api in api_json if api.get("name") in names]
+        if not candidates:
+            logger.warning("召回的API均不在当前API目录中，使用完整API目录。")
+            return api_json
+
+        logger.info(f"候选API筛选完成: {len(api_json)} -> {len(candidates)}")
+        return candidates
+
+    def expand_prerequisites(self, names: Iterable[str]) -> Set[str]:
+        """沿前置依赖规则做传递闭包"""
+        selected: Set[str] = set()
+        stack = [name for name in names if name]
+        while stack:
+            name = stack.pop()
+            if name in selected:
+                continue
+            selected.add(name)
+            stack.extend(self.prerequisites.get(name, []))
+        return selected
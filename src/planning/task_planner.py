@@ -1,14 +1,73 @@
 import json
 import re
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from src.utils.sse import chunk_text
+from src.utils.tracing import tracer
+
+# 核心业务规则中声明的前置依赖: API名称 -> 调用它之前必须先调用的API名称列表
+PREREQUISITE_RULES = {
+    "提交请假申请": ["获取员工项目信息"],
+    "提交加班申请": ["获取员工项目信息"],
+}
 
 class TaskPlanner:
-    def __init__(self, llm):
+    def __init__(self, llm, candidate_selector=None):
+        """
+        Args:
+            llm: 用于规划的大模型
+            candidate_selector: 可选的CandidateSelector，规划前先从完整目录中筛选候选API
+        """
         self.llm = llm
+        self.candidate_selector = candidate_selector
 
-    def plan(self, user_query: str, api_json: list) -> dict:
+    def plan(self, user_query: str, api_json: list, candidates: Optional[list] = None) -> dict:
         """
         调用大模型，根据用户意图，动态规划出一个包含多步骤、串并行关系、且每个任务都包含api_name的workflow。
+        candidates为调用方已筛选好的候选API（如流水线模式下提前召回），此时不再重复筛选。
+        """
+        if candidates is not None:
+            api_json = candidates
+        elif self.candidate_selector is not None:
+            api_json = self.candidate_selector.select(user_query, api_json)
+        prompt = self._build_prompt(user_query, api_json)
+        with tracer.span("planner", candidates=len(api_json)) as span:
+            response = self.llm.invoke(prompt, config=tracer.llm_config(span))
+        return self._parse_response(response)
+
+    async def aplan(self, user_query: str, api_json: list, candidates: Optional[list] = None) -> dict:
         """
+        plan的异步版本，通过llm.ainvoke调用大模型，不阻塞事件循环。
+        """
+        if candidates is not None:
+            api_json = candidates
+        elif self.candidate_selector is not None:
+            api_json = await self.candidate_selector.aselect(user_query, api_json)
+        prompt = self._build_prompt(user_query, api_json)
+        with tracer.span("planner", candidates=len(api_json)) as span:
+            response = await self.llm.ainvoke(prompt, config=tracer.llm_config(span))
+        return self._parse_response(response)
+
+    async def astream_plan(self, user_query: str, api_json: list) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        流式规划：依次产出("candidates", 候选API名称列表)（启用候选筛选时）、
+        若干("token", 大模型输出片段)，最后产出("plan", 解析后的计划)。
+        """
+        if self.candidate_selector is not None:
+            api_json = await self.candidate_selector.aselect(user_query, api_json)
+            yield "candidates", [api.get("name") for api in api_json]
+        prompt = self._build_prompt(user_query, api_json)
+        raw_text = ""
+        with tracer.stream_span("planner", candidates=len(api_json)) as span:
+            async for chunk in self.llm.astream(prompt, config=tracer.llm_config(span)):
+                text = chunk_text(chunk)
+                if text:
+                    raw_text += text
+                    yield "token", text
+        yield "plan", self._parse_response(raw_text)
+
+    def _build_prompt(self, user_query: str, api_json: list) -> str:
+        """构建任务规划的Prompt。"""
         api_signatures = [
             {"name": api.get("name"), "description": api.get("description")}
             for api in api_json
@@ -64,7 +123,10 @@ class TaskPlanner:
 }}
 ```
 """
-        response = self.llm.invoke(prompt)
+        return prompt
+
+    def _parse_response(self, response) -> dict:
+        """从大模型的输出中解析出任务计划JSON。"""
         raw_text = str(response.content) if hasattr(response, 'content') else str(response)
         
         match = re.search(r"```json\n(\{.*?\})\n```", raw_text, re.DOTALL)
@@ -3,27 +3,40 @@
 Reranking utilities for improving RAG retrieval quality
 """
 
-from typing import List, Tuple, Optional, Dict, Any
+import asyncio
+from typing import List, Tuple, Optional, Dict
 from langchain_core.documents import Document
 from loguru import logger
 import dashscope
 from dashscope import TextReRank
 from config.settings import settings
-import time
+from src.cache.rerank_cache import RerankCache
+from src.vectorize.api_documents import document_id
+from src.retrieval.rank_fusion import merge_top_k
+from src.utils.async_utils import run_blocking, run_coroutine_sync
+from src.utils.client_registry import client_registry, get_http_session
+from src.utils.rate_limiter import TokenBucket
+from src.utils.tracing import tracer
 
 
 class RerankerManager:
     """重排序管理器"""
     
-    def __init__(self, model_name: Optional[str] = None):
+    def __init__(self, model_name: Optional[str] = None, cache: Optional[RerankCache] = None):
         """
         初始化重排序管理器
         
         Args:
             model_name: 重排序模型名称
+            cache: 重排序结果缓存，默认按配置创建
         """
         self.model_name = model_name or settings.rerank_model
         self.api_key = settings.dashscope_api_key
+        if cache is None and settings.enable_rerank_cache:
+            cache = RerankCache(settings.rerank_cache_max_entries)
+        self.cache = cache
+        # 批量/多查询并发调用重排序API时的限流器，同一模型的共享实例共用
+        self.rate_limiter = TokenBucket(settings.rerank_rate_limit_qps, settings.rerank_rate_limit_burst)
         
         if not self.api_key:
             logger.warning("阿里云百炼API密钥未设置，重排序功能将被禁用")
@@ -32,6 +45,20 @@ class RerankerManager:
             dashscope.api_key = self.api_key
             self.enabled = True
             logger.info(f"重排序管理器初始化成功，模型: {self.model_name}")
+
+    @classmethod
+    def get_shared(cls, model_name: Optional[str] = None) -> "RerankerManager":
+        """
+        获取进程内共享的重排序管理器（按模型名称区分）
+
+        Args:
+            model_name: 重排序模型名称
+
+        Returns:
+            RerankerManager: 共享实例
+        """
+        model_name = model_name or settings.rerank_model
+        return client_registry.get_or_create(("reranker", "dashscope", model_name), lambda: cls(model_name))
     
     def rerank_documents(
         self, 
@@ -75,38 +102,76 @@ class RerankerManager:
                 logger.warning("没有有效的文档用于重排序")
                 return [(doc, 1.0) for doc in documents[:top_k]]
 
-            logger.debug(f"开始重排序，查询: {query[:50]}..., 有效文档数量: {len(doc_texts)}")
+            with tracer.span("rerank", documents=len(doc_texts)):
+                top_n = min(top_k, len(doc_texts))
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = RerankCache.make_key(query, valid_documents, self.model_name, top_n)
+                    ranking = self.cache.get(cache_key)
+                    tracer.record_cache("rerank", ranking is not None)
+                    if ranking is not None:
+                        logger.debug(f"重排序缓存命中，查询: {query[:50]}...")
+                        return [(valid_documents[doc_index], score) for doc_index, score in ranking]
 
-            # 调用阿里云百炼重排序API
-            response = TextReRank.call(
-                model=self.model_name,
-                query=query,
-                documents=doc_texts,
-                top_n=min(top_k, len(doc_texts)),
-                return_documents=True
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"重排序API调用失败: {response.message}")
-                return [(doc, 1.0) for doc in documents[:top_k]]
+                logger.debug(f"开始重排序，查询: {query[:50]}..., 有效文档数量: {len(doc_texts)}")
+
+                # 调用阿里云百炼重排序API
+                response = TextReRank.call(
+                    model=self.model_name,
+                    query=query,
+                    documents=doc_texts,
+                    top_n=top_n,
+                    return_documents=True,
+                    session=get_http_session("dashscope")
+                )
             
-            # 解析重排序结果
-            reranked_results = []
-            for result in response.output.results:
-                doc_index = result.index
-                score = result.relevance_score
-
-                if 0 <= doc_index < len(valid_documents):
-                    reranked_results.append((valid_documents[doc_index], score))
+                if response.status_code != 200:
+                    logger.error(f"重排序API调用失败: {response.message}")
+                    return [(doc, 1.0) for doc in documents[:top_k]]
             
-            logger.info(f"重排序完成，返回 {len(reranked_results)} 个文档")
-            return reranked_results
+                # 解析重排序结果
+                ranking = []
+                for result in response.output.results:
+                    doc_index = result.index
+                    score = result.relevance_score
+
+                    if 0 <= doc_index < len(valid_documents):
+                        ranking.append((doc_index, score))
+
+                # 只缓存成功的结果，失败时的回退结果不写入缓存
+                if cache_key is not None:
+                    self.cache.set(cache_key, ranking)
+
+                reranked_results = [(valid_documents[doc_index], score) for doc_index, score in ranking]
+                logger.info(f"重排序完成，返回 {len(reranked_results)} 个文档")
+                return reranked_results
             
         except Exception as e:
             logger.error(f"重排序过程中发生错误: {e}")
             # 发生错误时返回原始文档
             return [(doc, 1.0) for doc in documents[:top_k]]
     
+    async def arerank_documents(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: Optional[int] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        对文档进行重排序（异步）
+
+        DashScope重排序SDK调用是阻塞的，这里将其放到有界线程池中执行。
+
+        Args:
+            query: 查询文本
+            documents: 文档列表
+            top_k: 返回的文档数量
+
+        Returns:
+            List[Tuple[Document, float]]: (文档, 重排序分数)列表
+        """
+        return await run_blocking(self.rerank_documents, query, documents, top_k)
+
     def rerank_with_scores(
         self, 
         query: str, 
@@ -131,26 +196,29 @@ class RerankerManager:
         if not doc_score_pairs:
             return []
         
-        # 提取文档和原始分数
+        # 提取文档和原始分数，按文档ID建立索引（同一文档出现多次时取第一次的分数）
         documents = [doc for doc, _ in doc_score_pairs]
-        original_scores = [score for _, score in doc_score_pairs]
+        original_scores: Dict[str, float] = {}
+        for doc, score in doc_score_pairs:
+            original_scores.setdefault(document_id(doc), score)
         
         # 进行重排序
         reranked_results = self.rerank_documents(query, documents, top_k)
         
         # 合并原始分数和重排序分数
-        final_results = []
-        for doc, rerank_score in reranked_results:
-            # 找到对应的原始分数
-            orig_score = 1.0
-            for orig_doc, orig_score_val in doc_score_pairs:
-                if orig_doc.page_content == doc.page_content:
-                    orig_score = orig_score_val
-                    break
-            
-            final_results.append((doc, orig_score, rerank_score))
-        
-        return final_results
+        return [
+            (doc, original_scores.get(document_id(doc), 1.0), rerank_score)
+            for doc, rerank_score in reranked_results
+        ]
+
+    async def arerank_with_scores(
+        self,
+        query: str,
+        doc_score_pairs: List[Tuple[Document, float]],
+        top_k: Optional[int] = None
+    ) -> List[Tuple[Document, float, float]]:
+        """rerank_with_scores的异步版本，在有界线程池中执行"""
+        return await run_blocking(self.rerank_with_scores, query, doc_score_pairs, top_k)
     
     def batch_rerank(
         self, 
@@ -158,7 +226,7 @@ class RerankerManager:
         top_k: Optional[int] = None
     ) -> List[List[Tuple[Document, float]]]:
         """
-        批量重排序
+        批量重排序（abatch_rerank的同步包装）
         
         Args:
             queries_docs: (查询, 文档列表)的列表
@@ -167,15 +235,33 @@ class RerankerManager:
         Returns:
             List[List[Tuple[Document, float]]]: 每个查询的重排序结果列表
         """
-        results = []
-        for query, documents in queries_docs:
-            reranked = self.rerank_documents(query, documents, top_k)
-            results.append(reranked)
-            
-            # 添加小延迟避免API限流
-            time.sleep(0.1)
-        
-        return results
+        return run_coroutine_sync(self.abatch_rerank(queries_docs, top_k))
+
+    async def abatch_rerank(
+        self,
+        queries_docs: List[Tuple[str, List[Document]]],
+        top_k: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        批量重排序（异步）：最多concurrency个查询同时调用重排序API，调用速率由令牌桶限制
+
+        Args:
+            queries_docs: (查询, 文档列表)的列表
+            top_k: 每个查询返回的文档数量
+            concurrency: 并发上限，缺省为settings.multi_query_concurrency
+
+        Returns:
+            List[List[Tuple[Document, float]]]: 与queries_docs一一对应的重排序结果列表
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.multi_query_concurrency)
+
+        async def rerank(query: str, documents: List[Document]) -> List[Tuple[Document, float]]:
+            async with semaphore:
+                await self.rate_limiter.acquire()
+                return await self.arerank_documents(query, documents, top_k)
+
+        return list(await asyncio.gather(*(rerank(query, documents) for query, documents in queries_docs)))
 
 
 class HybridRetriever:
@@ -190,7 +276,7 @@ class HybridRetriever:
             reranker: 重排序管理器
         """
         self.vector_store = vector_store
-        self.reranker = reranker or RerankerManager()
+        self.reranker = reranker or RerankerManager.get_shared()
         
     def retrieve_and_rerank(
         self, 
@@ -237,6 +323,33 @@ class HybridRetriever:
         except Exception as e:
             logger.error(f"混合检索过程中发生错误: {e}")
             return []
+
+    async def aretrieve_and_rerank(
+        self,
+        query: str,
+        initial_k: Optional[int] = None,
+        final_k: Optional[int] = None
+    ) -> List[Tuple[Document, float, float]]:
+        """retrieve_and_rerank的异步版本，向量检索和重排序在有界线程池中执行，重排序调用受令牌桶限流"""
+        if initial_k is None:
+            initial_k = settings.rerank_top_k
+        if final_k is None:
+            final_k = settings.rerank_final_k
+
+        try:
+            vector_results = await run_blocking(self.vector_store.similarity_search_with_score, query, k=initial_k)
+            if not vector_results:
+                logger.warning("向量检索未返回任何结果")
+                return []
+
+            if settings.enable_reranking and self.reranker.enabled:
+                await self.reranker.rate_limiter.acquire()
+                return await self.reranker.arerank_with_scores(query, vector_results, final_k)
+            return [(doc, score, score) for doc, score in vector_results[:final_k]]
+
+        except Exception as e:
+            logger.error(f"混合检索过程中发生错误: {e}")
+            return []
     
     def multi_query_retrieve(
         self, 
@@ -244,30 +357,42 @@ class HybridRetriever:
         final_k: Optional[int] = None
     ) -> List[Tuple[Document, float, float]]:
         """
-        多查询检索并去重
+        多查询检索并去重（amulti_query_retrieve的同步包装）
         
         Args:
             queries: 查询列表
             final_k: 最终返回的文档数量
             
+        Returns:
+            List[Tuple[Document, float, float]]: 去重后的文档列表
+        """
+        return run_coroutine_sync(self.amulti_query_retrieve(queries, final_k))
+
+    async def amulti_query_retrieve(
+        self,
+        queries: List[str],
+        final_k: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Tuple[Document, float, float]]:
+        """
+        多查询检索并去重（异步）：各查询并发检索和重排序（并发上限concurrency），
+        结果按文档ID去重后用堆取重排序分数最高的final_k个
+
+        Args:
+            queries: 查询列表
+            final_k: 最终返回的文档数量
+            concurrency: 并发上限，缺省为settings.multi_query_concurrency
+
         Returns:
             List[Tuple[Document, float, float]]: 去重后的文档列表
         """
         if final_k is None:
             final_k = settings.rerank_final_k
-        
-        all_results = []
-        seen_contents = set()
-        
-        for query in queries:
-            results = self.retrieve_and_rerank(query, final_k=final_k * 2)  # 获取更多候选
-            
-            for doc, vec_score, rerank_score in results:
-                content_hash = hash(doc.page_content)
-                if content_hash not in seen_contents:
-                    seen_contents.add(content_hash)
-                    all_results.append((doc, vec_score, rerank_score))
-        
-        # 按重排序分数排序并返回top_k
-        all_results.sort(key=lambda x: x[2], reverse=True)
-        return all_results[:final_k]
+        semaphore = asyncio.Semaphore(concurrency or settings.multi_query_concurrency)
+
+        async def retrieve(query: str) -> List[Tuple[Document, float, float]]:
+            async with semaphore:
+                return await self.aretrieve_and_rerank(query, final_k=final_k * 2)  # 获取更多候选
+
+        results = await asyncio.gather(*(retrieve(query) for query in queries))
+        return merge_top_k(results, final_k, score=lambda result: result[2])
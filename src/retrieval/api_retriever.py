@@ -1,27 +1,45 @@
 # src/retrieval/hybrid_retriever.py
 
-import json
-from typing import List, Tuple
+import asyncio
+from typing import List, Optional, Tuple
 from langchain_core.documents import Document
 from loguru import logger
 
 from src.vectorize.vectorizer import VectorStoreManager
 from src.rerank.reranker import RerankerManager
+from src.retrieval.rank_fusion import reciprocal_rank_fusion
+from src.retrieval.rerank_gate import RerankGate
+from src.utils.async_utils import run_blocking
+from src.vectorize.api_documents import SCORE_SOURCE_RERANK, SCORE_SOURCE_RRF, SCORE_SOURCE_VECTOR, with_score_source
 from config.settings import settings
 
 class ApiRetriever:
     """
-    一个专门用于API检索的检索器，流程为：向量检索 -> Reranker精排。
+    一个专门用于API检索的检索器，流程为：向量检索 + BM25词法检索 -> RRF融合 -> Reranker精排。
+    召回结果无歧义时（见RerankGate）跳过精排。
+
+    向量检索擅长语义近似，BM25擅长接口名、路径片段、参数名等字面匹配，两路按排名融合后
+    取前vector_k个候选交给Reranker，精排的候选数量不变。
+
+    返回结果的文档元数据中带有score_source，注明分数来自Reranker、RRF融合还是向量距离。
     """
 
-    def __init__(self, vector_store_manager: VectorStoreManager):
+    def __init__(
+        self,
+        vector_store_manager: VectorStoreManager,
+        reranker: Optional[RerankerManager] = None,
+        gate: Optional[RerankGate] = None
+    ):
         """
         初始化API检索器。
         Args:
             vector_store_manager: 一个已经加载了'api_docs'集合的向量存储管理器。
+            reranker: 重排序管理器，默认使用进程内共享实例。
+            gate: 重排序置信度门控，默认使用进程内共享实例。
         """
         self.vsm = vector_store_manager
-        self.reranker = RerankerManager()
+        self.reranker = reranker or RerankerManager.get_shared()
+        self.gate = gate or RerankGate.get_shared()
         # 确保向量存储已经加载
         if not self.vsm.vector_store:
             logger.warning("传入的VectorStoreManager未加载任何向量存储，请在使用前调用load_vector_store。")
@@ -46,40 +64,208 @@ class ApiRetriever:
         """
         logger.debug(f"开始API检索，查询: '{query}'")
 
-        # --- 1. 向量召回 ---
+        # --- 1. 向量召回 + 词法召回 ---
         try:
             # 使用带分数的搜索，虽然reranker目前不使用原始分数，但保留以备将来之用
             recalled_results = self.vsm.similarity_search_with_score(query, k=vector_k)
-            recalled_docs = [doc for doc, score in recalled_results]
-            logger.debug(f"向量检索召回 {len(recalled_docs)} 个结果。")
+            logger.debug(f"向量检索召回 {len(recalled_results)} 个结果。")
         except Exception as e:
             logger.error(f"向量检索失败: {e}")
             return []
+        lexical_results = self._lexical_recall(query)
 
-        if not recalled_docs:
+        # --- 2. Reranker精排 ---
+        results, rerank_docs = self._apply_gate(query, recalled_results, lexical_results, vector_k, final_k)
+        if results is not None:
+            return results
+        try:
+            reranked_results = self.reranker.rerank_documents(query=query, documents=rerank_docs, top_k=final_k)
+        except Exception as e:
+            logger.error(f"Reranker精排失败: {e}。")
+            return []
+        return self._tag_reranked(reranked_results)
+
+    async def asearch(
+        self,
+        query: str,
+        vector_k: int = 10,
+        final_k: int = 3
+    ) -> List[Tuple[Document, float]]:
+        """
+        执行API检索（异步）。流程与search一致，向量召回与词法召回并发执行，均不阻塞事件循环。
+
+        Args:
+            query (str): 用户的自然语言查询。
+            vector_k (int): 向量检索阶段召回的文档数量。
+            final_k (int): 经过Reranker精排后最终返回的文档数量。
+
+        Returns:
+            List[Tuple[Document, float]]: 返回一个元组列表，每个元组包含一个文档和其相关性分数。
+        """
+        logger.debug(f"开始API检索(异步)，查询: '{query}'")
+
+        # --- 1. 向量召回 + 词法召回 ---
+        try:
+            recalled_results, lexical_results = await asyncio.gather(
+                self.vsm.asimilarity_search_with_score(query, k=vector_k),
+                run_blocking(self._lexical_recall, query)
+            )
+            logger.debug(f"向量检索召回 {len(recalled_results)} 个结果。")
+        except Exception as e:
+            logger.error(f"向量检索失败: {e}")
             return []
 
         # --- 2. Reranker精排 ---
-        if self.reranker.enabled and settings.enable_reranking:
-            logger.debug(f"开始使用Reranker对 {len(recalled_docs)} 个文档进行精排...")
+        results, rerank_docs = self._apply_gate(query, recalled_results, lexical_results, vector_k, final_k)
+        if results is not None:
+            return results
+        try:
+            reranked_results = await self.reranker.arerank_documents(
+                query=query, documents=rerank_docs, top_k=final_k
+            )
+        except Exception as e:
+            logger.error(f"Reranker精排失败: {e}。")
+            return []
+        return self._tag_reranked(reranked_results)
+
+    async def abatch_search(
+        self,
+        queries: List[str],
+        vector_k: int = 10,
+        final_k: int = 3
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        批量执行API检索（异步）。
+
+        所有查询共用一次嵌入调用和一次向量检索（与词法检索并发）；相同的查询只检索、精排一次，
+        不同查询的Reranker请求并发执行。
+
+        Args:
+            queries (List[str]): 用户的自然语言查询列表。
+            vector_k (int): 向量检索阶段每个查询召回的文档数量。
+            final_k (int): 经过Reranker精排后每个查询最终返回的文档数量。
+
+        Returns:
+            List[List[Tuple[Document, float]]]: 与queries一一对应的检索结果。
+        """
+        unique_queries = list(dict.fromkeys(queries))
+        logger.debug(f"开始批量API检索，查询数量: {len(queries)}，去重后: {len(unique_queries)}")
+
+        # --- 1. 批量向量召回 + 词法召回 ---
+        try:
+            recalled_batches, lexical_batches = await asyncio.gather(
+                self.vsm.abatch_similarity_search_with_score(unique_queries, k=vector_k),
+                run_blocking(lambda: [self._lexical_recall(query) for query in unique_queries])
+            )
+        except Exception as e:
+            logger.error(f"批量向量检索失败: {e}")
+            return [[] for _ in queries]
+
+        # --- 2. 分组并发精排 ---
+        async def rerank_one(
+            query: str,
+            recalled_results: List[Tuple[Document, float]],
+            lexical_results: List[Tuple[Document, float]]
+        ):
+            results, rerank_docs = self._apply_gate(query, recalled_results, lexical_results, vector_k, final_k)
+            if results is not None:
+                return results
             try:
-                reranked_results = self.reranker.rerank_documents(
-                    query=query,
-                    documents=recalled_docs,
-                    top_k=final_k
+                reranked_results = await self.reranker.arerank_documents(
+                    query=query, documents=rerank_docs, top_k=final_k
                 )
-                logger.debug(f"Reranker返回 {len(reranked_results)} 个结果。")
-                return reranked_results
             except Exception as e:
                 logger.error(f"Reranker精排失败: {e}。")
                 return []
-        else:
-            # 如果禁用Reranker，直接返回向量检索的结果
+            return self._tag_reranked(reranked_results)
+
+        reranked_batches = await asyncio.gather(*(
+            rerank_one(query, recalled, lexical)
+            for query, recalled, lexical in zip(unique_queries, recalled_batches, lexical_batches)
+        ))
+        results_by_query = dict(zip(unique_queries, reranked_batches))
+        return [results_by_query[query] for query in queries]
+
+    def _apply_gate(
+        self,
+        query: str,
+        recalled_results: List[Tuple[Document, float]],
+        lexical_results: List[Tuple[Document, float]],
+        vector_k: int,
+        final_k: int
+    ) -> Tuple[Optional[List[Tuple[Document, float]]], List[Document]]:
+        """
+        融合两路召回结果，并决定是否需要Reranker精排（search、asearch、abatch_search共用）
+
+        Returns:
+            (最终结果, 待精排文档)：没有候选、未启用Reranker或门控判定无歧义时，第一项为带score_source的最终结果；
+            第一项为None时，调用方对第二项执行精排。
+        """
+        candidates = self._fuse_candidates(recalled_results, lexical_results, vector_k)
+        if not candidates:
+            return [], []
+        candidate_source = self._candidate_source(lexical_results)
+        if not (self.reranker.enabled and settings.enable_reranking):
+            # 如果禁用Reranker，直接返回召回（融合）结果
             logger.warning("Reranker未启用或被禁用，将直接返回向量检索结果。")
-            # ChromaDB返回的是距离，分数越小越好。reranker返回的是相关性，分数越高越好。
-            # 这里我们做一个简单的转换，并截取top_k
-            final_results = []
-            for doc, score in recalled_results[:final_k]:
-                relevance_score = 1.0 - score  # 简单地将距离转换为相关性
-                final_results.append((doc, relevance_score))
-            return final_results
\ No newline at end of file
+            return with_score_source(candidates[:final_k], candidate_source), []
+        gated_results = self.gate.check(query, recalled_results, candidates, final_k, candidate_source)
+        if gated_results is not None:
+            logger.debug("召回结果无歧义，跳过Reranker精排。")
+            return gated_results, []
+        logger.debug(f"开始使用Reranker对 {len(candidates)} 个文档进行精排...")
+        return None, [doc for doc, _ in candidates]
+
+    @staticmethod
+    def _tag_reranked(reranked_results: List[Tuple[Document, float]]) -> List[Tuple[Document, float]]:
+        logger.debug(f"Reranker返回 {len(reranked_results)} 个结果。")
+        return with_score_source(reranked_results, SCORE_SOURCE_RERANK)
+
+    def _lexical_recall(self, query: str) -> List[Tuple[Document, float]]:
+        """BM25词法召回，未启用或失败时返回空列表（仅使用向量召回）"""
+        if not settings.enable_hybrid_retrieval:
+            return []
+        try:
+            lexical_results = self.vsm.lexical_search(query, k=settings.lexical_k)
+            logger.debug(f"词法检索召回 {len(lexical_results)} 个结果。")
+            return lexical_results
+        except Exception as e:
+            logger.warning(f"词法检索失败，仅使用向量召回: {e}")
+            return []
+
+    @staticmethod
+    def _candidate_source(lexical_results: List[Tuple[Document, float]]) -> str:
+        """候选分数的来源：有词法结果时为RRF融合分数，否则为向量距离转换的相关性分数"""
+        return SCORE_SOURCE_RRF if lexical_results else SCORE_SOURCE_VECTOR
+
+    def _fuse_candidates(
+        self,
+        recalled_results: List[Tuple[Document, float]],
+        lexical_results: List[Tuple[Document, float]],
+        vector_k: int
+    ) -> List[Tuple[Document, float]]:
+        """
+        合并两路召回结果，返回(文档, 相关性分数)候选列表：有词法结果时为RRF融合分数，
+        否则为向量距离转换的相关性分数
+        """
+        if not lexical_results:
+            return self._vector_only_results(recalled_results, len(recalled_results))
+        return reciprocal_rank_fusion(
+            [[doc for doc, _ in recalled_results], [doc for doc, _ in lexical_results]],
+            k=settings.rrf_k,
+            limit=vector_k
+        )
+
+    @staticmethod
+    def _vector_only_results(
+        recalled_results: List[Tuple[Document, float]],
+        final_k: int
+    ) -> List[Tuple[Document, float]]:
+        """不经过Reranker时，将向量检索结果转换为相关性分数并截取top_k。"""
+        # ChromaDB返回的是距离，分数越小越好。reranker返回的是相关性，分数越高越好。
+        # 这里我们做一个简单的转换，并截取top_k
+        final_results = []
+        for doc, score in recalled_results[:final_k]:
+            relevance_score = 1.0 - score  # 简单地将距离转换为相关性
+            final_results.append((doc, relevance_score))
+        return final_results
@@ -0,0 +1,180 @@
+"""
+BM25词法索引
+Memory-resident BM25 inverted index over the rendered API markdown, with a CJK-aware tokenizer
+"""
+
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from loguru import logger
+
+_CJK_RUN = re.compile(r"[一-鿿]+")
+_ASCII_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*|\d+")
+_CAMEL_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中英混合分词：中文按单字和相邻二字切分，英文按单词切分并小写，
+    驼峰单词额外拆出各部分（staffId -> staffid, staff, id），路径中的/、{}、_等符号作为分隔符
+    """
+    tokens = []
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _ASCII_WORD.findall(text):
+        tokens.append(word.lower())
+        parts = _CAMEL_PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    常驻内存的BM25倒排索引
+
+    每个词的倒排表是(文档下标, 预先算好的BM25权重)两个numpy数组，查询时只需对命中的倒排表做向量加法，
+    再用argpartition取top-k。
+    """
+
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        doc_lengths: np.ndarray,
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        """
+        Args:
+            documents: 文档列表
+            doc_lengths: 每个文档的词数
+            postings: 词 -> (文档下标数组, 词频数组)
+            k1: BM25词频饱和参数
+            b: BM25长度归一化参数
+        """
+        self.documents = list(documents)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self._tfs = postings
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        n = len(self.documents)
+        avg_length = float(self.doc_lengths.mean()) if n else 0.0
+        for term, (doc_ids, tfs) in postings.items():
+            idf = np.log(1.0 + (n - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            norm = k1 * (1.0 - b + b * self.doc_lengths[doc_ids] / max(avg_length, 1e-6))
+            weights = (idf * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+            self._postings[term] = (doc_ids, weights)
+
+    @classmethod
+    def build(cls, documents: Sequence[Document], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """对文档内容分词并建立倒排索引"""
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+        raw: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc_id, doc in enumerate(documents):
+            counts = Counter(tokenize(doc.page_content))
+            doc_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                ids, tfs = raw.setdefault(term, ([], []))
+                ids.append(doc_id)
+                tfs.append(tf)
+        postings = {
+            term: (np.asarray(ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (ids, tfs) in raw.items()
+        }
+        return cls(documents, doc_lengths, postings, k1, b)
+
+    @classmethod
+    def from_chroma(cls, chroma: Any, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """从Chroma集合中读取全部文档并建立索引"""
+        data = chroma._collection.get(include=["documents", "metadatas"])
+        documents = [
+            Document(page_content=content or "", metadata=metadata or {})
+            for content, metadata in zip(data.get("documents") or [], data.get("metadatas") or [])
+        ]
+        return cls.build(documents, k1, b)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Document, float]]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询文本
+            k: 返回文档数量
+
+        Returns:
+            List[Tuple[Document, float]]: (文档, BM25分数)列表，分数越高越相关，不含零分文档
+        """
+        if not self.documents or k <= 0:
+            return []
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                doc_ids, weights = posting
+                scores[doc_ids] += weights
+
+        hits = int(np.count_nonzero(scores))
+        if hits == 0:
+            return []
+        k = min(k, hits)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def save(self, path: str) -> None:
+        """保存为npz文件（倒排表以CSR形式平铺存储）"""
+        terms = sorted(self._tfs)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self._tfs[term][0])
+        doc_ids = np.concatenate([self._tfs[term][0] for term in terms]) if terms else np.zeros(0, dtype=np.int32)
+        tfs = np.concatenate([self._tfs[term][1] for term in terms]) if terms else np.zeros(0, dtype=np.float32)
+        documents = json.dumps(
+            [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in self.documents],
+            ensure_ascii=False
+        )
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.asarray(terms, dtype=str),
+            offsets=offsets,
+            doc_ids=doc_ids,
+            tfs=tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.asarray([self.k1, self.b], dtype=np.float32),
+            documents=np.asarray(documents)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """从npz文件加载索引，文件不存在或损坏时返回None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                offsets, doc_ids, tfs = data["offsets"], data["doc_ids"], data["tfs"]
+                postings = {
+                    str(term): (doc_ids[offsets[i]:offsets[i + 1]], tfs[offsets[i]:offsets[i + 1]])
+                    for i, term in enumerate(data["terms"])
+                }
+                documents = [
+                    Document(page_content=item["page_content"], metadata=item["metadata"])
+                    for item in json.loads(str(data["documents"]))
+                ]
+                k1, b = (float(value) for value in data["params"])
+                return cls(documents, data["doc_lengths"], postings, k1, b)
+        except Exception as e:
+            logger.warning(f"BM25索引文件损坏，将重新构建: {path}, {e}")
+            return None
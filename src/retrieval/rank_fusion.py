@@ -0,0 +1,69 @@
+"""
+多路召回结果融合
+Reciprocal-rank fusion of ranked candidate lists from different retrieval channels
+"""
+
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.documents import Document
+
+from src.vectorize.api_documents import document_id
+
+R = TypeVar("R", bound=tuple)
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Document]],
+    k: int = 60,
+    limit: Optional[int] = None
+) -> List[Tuple[Document, float]]:
+    """
+    倒数排名融合（RRF）：文档得分为各路排名r（从1开始）的 1/(k+r) 之和，只依赖排名，
+    不需要对向量距离和BM25分数做归一化
+
+    Args:
+        ranked_lists: 各路召回的有序文档列表
+        k: 平滑常数，越大越弱化头部排名的优势
+        limit: 返回的最大文档数量
+
+    Returns:
+        List[Tuple[Document, float]]: 按RRF得分降序的(文档, RRF得分)列表，同一文档只出现一次
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = document_id(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+
+    # 同分时保持首次出现的顺序（靠前的召回通道优先）
+    fused = sorted(scores, key=lambda key: scores[key], reverse=True)
+    if limit is not None:
+        fused = fused[:limit]
+    return [(documents[key], scores[key]) for key in fused]
+
+
+def merge_top_k(
+    result_lists: Iterable[Sequence[R]],
+    k: int,
+    score: Callable[[R], float] = lambda result: result[-1]
+) -> List[R]:
+    """
+    合并多个查询的结果并取分数最高的k个：按文档ID去重（保留首次出现，即靠前查询的结果），
+    再用堆选出top-k，复杂度O(n log k)，不对全部结果排序
+
+    Args:
+        result_lists: 各查询的结果列表，每个结果是以Document开头的元组
+        k: 返回数量
+        score: 取结果分数的函数，缺省为元组最后一项（越大越好）
+
+    Returns:
+        List[R]: 按分数降序的结果，同分时保持合并顺序
+    """
+    unique: Dict[str, R] = {}
+    for results in result_lists:
+        for result in results:
+            unique.setdefault(document_id(result[0]), result)
+    return heapq.nlargest(k, unique.values(), key=score)
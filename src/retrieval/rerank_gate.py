@@ -0,0 +1,164 @@
+"""
+置信度门控
+Skips the reranker when first-stage retrieval is unambiguous (top-1/top-2 distance margin or exact API-name match)
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from config.settings import settings
+from src.utils.client_registry import client_registry
+from src.utils.text_utils import normalize_query
+from src.vectorize.api_documents import SCORE_SOURCE_RRF, SCORE_SOURCE_VECTOR, document_id, with_score_source
+
+
+def vector_margin(recalled_results: Sequence[Tuple[Document, float]]) -> float:
+    """
+    向量召回top-1与top-2的距离差（Chroma返回的距离越小越相关），只有一个结果时为无穷大
+
+    Args:
+        recalled_results: 按距离升序的(文档, 距离)列表
+
+    Returns:
+        float: 距离差，无结果时为0
+    """
+    if not recalled_results:
+        return 0.0
+    if len(recalled_results) == 1:
+        return float("inf")
+    return float(recalled_results[1][1] - recalled_results[0][1])
+
+
+def exact_name_match(query: str, documents: Sequence[Document]) -> Optional[Document]:
+    """
+    查询中原样包含某个候选API的名称时返回该文档；多个名称命中时取最长的，
+    最长名称对应不止一个API时视为有歧义，返回None
+    """
+    normalized = normalize_query(query)
+    best: Optional[Document] = None
+    best_length, ambiguous = 0, False
+    for doc in documents:
+        name = normalize_query(str((doc.metadata or {}).get("name") or ""))
+        if len(name) < 2 or name not in normalized:
+            continue
+        if len(name) > best_length:
+            best, best_length, ambiguous = doc, len(name), False
+        elif len(name) == best_length and document_id(doc) != document_id(best):
+            ambiguous = True
+    return None if ambiguous else best
+
+
+def fit_margin_threshold(samples: Sequence[Tuple[float, bool]], target_accuracy: float) -> Optional[float]:
+    """
+    在带标注的样本上拟合距离差阈值：取满足"距离差不小于阈值的样本中，向量top-1正确率不低于目标"
+    的最小阈值，即在达到目标准确率的前提下跳过尽可能多的重排序
+
+    Args:
+        samples: (距离差, 向量top-1是否正确)列表
+        target_accuracy: 目标准确率
+
+    Returns:
+        Optional[float]: 阈值，任何阈值都达不到目标时返回None
+    """
+    ordered = sorted(samples, key=lambda sample: sample[0], reverse=True)
+    threshold = None
+    correct = 0
+    for count, (margin, is_correct) in enumerate(ordered, start=1):
+        correct += int(is_correct)
+        # 相同距离差的样本要么一起跳过，要么一起精排
+        if count < len(ordered) and ordered[count][0] == margin:
+            continue
+        if correct / count >= target_accuracy:
+            threshold = margin
+    return threshold
+
+
+class RerankGate:
+    """
+    重排序置信度门控
+
+    候选集合中只有一个API名称被查询原样包含，或向量召回top-1与top-2的距离差不小于
+    rerank_gate_margin（由scripts/calibrate_rerank_gate.py按目标准确率拟合）时，认为召回结果无歧义，
+    直接返回该文档在前的召回结果，不调用Reranker。
+
+    跳过时返回的是召回阶段的分数（RRF融合分数或1 - 向量距离），与Reranker的相关性分数不在同一尺度上，
+    结果文档的元数据score_source注明每个分数的来源。
+    """
+
+    def __init__(self, margin_threshold: Optional[float] = None, enabled: Optional[bool] = None):
+        """
+        Args:
+            margin_threshold: 距离差阈值，默认取settings.rerank_gate_margin
+            enabled: 是否启用，默认取settings.enable_rerank_gate
+        """
+        self.margin_threshold = margin_threshold if margin_threshold is not None else settings.rerank_gate_margin
+        self.enabled = enabled if enabled is not None else settings.enable_rerank_gate
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "skipped_exact_name": 0, "skipped_margin": 0}
+
+    @classmethod
+    def get_shared(cls) -> "RerankGate":
+        """获取进程内共享的门控实例（跨索引代累计计数）"""
+        return client_registry.get_or_create(("rerank_gate",), cls)
+
+    def check(
+        self,
+        query: str,
+        recalled_results: Sequence[Tuple[Document, float]],
+        candidates: Sequence[Tuple[Document, float]],
+        final_k: int,
+        candidate_source: str = SCORE_SOURCE_RRF
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """
+        判断是否可以跳过重排序
+
+        Args:
+            query: 查询文本
+            recalled_results: 向量召回的(文档, 距离)列表
+            candidates: 交给Reranker的(文档, 相关性分数)候选列表
+            final_k: 最终返回的文档数量
+            candidate_source: 候选列表分数的来源（SCORE_SOURCE_RRF或SCORE_SOURCE_VECTOR）
+
+        Returns:
+            Optional[List[Tuple[Document, float]]]: 可以跳过时返回结果（门控选中的文档在前，元数据中带score_source），
+            否则返回None
+        """
+        if not self.enabled or not candidates:
+            return None
+
+        reason, winner = None, exact_name_match(query, [doc for doc, _ in candidates])
+        if winner is not None:
+            reason = "skipped_exact_name"
+        elif recalled_results and vector_margin(recalled_results) >= self.margin_threshold:
+            reason, winner = "skipped_margin", recalled_results[0][0]
+
+        with self._lock:
+            self._stats["queries"] += 1
+            if reason is not None:
+                self._stats[reason] += 1
+        if winner is None:
+            return None
+
+        winner_id = document_id(winner)
+        first = with_score_source(
+            [(doc, score) for doc, score in candidates if document_id(doc) == winner_id][:1], candidate_source
+        )
+        if not first:
+            first = with_score_source([(winner, 1.0 - recalled_results[0][1])], SCORE_SOURCE_VECTOR)
+        rest = [(doc, score) for doc, score in candidates if document_id(doc) != winner_id]
+        return (first + with_score_source(rest, candidate_source))[:final_k]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        skipped = stats["skipped_exact_name"] + stats["skipped_margin"]
+        stats.update({
+            "enabled": self.enabled,
+            "margin_threshold": self.margin_threshold,
+            "skipped": skipped,
+            "reranked": stats["queries"] - skipped,
+            "skip_rate": skipped / stats["queries"] if stats["queries"] else 0.0,
+        })
+        return stats
@@ -0,0 +1,78 @@
+"""
+异步执行工具
+Helpers for running blocking calls without stalling the event loop
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from config.settings import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    获取进程内共享的、有界的阻塞调用线程池
+
+    Returns:
+        ThreadPoolExecutor: 线程池实例，线程数由settings.blocking_executor_workers控制
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.blocking_executor_workers,
+                    thread_name_prefix="blocking-io"
+                )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    在有界线程池中执行一个阻塞函数，并等待其结果
+
+    用于没有异步客户端的依赖（如Chroma、DashScope重排序），保证事件循环不被阻塞。
+    调用方的contextvars会被一并带入工作线程。
+
+    Args:
+        func: 阻塞函数
+        *args: 位置参数
+        **kwargs: 关键字参数
+
+    Returns:
+        函数的返回值
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_blocking_executor(), call)
+
+
+def run_coroutine_sync(awaitable: Awaitable[T]) -> T:
+    """
+    在同步代码中执行一个协程并返回结果，供异步实现的同步包装方法使用
+
+    当前线程没有运行中的事件循环时直接asyncio.run；已在事件循环线程中（如同步方法被异步代码误调用）时，
+    在独立线程中运行，避免嵌套事件循环报错。
+
+    Args:
+        awaitable: 协程对象
+
+    Returns:
+        协程的返回值
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(awaitable)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-bridge") as bridge:
+        return bridge.submit(asyncio.run, awaitable).result()
@@ -0,0 +1,136 @@
+"""
+客户端注册表
+Process-wide registry of shared, lazily created model clients and HTTP connection pools
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from config.settings import settings
+
+T = TypeVar("T")
+
+
+class ClientRegistry:
+    """
+    线程安全的单例注册表
+
+    以(类型, 提供商, 模型)等元组为键，第一次请求时才创建实例，之后所有调用方共享同一实例。
+    每个键有独立的创建锁，一个慢的初始化不会阻塞其他键的获取。
+    """
+
+    def __init__(self):
+        self._instances: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """
+        获取共享实例，不存在时调用factory创建
+
+        Args:
+            key: 实例键
+            factory: 无参数的创建函数
+
+        Returns:
+            共享实例
+        """
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = factory()
+                self._instances[key] = instance
+                logger.debug(f"客户端注册表创建共享实例: {key}")
+        return instance
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取已创建的实例，不存在时返回None"""
+        return self._instances.get(key)
+
+    async def aclear(self) -> None:
+        """先关闭需要异步关闭的实例（如httpx.AsyncClient），再关闭并移除所有实例"""
+        for instance in list(self._instances.values()):
+            aclose = getattr(instance, "aclose", None)
+            if callable(aclose):
+                try:
+                    await aclose()
+                except Exception as e:
+                    logger.warning(f"关闭共享实例失败: {e}")
+        self.clear()
+
+    def clear(self) -> None:
+        """关闭并移除所有实例（主要用于服务关闭和测试）"""
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+            self._key_locks.clear()
+        for instance in instances:
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"关闭共享实例失败: {e}")
+
+
+class SessionBoundClient:
+    """为DashScope SDK的API类（如TextEmbedding）绑定一个共享的requests.Session"""
+
+    def __init__(self, client: Any, session: requests.Session):
+        self._client = client
+        self._session = session
+
+    def call(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs.setdefault("session", self._session)
+        return self._client.call(*args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def get_http_session(name: str = "default") -> requests.Session:
+    """
+    获取共享的keep-alive HTTP会话，复用TCP/TLS连接
+
+    Args:
+        name: 会话名称，不同下游服务可使用不同的连接池
+
+    Returns:
+        requests.Session: 共享会话
+    """
+    def create_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.http_pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    return client_registry.get_or_create(("http_session", name), create_session)
+
+
+def get_httpx_client(name: str = "default") -> Any:
+    """获取共享的httpx同步客户端（用于OpenAI SDK）"""
+    import httpx
+
+    def create_client() -> httpx.Client:
+        limits = httpx.Limits(
+            max_connections=settings.http_pool_maxsize,
+            max_keepalive_connections=settings.http_pool_maxsize
+        )
+        return httpx.Client(limits=limits)
+
+    return client_registry.get_or_create(("httpx_client", name), create_client)
+
+
+# 全局注册表实例
+client_registry = ClientRegistry()
@@ -1,43 +1,43 @@
-import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from src.agent.api_schema import ApiSchema
+from src.utils.tracing import tracer
 
 class GroovyScriptGenerator:
     """根据API定义和已知数据，生成Groovy脚本。"""
 
     @staticmethod
-    def generate(api_definition: Dict[str, Any], known_data: Dict[str, Any]) -> str:
+    def generate(api_definition: Dict[str, Any], known_data: Dict[str, Any], schema: Optional[ApiSchema] = None) -> str:
         """
         生成Groovy脚本的核心方法。
 
         Args:
             api_definition: 单个API的完整定义，来自api.json。
             known_data: 用户提供的、已知的参数值。
+            schema: 预编译的API参数Schema（来自ApiSchemaRegistry），为空时从api_definition的params_json解析。
 
         Returns:
             一段格式化好的、可直接使用的Groovy脚本字符串。
         """
-        api_name = api_definition.get("name", "未知API")
-        http_method = api_definition.get("method", "GET").upper()
-        endpoint = api_definition.get("endpoint", "")
-        
-        # 从metadata中安全地解析params_json字符串
-        try:
-            api_params_str = api_definition.get("params_json", "[]")
-            api_params = json.loads(api_params_str)
-            if not isinstance(api_params, list):
-                api_params = []
-        except (json.JSONDecodeError, TypeError):
-            api_params = []
+        with tracer.span("groovy_render"):
+            return GroovyScriptGenerator._render(api_definition, known_data, schema)
+
+    @staticmethod
+    def _render(api_definition: Dict[str, Any], known_data: Dict[str, Any], schema: Optional[ApiSchema]) -> str:
+        if schema is None:
+            schema = ApiSchema.from_metadata(api_definition)
+        api_name = schema.name or "未知API"
+        http_method = schema.method
+        endpoint = schema.endpoint
 
         # 1. 构建请求体和缺失参数列表
         request_body = {}
         missing_params = []
-        for param in api_params:
-            param_name = param.get("name")
-            if param_name in known_data:
-                request_body[param_name] = known_data[param_name]
-            elif param.get("required", False):
-                missing_params.append(param_name)
+        for param in schema.params:
+            if param.name in known_data:
+                request_body[param.name] = known_data[param.name]
+            elif param.required:
+                missing_params.append(param.name)
 
         # 2. 生成Groovy脚本字符串
         script_template = f"""
@@ -0,0 +1,59 @@
+"""
+确定性哈希嵌入模型
+Deterministic, offline hash-based embeddings for benchmarks and tests
+"""
+
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_CJK_RUN = re.compile(r"[一-鿿]+")
+_ASCII_WORD = re.compile(r"[A-Za-z][A-Za-z0-9_]*|\d+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    基于特征哈希的嵌入模型，不依赖网络和模型文件。
+
+    中文按单字和相邻二字切分，英文按单词切分，每个特征哈希到固定维度并带符号累加，
+    最后做L2归一化。相同文本总是得到相同向量，字面相近的文本向量也相近，
+    适合离线基准测试和单元测试，不适合作为线上语义模型。
+    """
+
+    def __init__(self, dimensions: int = 256, model_name: str = "hash-embedding"):
+        """
+        Args:
+            dimensions: 向量维度
+            model_name: 模型名称（用于缓存键等场景）
+        """
+        self.dimensions = dimensions
+        self.model_name = model_name
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for run in _CJK_RUN.findall(text):
+            features.extend(run)
+            features.extend(run[i:i + 2] for i in range(len(run) - 1))
+        features.extend(word.lower() for word in _ASCII_WORD.findall(text))
+        return features
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
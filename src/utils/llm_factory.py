@@ -13,6 +13,9 @@ from loguru import logger
 import dashscope
 from config.settings import settings
 from pydantic import SecretStr
+from src.utils.client_registry import client_registry, get_http_session, get_httpx_client, SessionBoundClient
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.stub_llm import StubChatModel
 
 class LLMFactory:
     """LLM和嵌入模型工厂类"""
@@ -20,9 +23,9 @@ class LLMFactory:
     @staticmethod
     def create_llm(provider: Optional[str] = None) -> Any:
         """
-        创建LLM实例
+        获取LLM实例（进程内按提供商和模型共享，首次调用时创建）
         Args:
-            provider: LLM提供商 ('openai' 或 'dashscope')
+            provider: LLM提供商 ('openai'、'dashscope' 或 'stub')，默认取settings.llm_provider
         Returns:
             LLM实例
         """
@@ -30,11 +33,14 @@ class LLMFactory:
             provider = settings.llm_provider
         try:
             if provider == 'openai':
-                return LLMFactory._create_openai_llm()
+                key, factory = ("llm", provider, settings.openai_text_model), LLMFactory._create_openai_llm
             elif provider == 'dashscope':
-                return LLMFactory._create_dashscope_llm()
+                key, factory = ("llm", provider, settings.dashscope_text_model), LLMFactory._create_dashscope_llm
+            elif provider == 'stub':
+                key, factory = ("llm", provider), LLMFactory._create_stub_llm
             else:
                 raise ValueError(f"不支持的LLM提供商: {provider}")
+            return client_registry.get_or_create(key, factory)
         except Exception as e:
             logger.error(f"创建LLM失败: {e}")
             raise
@@ -42,9 +48,9 @@ class LLMFactory:
     @staticmethod
     def create_embeddings(provider: Optional[str] = None) -> Embeddings:
         """
-        创建嵌入模型实例
+        获取嵌入模型实例（进程内按提供商和模型共享，首次调用时创建）
         Args:
-            provider: 嵌入模型提供商 ('openai' 或 'dashscope')
+            provider: 嵌入模型提供商 ('openai'、'dashscope' 或 'stub')，默认取settings.llm_provider
         Returns:
             Embeddings实例
         """
@@ -52,11 +58,14 @@ class LLMFactory:
             provider = settings.llm_provider
         try:
             if provider == 'openai':
-                return LLMFactory._create_openai_embeddings()
+                key, factory = ("embeddings", provider, settings.openai_embedding_model), LLMFactory._create_openai_embeddings
             elif provider == 'dashscope':
-                return LLMFactory._create_dashscope_embeddings()
+                key, factory = ("embeddings", provider, settings.dashscope_embedding_model), LLMFactory._create_dashscope_embeddings
+            elif provider == 'stub':
+                key, factory = ("embeddings", provider), LLMFactory._create_stub_embeddings
             else:
                 raise ValueError(f"不支持的嵌入模型提供商: {provider}")
+            return client_registry.get_or_create(key, factory)
         except Exception as e:
             logger.error(f"创建嵌入模型失败: {e}")
             raise
@@ -71,6 +80,7 @@ class LLMFactory:
             "api_key": settings.openai_api_key,
             "temperature": 0.1,
             "max_tokens": 4000,
+            "http_client": get_httpx_client("openai"),
         }
         if settings.openai_base_url:
             kwargs["base_url"] = settings.openai_base_url
@@ -87,12 +97,14 @@ class LLMFactory:
             return OpenAIEmbeddings(
                 model=settings.openai_embedding_model,
                 api_key=api_key,
-                base_url=settings.openai_base_url
+                base_url=settings.openai_base_url,
+                http_client=get_httpx_client("openai")
             )
         else:
             return OpenAIEmbeddings(
                 model=settings.openai_embedding_model,
-                api_key=api_key
+                api_key=api_key,
+                http_client=get_httpx_client("openai")
             )
 
     @staticmethod
@@ -110,6 +122,8 @@ class LLMFactory:
             dashscope_api_key=settings.dashscope_api_key,
             temperature=0.1,
             max_tokens=4000,
+            # 复用共享的keep-alive会话，避免每次调用重新建立TLS连接
+            model_kwargs={"session": get_http_session("dashscope")},
         )
 
     @staticmethod
@@ -122,10 +136,34 @@ class LLMFactory:
         dashscope.api_key = settings.dashscope_api_key
         
         logger.info(f"创建阿里云通义嵌入模型: {settings.dashscope_embedding_model}")
-        return DashScopeEmbeddings(
+        embeddings = DashScopeEmbeddings(
             model=settings.dashscope_embedding_model,
             dashscope_api_key=settings.dashscope_api_key,
         )
+        # 复用共享的keep-alive会话，避免每次调用重新建立TLS连接
+        embeddings.client = SessionBoundClient(embeddings.client, get_http_session("dashscope"))
+        return embeddings
+
+    @staticmethod
+    def _create_stub_llm() -> StubChatModel:
+        """创建本地确定性桩模型（不访问网络）"""
+        logger.info(
+            f"创建本地桩模型LLM: 首token延迟{settings.stub_llm_latency_ms}ms({settings.stub_llm_latency_distribution})"
+        )
+        return StubChatModel(
+            latency_ms=settings.stub_llm_latency_ms,
+            latency_distribution=settings.stub_llm_latency_distribution,
+            latency_jitter=settings.stub_llm_latency_jitter,
+            token_latency_ms=settings.stub_llm_token_latency_ms,
+            stream_chunk_chars=settings.stub_llm_stream_chunk_chars,
+            seed=settings.stub_llm_seed,
+        )
+
+    @staticmethod
+    def _create_stub_embeddings() -> HashEmbeddings:
+        """创建本地哈希嵌入模型（确定性向量，不访问网络）"""
+        logger.info("创建本地哈希嵌入模型")
+        return HashEmbeddings(model_name="stub-hash-embedding")
 
     @staticmethod
     def test_connection(provider: Optional[str] = None) -> bool:
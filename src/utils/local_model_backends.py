@@ -0,0 +1,175 @@
+"""
+本地模型推理后端
+Loads the local Qwen embedding / reranker models as fp32 PyTorch, dynamic-int8 PyTorch or ONNX Runtime
+"""
+
+import functools
+import os
+import platform
+from typing import Any, Optional, Set
+
+from loguru import logger
+
+from config.settings import settings
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+QUANTIZATION_TARGETS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def _cpu_flags() -> Set[str]:
+    """读取CPU特性标志（Linux的/proc/cpuinfo），无法读取时返回空集合"""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def detect_quantization_target(machine: Optional[str] = None, flags: Optional[Set[str]] = None) -> str:
+    """
+    按CPU架构和指令集选择动态int8量化配置：arm64 / avx512_vnni / avx512 / avx2
+
+    Args:
+        machine: CPU架构，默认platform.machine()
+        flags: CPU特性标志，默认从/proc/cpuinfo读取
+
+    Returns:
+        量化配置名称，检测不到x86扩展指令集时退回兼容面最广的avx2
+    """
+    machine = (machine if machine is not None else platform.machine()).lower()
+    if machine in ("arm64", "aarch64"):
+        return "arm64"
+    flags = flags if flags is not None else _cpu_flags()
+    if "avx512_vnni" in flags or "avx512vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+@functools.lru_cache(maxsize=1)
+def _detected_quantization_target() -> str:
+    target = detect_quantization_target()
+    logger.info(f"检测到CPU量化配置: {target}")
+    return target
+
+
+def quantization_target() -> str:
+    """onnx-int8后端使用的量化配置，settings.onnx_quantization_target为auto时自动检测"""
+    if settings.onnx_quantization_target != "auto":
+        return settings.onnx_quantization_target
+    return _detected_quantization_target()
+
+
+def _export_dir(model_name: str, backend: str) -> str:
+    safe_name = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+    return os.path.join(settings.onnx_model_dir, safe_name, backend)
+
+
+def _quantize_linear_int8(model: Any) -> Any:
+    """对所有Linear层做动态int8量化（仅CPU）"""
+    import torch
+
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch") -> Any:
+    """
+    按后端加载SentenceTransformer嵌入模型
+
+    onnx/onnx-int8依赖sentence-transformers>=3.2和onnxruntime（`pip install sentence-transformers[onnx]`），
+    首次加载时导出到onnx_model_dir下，之后直接复用导出的模型文件。
+
+    Args:
+        model_name: 模型名称
+        backend: 'torch' | 'torch-int8' | 'onnx' | 'onnx-int8'
+
+    Returns:
+        SentenceTransformer实例
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的本地模型后端: {backend}")
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        model = SentenceTransformer(model_name, device="cpu")
+        model[0].auto_model = _quantize_linear_int8(model[0].auto_model)
+        logger.info(f"嵌入模型已动态int8量化: {model_name}")
+        return model
+
+    export_dir = _export_dir(model_name, "onnx")
+    if not os.path.exists(os.path.join(export_dir, "onnx", "model.onnx")):
+        logger.info(f"正在导出嵌入模型到ONNX: {model_name} -> {export_dir}")
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(export_dir)
+    if backend == "onnx-int8":
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        # 量化文件名带有量化配置（model_qint8_<target>.onnx），不同CPU的量化模型互不覆盖
+        target = quantization_target()
+        file_name = f"onnx/model_qint8_{target}.onnx"
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            model = SentenceTransformer(export_dir, backend="onnx")
+            export_dynamic_quantized_onnx_model(model, target, export_dir)
+        return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    return SentenceTransformer(export_dir, backend="onnx")
+
+
+def load_reranker_model(model_name: str, backend: str = "torch", use_cuda: bool = True) -> Any:
+    """
+    按后端加载Qwen3重排序（CausalLM）模型，返回的模型支持`model(**inputs).logits`和`model.device`
+
+    onnx/onnx-int8依赖optimum[onnxruntime]，首次加载时导出（并量化）到onnx_model_dir下，
+    量化模型目录名带有量化配置（onnx-int8-<target>）。
+
+    Args:
+        model_name: 模型名称
+        backend: 'torch' | 'torch-int8' | 'onnx' | 'onnx-int8'
+        use_cuda: torch后端在有GPU时是否使用GPU
+
+    Returns:
+        模型实例
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的本地模型后端: {backend}")
+    if backend in ("torch", "torch-int8"):
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        model = AutoModelForCausalLM.from_pretrained(model_name).eval()
+        if backend == "torch-int8":
+            logger.info(f"重排序模型已动态int8量化: {model_name}")
+            return _quantize_linear_int8(model)
+        if use_cuda and torch.cuda.is_available():
+            model = model.cuda()
+        return model
+
+    from optimum.onnxruntime import ORTModelForCausalLM
+
+    export_dir = _export_dir(model_name, "onnx")
+    if not os.path.exists(os.path.join(export_dir, "model.onnx")):
+        logger.info(f"正在导出重排序模型到ONNX: {model_name} -> {export_dir}")
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=False)
+        model.save_pretrained(export_dir)
+    if backend == "onnx":
+        return ORTModelForCausalLM.from_pretrained(export_dir, use_cache=False)
+
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoConfig
+
+    target = quantization_target()
+    quantized_dir = _export_dir(model_name, f"onnx-int8-{target}")
+    if not os.path.exists(os.path.join(quantized_dir, "model_quantized.onnx")):
+        logger.info(f"正在对重排序ONNX模型做动态int8量化（{target}）: {quantized_dir}")
+        quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+        quantizer.quantize(
+            save_dir=quantized_dir,
+            quantization_config=getattr(AutoQuantizationConfig, target)(is_static=False, per_channel=False)
+        )
+        AutoConfig.from_pretrained(export_dir).save_pretrained(quantized_dir)
+    return ORTModelForCausalLM.from_pretrained(quantized_dir, file_name="model_quantized.onnx", use_cache=False)
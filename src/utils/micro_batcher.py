@@ -0,0 +1,127 @@
+"""
+动态微批次调度器
+Collects concurrent single-item requests into one batched call to a local model
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+
+from config.settings import settings
+from src.utils.async_utils import run_blocking
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    把同时到达的单条请求合并成一次批量前向计算
+
+    第一条请求到达后最多再等待max_wait_ms毫秒，或凑满max_batch_size条后立即执行；
+    上一批还在执行时新到的请求继续排队，执行完后一起组成下一批。批处理函数在有界线程池中执行，
+    结果按顺序分发回各自等待的调用方，批处理失败时该批所有调用方都收到同一个异常。
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[T]], List[R]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        name: str = "micro-batcher"
+    ):
+        """
+        Args:
+            process_batch: 批处理函数（阻塞），输入列表与输出列表一一对应
+            max_batch_size: 每批最多的请求数
+            max_wait_ms: 第一条请求最多等待的毫秒数
+            name: 名称（用于日志）
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size or settings.micro_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.micro_batch_max_wait_ms) / 1000
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stats = {"batches": 0, "items": 0, "max_batch_size": 0}
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, item: T) -> R:
+        """
+        提交一条请求并等待它所在批次的结果
+
+        Args:
+            item: 单条请求
+
+        Returns:
+            该请求对应的结果
+        """
+        queue = self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[T, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # 调用方已取消的请求不再计算
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await run_blocking(self.process_batch, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}批处理返回{len(results)}个结果，期望{len(items)}个")
+            except Exception as e:
+                logger.error(f"{self.name}批处理失败（{len(items)}条请求）: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._stats["batches"] += 1
+            self._stats["items"] += len(items)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(items))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """停止后台调度任务"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
@@ -1,13 +1,26 @@
 from langchain.embeddings.base import Embeddings
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from config.settings import settings
+from src.utils.local_model_backends import load_sentence_transformer
+from src.utils.micro_batcher import MicroBatcher
 
 class QwenSentenceTransformerEmbeddings(Embeddings):
-    def __init__(self, model_name="Qwen/Qwen3-Embedding-0.6B"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name="Qwen/Qwen3-Embedding-0.6B", backend=None):
+        # backend: 'torch' | 'torch-int8' | 'onnx' | 'onnx-int8'，默认取settings.local_embedding_backend
+        self.backend = backend or settings.local_embedding_backend
+        self.model = load_sentence_transformer(model_name, self.backend)
+        # 并发的单条查询嵌入合并成一次encode
+        self.batcher = MicroBatcher(self._encode_batch, name="qwen-embeddings")
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    def _encode_batch(self, texts: list[str]) -> list[list[float]]:
         return [vec.tolist() for vec in self.model.encode(texts, batch_size=32, convert_to_numpy=True)]
 
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._encode_batch(texts)
+
     def embed_query(self, text: str) -> list[float]:
         return self.model.encode(text, convert_to_numpy=True).tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.batcher.submit(text)
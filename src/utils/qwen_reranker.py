@@ -1,20 +1,56 @@
 # reranker.py
+import hashlib
+import threading
+from collections import OrderedDict
+
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer
+
+from config.settings import settings
+from src.utils.local_model_backends import load_reranker_model
+from src.utils.micro_batcher import MicroBatcher
+from src.utils.tracing import tracer
+
+DEFAULT_INSTRUCTION = "Given a web search query, retrieve relevant passages that answer the query"
+
 
 class RerankerManager:
-    def __init__(self, model_name="Qwen/Qwen3-Reranker-0.6B", use_cuda=True):
+    def __init__(
+        self,
+        model_name="Qwen/Qwen3-Reranker-0.6B",
+        use_cuda=True,
+        batch_token_budget=None,
+        max_doc_tokens=None,
+        doc_cache_size=4096,
+        backend=None
+    ):
+        """
+        Args:
+            model_name: 本地重排序模型
+            use_cuda: 有GPU时是否使用GPU
+            batch_token_budget: 每个微批次（含padding）的最大token数
+            max_doc_tokens: 单个文档最多保留的token数
+            doc_cache_size: 缓存的已分词文档数量（文档在一次索引构建内是静态的）
+            backend: 推理后端 'torch' | 'torch-int8' | 'onnx' | 'onnx-int8'，默认取settings.local_rerank_backend
+        """
+        self.backend = backend or settings.local_rerank_backend
         self.tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side='left')
-        self.model = AutoModelForCausalLM.from_pretrained(model_name).eval()
-        if use_cuda and torch.cuda.is_available():
-            self.model = self.model.cuda()
+        self.model = load_reranker_model(model_name, self.backend, use_cuda)
         self.token_true_id = self.tokenizer.convert_tokens_to_ids("yes")
         self.token_false_id = self.tokenizer.convert_tokens_to_ids("no")
         self.max_length = 8192
+        self.batch_token_budget = batch_token_budget or settings.local_rerank_batch_token_budget
+        self.max_doc_tokens = max_doc_tokens or settings.local_rerank_max_doc_tokens
         self.prefix = "<|im_start|>system\nJudge whether the Document meets the requirements based on the Query and the Instruct provided. Note that the answer can only be \"yes\" or \"no\".<|im_end|>\n<|im_start|>user\n"
         self.suffix = "<|im_end|>\n<|im_start|>assistant\n<think>\n\n</think>\n\n"
         self.prefix_tokens = self.tokenizer.encode(self.prefix, add_special_tokens=False)
         self.suffix_tokens = self.tokenizer.encode(self.suffix, add_special_tokens=False)
+        self.doc_cache_size = doc_cache_size
+        self._doc_tokens = OrderedDict()
+        # 重排序在线程池中并发执行，LRU的读取与淘汰需要加锁
+        self._doc_tokens_lock = threading.Lock()
+        # 并发请求的(查询, 文档)对合并成一次前向计算
+        self.batcher = MicroBatcher(self._score_requests, name="qwen-reranker")
         self.enabled = True
 
     def format_instruction(self, instruction, query, doc):
@@ -41,15 +77,92 @@ class RerankerManager:
         scores = batch_scores[:, 1].exp().tolist()  # "yes" 概率
         return scores
 
-    def rerank_with_scores(self, query, doc_score_pairs, final_k=5, instruction=None):
-        if instruction is None:
-            instruction = "Given a web search query, retrieve relevant passages that answer the query"
+    def _encode_doc(self, doc):
+        # "<Document>:"和文档之间以空格开头的片段在分词时总是切开的，单独分词再拼接与整体分词结果一致
+        key = hashlib.sha1(doc.encode("utf-8")).hexdigest()
+        with self._doc_tokens_lock:
+            tokens = self._doc_tokens.get(key)
+            if tokens is not None:
+                self._doc_tokens.move_to_end(key)
+                return tokens
+        # 分词不持锁，多个线程同时遇到同一个新文档时最多重复分词一次
+        tokens = self.tokenizer.encode(" " + doc, add_special_tokens=False)[:self.max_doc_tokens]
+        with self._doc_tokens_lock:
+            self._doc_tokens[key] = tokens
+            while len(self._doc_tokens) > self.doc_cache_size:
+                self._doc_tokens.popitem(last=False)
+        return tokens
 
-        docs = [doc.page_content for doc, _ in doc_score_pairs]
-        pairs = [self.format_instruction(instruction, query, doc) for doc in docs]
-        inputs = self.process_inputs(pairs)
-        scores = self.compute_logits(inputs)
+    def build_pair_ids(self, instruction, query, docs):
+        """拼接prefix + 指令/查询 + 文档 + suffix的token id，查询部分每次调用只分词一次"""
+        head = self.tokenizer.encode(
+            f"<Instruct>: {instruction}\n<Query>: {query}\n<Document>:", add_special_tokens=False
+        )
+        room = self.max_length - len(self.prefix_tokens) - len(self.suffix_tokens)
+        head = head[:room]
+        return [
+            self.prefix_tokens + head + self._encode_doc(doc)[:room - len(head)] + self.suffix_tokens
+            for doc in docs
+        ]
+
+    def plan_batches(self, lengths):
+        """
+        按长度排序后贪心切分微批次，保证 批大小 × 批内最大长度 不超过token预算，
+        避免一个长文档把整批都padding到很长
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches, current = [], []
+        for i in order:
+            # 升序排列，新加入的总是批内最长的
+            if current and (len(current) + 1) * lengths[i] > self.batch_token_budget:
+                batches.append(current)
+                current = []
+            current.append(i)
+        if current:
+            batches.append(current)
+        return batches
 
+    def score_pairs(self, pair_ids):
+        scores = [0.0] * len(pair_ids)
+        with torch.inference_mode():
+            for batch in self.plan_batches([len(ids) for ids in pair_ids]):
+                inputs = self.tokenizer.pad(
+                    {"input_ids": [pair_ids[i] for i in batch]}, padding=True, return_tensors="pt"
+                )
+                for key in inputs:
+                    inputs[key] = inputs[key].to(self.model.device)
+                for i, score in zip(batch, self.compute_logits(inputs)):
+                    scores[i] = score
+        return scores
+
+    def _score_requests(self, requests):
+        """一批(指令, 查询, 文档列表)请求的所有文档对一起做长度分桶和前向计算，再按请求拆分"""
+        pair_ids, offsets = [], [0]
+        for instruction, query, docs in requests:
+            pair_ids.extend(self.build_pair_ids(instruction, query, docs))
+            offsets.append(len(pair_ids))
+        scores = self.score_pairs(pair_ids)
+        return [scores[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    @staticmethod
+    def _rank(doc_score_pairs, scores, final_k):
         reranked = list(zip([doc for doc, _ in doc_score_pairs], [score for _, score in doc_score_pairs], scores))
         reranked = sorted(reranked, key=lambda x: x[2], reverse=True)  # 按 rerank 得分降序排列
         return reranked[:final_k]
+
+    def rerank_with_scores(self, query, doc_score_pairs, final_k=5, instruction=None):
+        if not doc_score_pairs:
+            return []
+        docs = [doc.page_content for doc, _ in doc_score_pairs]
+        with tracer.span("rerank", documents=len(docs)):
+            scores = self.score_pairs(self.build_pair_ids(instruction or DEFAULT_INSTRUCTION, query, docs))
+        return self._rank(doc_score_pairs, scores, final_k)
+
+    async def arerank_with_scores(self, query, doc_score_pairs, final_k=5, instruction=None):
+        """异步重排序：同时到达的多个请求由MicroBatcher合并为一次前向计算"""
+        if not doc_score_pairs:
+            return []
+        docs = [doc.page_content for doc, _ in doc_score_pairs]
+        with tracer.span("rerank", documents=len(docs)):
+            scores = await self.batcher.submit((instruction or DEFAULT_INSTRUCTION, query, docs))
+        return self._rank(doc_score_pairs, scores, final_k)
@@ -0,0 +1,54 @@
+"""
+令牌桶限流
+Token-bucket rate limiter shared by async fan-out paths (batch rerank, multi-query retrieval)
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    以rate个/秒的速度补充令牌，最多积累capacity个，允许短时突发。获取令牌采用预约方式：
+    令牌不足时余额记为负数，调用方按欠额睡眠对应时长，先到先得，等待期间不持有锁。
+    状态由线程锁保护，可在多个事件循环和线程之间共享。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<=0表示不限流
+            capacity: 桶容量（突发上限），缺省为max(1, rate)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """预约令牌，返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """获取令牌（异步），令牌不足时等待而不阻塞事件循环"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_blocking(self, tokens: float = 1.0) -> None:
+        """获取令牌（同步）"""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
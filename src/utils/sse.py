@@ -0,0 +1,31 @@
+"""
+Server-Sent Events工具
+Helpers for emitting staged results as text/event-stream
+"""
+
+import json
+from typing import Any
+
+# 关闭反向代理（如nginx）的响应缓冲，保证事件即时到达客户端
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    序列化一个SSE事件
+
+    Args:
+        event: 事件名称
+        data: 事件数据（序列化为JSON）
+
+    Returns:
+        str: 以空行结尾的事件文本
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def chunk_text(chunk: Any) -> str:
+    """取出流式输出块中的文本：聊天模型为消息块的content，文本模型和StrOutputParser直接是字符串"""
+    content = getattr(chunk, "content", chunk)
+    return content if isinstance(content, str) else str(content)
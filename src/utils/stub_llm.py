@@ -0,0 +1,230 @@
+"""
+确定性桩模型
+Deterministic in-process stand-in for the chat LLM: canned rewrites, plans and parameter JSON with configurable latency
+"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from src.retrieval.bm25_index import tokenize
+
+# 识别调用方和截取字段用的Prompt标记（与main.py、TaskPlanner、ApiRagAgent中的Prompt一致）
+_MARKERS = {
+    "rewrite": "用户原始请求:",
+    "plan_apis": "# 可用API列表 (你的工具箱)",
+    "plan_query": "# 用户的需求",
+    "param_doc": "**# API文档:**",
+}
+_ENUM_HINT = re.compile(r"\(([A-Z_]+(?:\s*,\s*[A-Z_]+)+)\)")
+
+
+def _section(text: str, marker: str) -> str:
+    """取marker之后、下一个空行之前的内容"""
+    start = text.find(marker)
+    if start < 0:
+        return ""
+    rest = text[start + len(marker):].lstrip("\n ")
+    return rest.split("\n\n", 1)[0].strip()
+
+
+class LatencyModel:
+    """
+    桩模型的延迟分布：首token延迟按中位数latency_ms采样，
+    fixed为固定值，uniform为±jitter比例内均匀分布，lognormal为对数正态分布（jitter即sigma）
+    """
+
+    def __init__(self, latency_ms: float, distribution: str = "lognormal", jitter: float = 0.5, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """采样一次首token延迟（秒）"""
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            if self.distribution == "uniform":
+                factor = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+            elif self.distribution == "lognormal":
+                factor = math.exp(self._rng.gauss(0.0, self.jitter))
+            else:
+                factor = 1.0
+        return max(0.0, self.latency_ms * factor) / 1000
+
+
+class StubChatModel(BaseChatModel):
+    """
+    不访问网络的聊天模型，按Prompt识别调用方并返回固定格式的结果：
+
+    - 查询改写：原样返回用户原始请求
+    - 任务规划：查询中原样出现的API按出现顺序串行，没有时取与查询词元重合最多的API，都不相关时返回`{}`
+    - 参数填充：按参数类型给出固定值（枚举取第一个，数字为1，布尔为true），其余为`stub-参数名`
+    - 其他Prompt：返回"OK"
+
+    输出按stream_chunk_chars切分，首块延迟由LatencyModel采样，之后每块间隔token_latency_ms；
+    非流式调用等待同样的总时长。token用量按字符数近似，写入usage_metadata。
+    """
+
+    latency_ms: float = 200.0
+    latency_distribution: str = "lognormal"
+    latency_jitter: float = 0.5
+    token_latency_ms: float = 10.0
+    stream_chunk_chars: int = 4
+    seed: int = 0
+
+    _latency: LatencyModel = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        self._latency = LatencyModel(self.latency_ms, self.latency_distribution, self.latency_jitter, self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def respond(self, prompt: str) -> str:
+        """根据Prompt生成确定性的回复文本"""
+        if _MARKERS["plan_apis"] in prompt:
+            return self._plan(prompt)
+        if _MARKERS["param_doc"] in prompt:
+            return self._fill_params(prompt)
+        if _MARKERS["rewrite"] in prompt:
+            return prompt.rsplit(_MARKERS["rewrite"], 1)[-1].strip().strip('"').strip()
+        return "OK"
+
+    @staticmethod
+    def _plan(prompt: str) -> str:
+        try:
+            apis = json.loads(_section(prompt, _MARKERS["plan_apis"]))
+        except json.JSONDecodeError:
+            apis = []
+        query = _section(prompt, _MARKERS["plan_query"])
+        names = [api.get("name") for api in apis if api.get("name")]
+
+        matched = sorted((name for name in names if name in query), key=query.index)
+        if not matched:
+            query_tokens = set(tokenize(query))
+            scored = [(len(query_tokens & set(tokenize(name))), name) for name in names]
+            best = max(scored, default=(0, None), key=lambda pair: pair[0])
+            matched = [best[1]] if best[0] > 0 else []
+        if not matched:
+            return "{}"
+
+        plan = {
+            "type": "sequential",
+            "tasks": [{"api_name": name, "description": f"调用{name}。"} for name in matched]
+        }
+        return f"```json\n{json.dumps(plan, ensure_ascii=False, indent=2)}\n```"
+
+    @staticmethod
+    def _fill_params(prompt: str) -> str:
+        try:
+            api_doc = json.loads(_section(prompt, _MARKERS["param_doc"]))
+        except json.JSONDecodeError:
+            return "{}"
+        values: Dict[str, Any] = {}
+        for param in api_doc.get("params") or []:
+            name = param.get("name")
+            if not name:
+                continue
+            param_type = str(param.get("type", "string")).lower()
+            enum = _ENUM_HINT.search(param.get("description", ""))
+            if enum:
+                values[name] = enum.group(1).split(",")[0].strip()
+            elif param_type in ("number", "integer"):
+                values[name] = 1
+            elif param_type == "boolean":
+                values[name] = True
+            else:
+                values[name] = f"stub-{name}"
+        return json.dumps(values, ensure_ascii=False)
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        return "\n\n".join(str(message.content) for message in messages)
+
+    def _chunks(self, text: str) -> List[str]:
+        size = max(1, self.stream_chunk_chars)
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> Dict[str, int]:
+        return {"input_tokens": len(prompt), "output_tokens": len(text), "total_tokens": len(prompt) + len(text)}
+
+    def _total_delay(self, chunks: List[str]) -> float:
+        return self._latency.sample() + max(0, len(chunks) - 1) * self.token_latency_ms / 1000
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        text = self.respond(prompt)
+        time.sleep(self._total_delay(self._chunks(text)))
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._total_delay(self._chunks(text)))
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        text = self.respond(prompt)
+        time.sleep(self._latency.sample())
+        for index, piece in enumerate(self._chunks(text)):
+            if index:
+                time.sleep(self.token_latency_ms / 1000)
+            if run_manager:
+                run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._latency.sample())
+        for index, piece in enumerate(self._chunks(text)):
+            if index:
+                await asyncio.sleep(self.token_latency_ms / 1000)
+            if run_manager:
+                await run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, text)))
@@ -0,0 +1,17 @@
+"""
+文本处理工具
+Text normalization helpers shared by the caches
+"""
+
+import re
+import unicodedata
+
+_PUNCTUATION_EDGES = "。！？!?.，,；;、 "
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询：全半角统一、小写、合并空白、去掉首尾标点"""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = _WHITESPACE.sub(" ", text)
+    return text.strip(_PUNCTUATION_EDGES)
@@ -0,0 +1,321 @@
+"""
+流水线追踪
+Lightweight span tracing for pipeline stages: Prometheus histograms, per-request Server-Timing and an in-memory exporter
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from config.settings import settings
+
+# 阶段耗时直方图的桶边界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 当前请求已结束的span（由ServerTimingMiddleware设置），以及当前正在执行的span
+_request_spans: ContextVar[Optional[List["Span"]]] = ContextVar("request_spans", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个阶段的一次执行：名称、耗时、属性（缓存命中、文档数等）和大模型token用量"""
+
+    __slots__ = ("tracer", "name", "attributes", "prompt_tokens", "completion_tokens",
+                 "duration_ms", "_started", "_token", "_activate")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any], activate: bool = True):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.duration_ms = 0.0
+        self._started = 0.0
+        self._token = None
+        self._activate = activate
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def __enter__(self) -> "Span":
+        if self._activate:
+            self._token = _current_span.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if self._token is not None:
+            _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer._finish(self)
+
+
+class _NoopSpan:
+    """追踪关闭时返回的共享空span，进入/退出都不做任何事"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class InMemoryExporter:
+    """把结束的span保存在内存中（用于测试）"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return [span.name for span in self.spans]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class MetricsExporter:
+    """
+    把span聚合为Prometheus指标：
+    各阶段耗时直方图、各阶段大模型token计数、各缓存的命中/未命中计数
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # stage -> [各桶计数（非累积，最后一项为+Inf）, 总和, 总数]
+        self._histograms: Dict[str, List[Any]] = {}
+        self._tokens: Dict[Tuple[str, str], int] = {}
+        self._cache: Dict[Tuple[str, str], int] = {}
+
+    def export(self, span: Span) -> None:
+        seconds = span.duration_ms / 1000
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(span.name)
+            if histogram is None:
+                histogram = self._histograms[span.name] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            if span.prompt_tokens:
+                key = (span.name, "prompt")
+                self._tokens[key] = self._tokens.get(key, 0) + span.prompt_tokens
+            if span.completion_tokens:
+                key = (span.name, "completion")
+                self._tokens[key] = self._tokens.get(key, 0) + span.completion_tokens
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        key = (cache, "hit" if hit else "miss")
+        with self._lock:
+            self._cache[key] = self._cache.get(key, 0) + 1
+
+    def render(self) -> str:
+        """渲染为Prometheus文本格式"""
+        lines = [
+            "# HELP pipeline_stage_duration_seconds 流水线各阶段耗时",
+            "# TYPE pipeline_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {name: (list(counts), total, count) for name, (counts, total, count) in self._histograms.items()}
+            tokens = dict(self._tokens)
+            cache = dict(self._cache)
+
+        for stage in sorted(histograms):
+            counts, total, count = histograms[stage]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'pipeline_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'pipeline_stage_duration_seconds_sum{{stage="{stage}"}} {total}')
+            lines.append(f'pipeline_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+        lines.append("# HELP pipeline_llm_tokens_total 各阶段大模型调用的token数")
+        lines.append("# TYPE pipeline_llm_tokens_total counter")
+        for (stage, kind), value in sorted(tokens.items()):
+            lines.append(f'pipeline_llm_tokens_total{{stage="{stage}",kind="{kind}"}} {value}')
+
+        lines.append("# HELP pipeline_cache_lookups_total 各缓存的查找次数")
+        lines.append("# TYPE pipeline_cache_lookups_total counter")
+        for (name, result), value in sorted(cache.items()):
+            lines.append(f'pipeline_cache_lookups_total{{cache="{name}",result="{result}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._tokens.clear()
+            self._cache.clear()
+
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """LangChain回调：把大模型返回的token用量记到span上（提供商返回用量时才有）"""
+
+    # 只做几次字典读取：在调用线程内直接执行（否则异步链会把同步回调派发到线程池），并忽略Chain事件
+    run_inline = True
+    ignore_chain = True
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        usage = dict((response.llm_output or {}).get("token_usage") or {})
+        if not usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if metadata:
+                        for key, value in metadata.items():
+                            usage[key] = usage.get(key, 0) + value
+        prompt = usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0
+        completion = usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0
+        if prompt or completion:
+            self.span.add_tokens(int(prompt), int(completion))
+
+
+class Tracer:
+    """
+    进程内追踪器
+
+    `with tracer.span("rerank", documents=20) as span:` 记录一个阶段；结束的span交给各导出器
+    （默认只有Prometheus指标聚合），并汇入当前请求的Server-Timing。
+    关闭时span()直接返回共享的空span，开销只有一次属性判断。
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self.enabled = settings.enable_tracing if enabled is None else enabled
+        self.metrics = MetricsExporter()
+        self.exporters: List[Any] = [self.metrics]
+
+    def configure(self, enabled: bool) -> None:
+        self.enabled = enabled
+
+    def add_exporter(self, exporter: Any) -> None:
+        self.exporters.append(exporter)
+
+    def remove_exporter(self, exporter: Any) -> None:
+        if exporter in self.exporters:
+            self.exporters.remove(exporter)
+
+    def span(self, name: str, **attributes: Any):
+        """开始一个span（用作上下文管理器）"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def stream_span(self, name: str, **attributes: Any):
+        """
+        用于异步生成器的span：不设为当前span
+
+        生成器在yield处挂起时，调用方的代码不应被记到这个span上；生成器也可能在别的上下文中被关闭，
+        那时无法还原contextvar。token用量仍通过llm_config(span)的回调记录。
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes, activate=False)
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        """记录一次缓存查找，同时标记在当前span上"""
+        if not self.enabled:
+            return
+        self.metrics.record_cache(cache, hit)
+        span = _current_span.get()
+        if span is not None:
+            span.set(f"{cache}_cache_hit", hit)
+
+    def llm_config(self, span: Any) -> Dict[str, Any]:
+        """大模型调用的RunnableConfig：追踪开启时附带token用量回调"""
+        if isinstance(span, Span):
+            return {"callbacks": [TokenUsageCallback(span)]}
+        return {}
+
+    def _finish(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append(span)
+
+
+def merge_server_timing(existing: Optional[str], spans: Sequence[Span], total_ms: float) -> str:
+    """
+    把请求内的span合并进Server-Timing响应头：同名span耗时累加，
+    路由自己写入的同名阶段保持不变，缺少total时补上整个请求的耗时
+    """
+    entries = [item.strip() for item in (existing or "").split(",") if item.strip()]
+    present = {entry.split(";", 1)[0] for entry in entries}
+    durations: Dict[str, float] = {}
+    for span in spans:
+        if span.name not in present:
+            durations[span.name] = durations.get(span.name, 0.0) + span.duration_ms
+    entries.extend(f"{name};dur={round(ms, 1)}" for name, ms in durations.items())
+    if "total" not in present:
+        entries.append(f"total;dur={round(total_ms, 1)}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """ASGI中间件：收集每个请求内结束的span，在响应头中输出Server-Timing（流式响应只包含首字节前的阶段）"""
+
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        active_tracer = self.tracer or tracer
+        if scope["type"] != "http" or not active_tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Span] = []
+        token = _request_spans.set(spans)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = [(name, value) for name, value in message.get("headers", []) if name != b"server-timing"]
+                existing = next(
+                    (value.decode("latin-1") for name, value in message.get("headers", []) if name == b"server-timing"),
+                    None
+                )
+                value = merge_server_timing(existing, list(spans), (time.perf_counter() - started) * 1000)
+                headers.append((b"server-timing", value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_spans.reset(token)
+
+
+# 全局追踪器实例
+tracer = Tracer()
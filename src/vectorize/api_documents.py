@@ -0,0 +1,95 @@
+"""
+API文档渲染
+Renders api.json entries into markdown Documents with stable ids and content hashes
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# 检索结果分数的来源（写入结果文档元数据的score_source）：不同来源的分数不在同一尺度上，不能相互比较
+SCORE_SOURCE_RERANK = "rerank"  # Reranker的相关性分数
+SCORE_SOURCE_RRF = "rrf"  # 向量与词法召回的RRF融合分数
+SCORE_SOURCE_VECTOR = "vector"  # 1 - 向量距离
+
+
+def document_id(doc: Document) -> str:
+    """
+    文档的稳定标识：优先使用向量化时写入元数据的api_id，其次是API名称，否则使用内容哈希
+
+    召回、重排序、多路融合和多查询合并都以它为键做对齐和去重，不再比较或哈希整段Markdown内容。
+    """
+    metadata = doc.metadata
+    if metadata:
+        value = metadata.get("api_id") or metadata.get("name")
+        if value:
+            return value if type(value) is str else str(value)
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+def with_score_source(results: Sequence[Tuple[Document, float]], source: str) -> List[Tuple[Document, float]]:
+    """在结果文档的元数据中注明分数来源；返回文档副本，不修改召回或缓存中共享的文档"""
+    return [
+        (doc.model_copy(update={"metadata": {**(doc.metadata or {}), "score_source": source}}), score)
+        for doc, score in results
+    ]
+
+
+def api_id(api: Dict[str, Any]) -> str:
+    """API的稳定ID：优先使用api.json中的id字段，否则为"方法 路径"，名称或描述修改不影响ID"""
+    if api.get("id"):
+        return str(api["id"])
+    return f"{str(api.get('method', '')).upper()} {api.get('endpoint', '')}"
+
+
+def content_hash(content: str) -> str:
+    """渲染后Markdown的内容哈希"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def build_api_documents(api_docs_data: List[Dict[str, Any]]) -> List[Document]:
+    """将API定义渲染为带元数据的Markdown文档"""
+    docs = []
+    markdown_template = """
+### API名称: {name}
+
+**功能描述:**
+{description}
+
+**请求详情:**
+- **方法:** `{method}`
+- **路径:** `{endpoint}`
+
+**参数列表:**
+{params}
+
+**预期响应:**
+{response}
+"""
+
+    for api in api_docs_data:
+        param_list = [f"- **`{p.get('name')}`** (类型: {p.get('type')}, {'必需' if p.get('required') else '可选'}): {p.get('description')}" for p in api.get("params", [])]
+        param_str = "\n".join(param_list) if param_list else "无"
+        response_str = json.dumps(api.get("response", {}), ensure_ascii=False, indent=2)
+
+        content = markdown_template.format(
+            name=api.get("name"),
+            description=api.get("description"),
+            method=api.get("method"),
+            endpoint=api.get("endpoint"),
+            params=param_str,
+            response=response_str
+        )
+        metadata = {
+            "api_id": api_id(api),
+            "content_hash": content_hash(content),
+            "name": api.get("name"),
+            "description": api.get("description"),
+            "method": api.get("method"),
+            "endpoint": api.get("endpoint"),
+            "params_json": json.dumps(api.get("params", []), ensure_ascii=False)
+        }
+        docs.append(Document(page_content=content, metadata=metadata))
+    return docs
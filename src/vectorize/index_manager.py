@@ -0,0 +1,367 @@
+"""
+API索引代管理
+Blue/green generations of the api_docs collection with atomic swap and refcounted retirement
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from config.settings import settings
+from src.cache.plan_cache import PlanCache
+from src.utils.async_utils import get_blocking_executor, run_blocking
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.index_version import bump_index_version
+from src.vectorize.vectorizer import VectorStoreManager
+
+ACTIVE_POINTER_SUFFIX = ".active"
+
+
+def _pointer_path(persist_directory: str, base_name: str) -> str:
+    return os.path.join(persist_directory, f"{base_name}{ACTIVE_POINTER_SUFFIX}")
+
+
+def read_active_collection(persist_directory: str, base_name: str = "api_docs") -> str:
+    """读取当前生效的集合名称，没有指针文件时为base_name本身"""
+    path = _pointer_path(persist_directory, base_name)
+    if not os.path.exists(path):
+        return base_name
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip() or base_name
+
+
+def write_active_collection(persist_directory: str, base_name: str, collection_name: str) -> None:
+    """原子地更新生效集合指针，服务重启后加载该集合"""
+    os.makedirs(persist_directory, exist_ok=True)
+    path = _pointer_path(persist_directory, base_name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(collection_name)
+    os.replace(tmp_path, path)
+
+
+class IndexGeneration:
+    """一代API索引：向量集合与对应的api.json定义，二者总是一起切换"""
+
+    def __init__(
+        self,
+        generation_id: int,
+        vector_store_manager: VectorStoreManager,
+        api_definitions: List[Dict[str, Any]],
+        collection_name: str
+    ):
+        self.generation_id = generation_id
+        self.vector_store_manager = vector_store_manager
+        self.api_definitions = api_definitions
+        self.collection_name = collection_name
+        self.catalog_hash = PlanCache.catalog_hash(api_definitions)
+        # 准备回调在切换前为这一代构建的对象（如Agent、规划器），随这一代一起生效
+        self.services: Dict[str, Any] = {}
+        self.created_at = time.time()
+        # 正在使用这一代的请求数，退役后归零时才删除集合
+        self.refcount = 0
+        self.retired = False
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation_id,
+            "collection": self.collection_name,
+            "api_count": len(self.api_definitions),
+            "catalog_hash": self.catalog_hash,
+            "created_at": self.created_at,
+            "in_flight": self.refcount,
+        }
+
+
+class IndexManager:
+    """
+    API索引的蓝绿切换管理器
+
+    重建时在旁路新建一个集合（`<base_name>_g<时间戳>`），未变化的API直接复用旧集合里的向量，
+    只有新增或修改的API需要嵌入。构建完成后先调用准备回调为新一代构建依赖它的对象（热切换时在线程池中执行），
+    再在一次同步调用中通知监听者并切换当前代，正在处理的请求继续使用它们获取到的旧代，
+    旧代的集合在最后一个请求释放后删除。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        api_json_path: str = "data/api.json",
+        persist_directory: Optional[str] = None,
+        base_name: str = "api_docs"
+    ):
+        """
+        Args:
+            embeddings: 嵌入模型（通常是带缓存的嵌入模型）
+            api_json_path: API定义文件路径
+            persist_directory: 向量存储目录
+            base_name: 集合基础名称
+        """
+        self.embeddings = embeddings
+        self.api_json_path = api_json_path
+        self.persist_directory = persist_directory or settings.vector_store_path
+        self.base_name = base_name
+        self._current: Optional[IndexGeneration] = None
+        self._retiring: List[IndexGeneration] = []
+        self._listeners: List[Callable[[IndexGeneration], None]] = []
+        self._preparers: List[Callable[[IndexGeneration], None]] = []
+        self._lock = threading.Lock()
+        self._reload_lock = asyncio.Lock()
+        self._next_id = 1
+
+    @property
+    def current(self) -> Optional[IndexGeneration]:
+        return self._current
+
+    def add_listener(self, listener: Callable[[IndexGeneration], None]) -> None:
+        """
+        注册切换监听者，在切换当前代之前、锁外同步调用（监听者可以安全地访问IndexManager）
+
+        监听者在事件循环上执行，只应替换引用；较重的构建工作放到准备回调中。
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def add_preparer(self, preparer: Callable[[IndexGeneration], None]) -> None:
+        """注册准备回调，每一代构建完成后、生效前调用一次，把依赖这一代的对象存入generation.services"""
+        with self._lock:
+            self._preparers.append(preparer)
+
+    def _prepare(self, generation: IndexGeneration) -> None:
+        with self._lock:
+            preparers = list(self._preparers)
+        for preparer in preparers:
+            preparer(generation)
+
+    def load_api_definitions(self) -> List[Dict[str, Any]]:
+        with open(self.api_json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _new_generation(self, vsm: VectorStoreManager, api_definitions, collection_name: str) -> IndexGeneration:
+        with self._lock:
+            generation_id = self._next_id
+            self._next_id += 1
+        return IndexGeneration(generation_id, vsm, api_definitions, collection_name)
+
+    def load_initial(self, vector_store_manager: Optional[VectorStoreManager] = None) -> IndexGeneration:
+        """
+        加载指针指向的集合作为第一代并生效
+
+        Args:
+            vector_store_manager: 已加载集合的向量存储管理器，为空时按指针文件加载
+        """
+        collection_name = read_active_collection(self.persist_directory, self.base_name)
+        vsm = vector_store_manager
+        if vsm is None:
+            vsm = VectorStoreManager(embeddings=self.embeddings, persist_directory=self.persist_directory)
+            vsm.load_vector_store(collection_name=collection_name)
+        # 后续代与第一代共用同一个（带缓存的）嵌入模型
+        self.embeddings = vsm.embeddings
+        generation = self._new_generation(vsm, self.load_api_definitions(), collection_name)
+        self._prepare(generation)
+        self.activate(generation, persist_pointer=False)
+        self._drop_stale_collections(vsm, collection_name)
+        return generation
+
+    def _drop_stale_collections(self, vsm: VectorStoreManager, active_collection: str) -> None:
+        """删除之前进程遗留的、不再生效的旁路集合"""
+        if vsm.vector_store is None:
+            return
+        prefix = f"{self.base_name}_g"
+        try:
+            client = vsm.vector_store._client
+            for collection in client.list_collections():
+                name = collection if isinstance(collection, str) else collection.name
+                if name.startswith(prefix) and name != active_collection:
+                    client.delete_collection(name)
+                    if os.path.exists(vsm.lexical_index_path(name)):
+                        os.remove(vsm.lexical_index_path(name))
+                    logger.info(f"已删除遗留的索引集合: {name}")
+        except Exception as e:
+            logger.warning(f"清理遗留索引集合失败: {e}")
+
+    def build_generation(self, api_definitions: List[Dict[str, Any]]) -> IndexGeneration:
+        """
+        在旁路构建新一代集合并调用准备回调（阻塞调用，应在线程池中执行）
+
+        Args:
+            api_definitions: 新的API定义列表
+
+        Returns:
+            IndexGeneration: 尚未生效的新一代索引
+        """
+        documents = build_api_documents(api_definitions)
+        collection_name = f"{self.base_name}_g{time.time_ns() // 1_000_000}"
+        started = time.perf_counter()
+
+        reusable = self._reusable_embeddings()
+        vectors: List[Optional[List[float]]] = [reusable.get(doc.metadata["content_hash"]) for doc in documents]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([documents[i].page_content for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+
+        vsm = VectorStoreManager(embeddings=self.embeddings, persist_directory=self.persist_directory)
+        vsm.vector_store = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=vsm.embeddings,
+            collection_name=collection_name
+        )
+        batch_size = settings.index_build_batch_size
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            vsm.vector_store._collection.upsert(
+                ids=[doc.metadata["api_id"] for doc in batch],
+                embeddings=vectors[start:start + batch_size],
+                documents=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata for doc in batch]
+            )
+        vsm._refresh_index()
+        vsm.build_lexical_index()
+        bump_index_version(self.persist_directory)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"新索引集合 {collection_name} 构建完成: {len(documents)} 个API，"
+            f"复用向量 {len(documents) - len(missing)} 个，重新嵌入 {len(missing)} 个，耗时 {elapsed_ms:.0f}ms"
+        )
+        generation = self._new_generation(vsm, api_definitions, collection_name)
+        self._prepare(generation)
+        return generation
+
+    def _reusable_embeddings(self) -> Dict[str, List[float]]:
+        """按内容哈希取出当前代集合中的向量，供新一代复用"""
+        current = self._current
+        if current is None or current.vector_store_manager.vector_store is None:
+            return {}
+        try:
+            data = current.vector_store_manager.vector_store._collection.get(include=["embeddings", "metadatas"])
+        except Exception as e:
+            logger.warning(f"读取当前索引向量失败，将全部重新嵌入: {e}")
+            return {}
+        reusable = {}
+        for vector, metadata in zip(data.get("embeddings") if data.get("embeddings") is not None else [], data.get("metadatas") or []):
+            digest = (metadata or {}).get("content_hash")
+            if digest:
+                reusable[digest] = list(vector)
+        return reusable
+
+    def activate(self, generation: IndexGeneration, persist_pointer: bool = True) -> None:
+        """
+        通知监听者后原子地切换当前代；旧代进入退役状态，没有请求在使用时立即删除
+
+        这一代依赖的对象已在准备回调中构建好，监听者只做引用替换，在锁外调用，期间acquire不被阻塞。
+        先通知再切换：此时获取到旧代的请求最多多固定一次旧代，而不会在旧代被删除后仍使用旧的Agent。
+
+        Args:
+            generation: 新一代索引
+            persist_pointer: 是否更新磁盘上的生效集合指针
+        """
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(generation)
+        with self._lock:
+            previous, self._current = self._current, generation
+            if previous is not None and previous is not generation:
+                previous.retired = True
+                self._retiring.append(previous)
+        if persist_pointer:
+            write_active_collection(self.persist_directory, self.base_name, generation.collection_name)
+        logger.info(f"API索引已切换到第{generation.generation_id}代，集合: {generation.collection_name}")
+        if previous is not None:
+            self._maybe_drop(previous)
+
+    def acquire(self) -> Optional[IndexGeneration]:
+        """获取当前代并增加引用计数，使用完毕后必须调用release"""
+        with self._lock:
+            generation = self._current
+            if generation is not None:
+                generation.refcount += 1
+            return generation
+
+    def release(self, generation: Optional[IndexGeneration]) -> None:
+        if generation is None:
+            return
+        with self._lock:
+            generation.refcount -= 1
+        self._maybe_drop(generation)
+
+    def _maybe_drop(self, generation: IndexGeneration) -> None:
+        with self._lock:
+            if not generation.retired or generation.refcount > 0 or generation not in self._retiring:
+                return
+            self._retiring.remove(generation)
+        # 基础集合由scripts/vectorization.py维护，不删除
+        if generation.collection_name == self.base_name:
+            return
+        get_blocking_executor().submit(self._drop_collection, generation)
+
+    @staticmethod
+    def _drop_collection(generation: IndexGeneration) -> None:
+        try:
+            vsm = generation.vector_store_manager
+            vsm.vector_store.delete_collection()
+            lexical_path = vsm.lexical_index_path(generation.collection_name)
+            if os.path.exists(lexical_path):
+                os.remove(lexical_path)
+            logger.info(f"已删除退役的索引集合: {generation.collection_name}")
+        except Exception as e:
+            logger.warning(f"删除退役的索引集合 {generation.collection_name} 失败: {e}")
+
+    async def areload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        重新读取api.json并在旁路构建新一代索引后切换，多次并发调用会串行执行
+
+        Args:
+            force: API定义未变化时也重建
+
+        Returns:
+            Dict[str, Any]: 切换结果与当前代信息
+        """
+        async with self._reload_lock:
+            api_definitions = await run_blocking(self.load_api_definitions)
+            current = self._current
+            if not force and current is not None and current.catalog_hash == PlanCache.catalog_hash(api_definitions):
+                return {"status": "unchanged", **current.info()}
+            generation = await run_blocking(self.build_generation, api_definitions)
+            self.activate(generation)
+            return {"status": "swapped", **generation.info()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            current = self._current.info() if self._current is not None else None
+            retiring = [generation.info() for generation in self._retiring]
+        return {"current": current, "retiring": retiring}
+
+
+async def watch_api_json(index_manager: IndexManager, interval_seconds: float) -> None:
+    """轮询api.json的修改时间，变化后触发热切换（作为后台任务运行，取消即停止）"""
+    def mtime() -> Optional[int]:
+        try:
+            return os.stat(index_manager.api_json_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    last_seen = mtime()
+    logger.info(f"开始监听 {index_manager.api_json_path} 的变化，间隔 {interval_seconds}s")
+    while True:
+        await asyncio.sleep(interval_seconds)
+        current = mtime()
+        if current is None or current == last_seen:
+            continue
+        last_seen = current
+        logger.info(f"检测到 {index_manager.api_json_path} 已修改，开始构建新一代索引...")
+        try:
+            result = await index_manager.areload()
+            logger.info(f"api.json热更新完成: {result['status']}，当前第{result['generation']}代")
+        except Exception as e:
+            logger.exception(f"api.json热更新失败，继续使用当前索引: {e}")
@@ -0,0 +1,65 @@
+"""
+向量索引版本标记
+Version marker bumped whenever a collection in a vector store directory is rebuilt
+"""
+
+import os
+import threading
+import uuid
+from typing import Dict, Tuple
+
+from loguru import logger
+
+INDEX_VERSION_FILE = "index_version"
+
+_cache_lock = threading.Lock()
+# path -> (mtime_ns, version)，避免每次读取都打开文件
+_version_cache: Dict[str, Tuple[int, str]] = {}
+
+
+def _version_path(persist_directory: str) -> str:
+    return os.path.join(persist_directory, INDEX_VERSION_FILE)
+
+
+def bump_index_version(persist_directory: str) -> str:
+    """
+    生成新的索引版本并写入向量存储目录
+
+    Args:
+        persist_directory: 向量存储目录
+
+    Returns:
+        str: 新版本号
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    version = uuid.uuid4().hex
+    path = _version_path(persist_directory)
+    tmp_path = f"{path}.{version}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    logger.info(f"向量索引版本已更新: {version}")
+    return version
+
+
+def read_index_version(persist_directory: str) -> str:
+    """
+    读取向量存储目录的当前索引版本，目录从未重建过时返回空字符串
+
+    只有文件修改时间变化时才会重新读取文件内容。
+    """
+    path = _version_path(persist_directory)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return ""
+
+    cached = _version_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        version = f.read().strip()
+    with _cache_lock:
+        _version_cache[path] = (mtime_ns, version)
+    return version
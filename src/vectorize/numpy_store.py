@@ -0,0 +1,135 @@
+"""
+进程内精确向量索引
+Exact in-memory vector index backed by a contiguous NumPy float32 matrix
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class NumpyVectorStore:
+    """
+    基于NumPy矩阵的精确向量检索，适合几千条向量规模的小型目录
+
+    所有向量在加载时L2归一化一次，存为连续的float32矩阵。单个查询只需一次矩阵-向量乘法加
+    argpartition，批量查询是一次矩阵-矩阵乘法。返回的分数是归一化向量之间的平方L2距离
+    （2 - 2·cos），与Chroma默认的l2距离一致，越小越相似，下游阈值和分数换算无需修改。
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+        embedding_function: Optional[Embeddings] = None
+    ):
+        """
+        Args:
+            embeddings: 形状为(n, dim)的向量矩阵
+            documents: 文档内容，与向量一一对应
+            metadatas: 文档元数据，与向量一一对应
+            embedding_function: 查询嵌入模型
+        """
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError(f"向量矩阵形状{matrix.shape}与文档数量{len(documents)}不一致")
+        self.matrix = self._normalize(matrix)
+        self.documents = [
+            Document(page_content=content or "", metadata=metadata or {})
+            for content, metadata in zip(documents, metadatas)
+        ]
+        self.embedding_function = embedding_function
+
+    @classmethod
+    def from_chroma(cls, chroma: Any, embedding_function: Optional[Embeddings] = None) -> "NumpyVectorStore":
+        """
+        从已加载的Chroma集合一次性读取全部向量、文档和元数据
+
+        Args:
+            chroma: LangChain Chroma实例
+            embedding_function: 查询嵌入模型，默认使用Chroma上的嵌入模型
+
+        Returns:
+            NumpyVectorStore: 索引实例
+        """
+        data = chroma._collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = data.get("embeddings")
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        store = cls(
+            np.asarray(embeddings, dtype=np.float32),
+            data.get("documents") or [],
+            data.get("metadatas") or [],
+            embedding_function or getattr(chroma, "embeddings", None)
+        )
+        logger.info(f"NumPy向量索引加载完成，向量数量: {len(store)}，维度: {store.matrix.shape[1]}")
+        return store
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _top_k(self, similarities: np.ndarray, k: int) -> np.ndarray:
+        """返回每行相似度最高的k个下标（按相似度降序）"""
+        n = similarities.shape[-1]
+        if k >= n:
+            return np.argsort(-similarities, axis=-1)
+        candidates = np.argpartition(-similarities, k - 1, axis=-1)[..., :k]
+        order = np.argsort(-np.take_along_axis(similarities, candidates, axis=-1), axis=-1)
+        return np.take_along_axis(candidates, order, axis=-1)
+
+    def similarity_search_by_vectors_with_score(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        k: int = 4
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        批量向量检索：一次矩阵-矩阵乘法完成所有查询
+
+        Args:
+            query_embeddings: 查询向量列表
+            k: 每个查询返回的文档数量
+
+        Returns:
+            List[List[Tuple[Document, float]]]: 与查询一一对应的(文档, 距离)列表
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if len(self) == 0 or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        similarities = self._normalize(queries) @ self.matrix.T
+        indices = self._top_k(similarities, k)
+        distances = 2.0 - 2.0 * np.take_along_axis(similarities, indices, axis=-1)
+        return [
+            [(self.documents[i], float(max(d, 0.0))) for i, d in zip(row_indices, row_distances)]
+            for row_indices, row_distances in zip(indices.tolist(), distances.tolist())
+        ]
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: Sequence[float],
+        k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """单个查询向量检索"""
+        return self.similarity_search_by_vectors_with_score([embedding], k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """与Chroma.similarity_search_with_score兼容的文本检索"""
+        if self.embedding_function is None:
+            raise ValueError("NumPy向量索引未设置嵌入模型")
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """与Chroma.similarity_search兼容的文本检索"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
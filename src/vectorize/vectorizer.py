@@ -3,6 +3,8 @@
 Vector store utilities for RAG system
 """
 
+import asyncio
+import threading
 from typing import List, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
@@ -11,6 +13,13 @@ from loguru import logger
 import os
 import shutil
 from config.settings import settings
+from src.utils.async_utils import run_blocking, run_coroutine_sync
+from src.utils.tracing import tracer
+from src.cache.embedding_cache import CachedEmbeddings
+from src.vectorize.index_version import bump_index_version
+from src.vectorize.numpy_store import NumpyVectorStore
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.rank_fusion import merge_top_k
 
 class VectorStoreManager:
     """向量存储管理器"""
@@ -20,12 +29,21 @@ class VectorStoreManager:
         初始化向量存储管理器
         
         Args:
-            embeddings: 嵌入模型
+            embeddings: 嵌入模型，启用嵌入缓存时会被CachedEmbeddings包装
             persist_directory: 持久化目录
         """
+        if settings.enable_embedding_cache and embeddings is not None and not isinstance(embeddings, CachedEmbeddings):
+            embeddings = CachedEmbeddings(embeddings)
         self.embeddings = embeddings
         self.persist_directory = persist_directory or settings.vector_store_path
         self.vector_store: Optional[Chroma] = None
+        # vector_store_backend为numpy时，检索走进程内精确索引，Chroma只负责持久化
+        self.index: Optional[NumpyVectorStore] = None
+        # 启用混合检索时常驻内存的BM25索引，文档增删后标记为过期，下次词法检索时重建
+        self.lexical_index: Optional[BM25Index] = None
+        self._lexical_stale = False
+        # 串行化BM25重建：并发的词法检索发现索引过期时只重建一次
+        self._lexical_lock = threading.RLock()
         
         # 确保目录存在
         os.makedirs(self.persist_directory, exist_ok=True)
@@ -52,6 +70,9 @@ class VectorStoreManager:
                 collection_name=collection_name
             )
             
+            bump_index_version(self.persist_directory)
+            self._refresh_index()
+            self.build_lexical_index()
             logger.info(f"向量存储创建成功，集合名称: {collection_name}")
             return self.vector_store
             
@@ -76,6 +97,8 @@ class VectorStoreManager:
                     embedding_function=self.embeddings,
                     collection_name=collection_name
                 )
+                self._refresh_index()
+                self._load_lexical_index()
                 logger.info(f"向量存储加载成功，集合名称: {collection_name}")
                 return self.vector_store
             else:
@@ -86,24 +109,133 @@ class VectorStoreManager:
             logger.error(f"加载向量存储失败: {e}")
             return None
     
-    def add_documents(self, documents: List[Document]) -> None:
+    def _refresh_index(self) -> None:
+        """按配置从当前Chroma集合重建进程内NumPy索引"""
+        if settings.vector_store_backend != "numpy" or self.vector_store is None:
+            self.index = None
+            return
+        self.index = NumpyVectorStore.from_chroma(self.vector_store, self.embeddings)
+
+    def lexical_index_path(self, collection_name: Optional[str] = None) -> str:
+        """BM25索引文件路径，与集合一一对应"""
+        if collection_name is None:
+            collection_name = self.vector_store._collection.name
+        return os.path.join(self.persist_directory, f"{collection_name}.bm25.npz")
+
+    def build_lexical_index(self) -> Optional[BM25Index]:
+        """从当前Chroma集合重建BM25索引并持久化（向量化完成时调用）"""
+        with self._lexical_lock:
+            if not settings.enable_hybrid_retrieval or self.vector_store is None:
+                self.lexical_index = None
+                self._lexical_stale = False
+                return None
+            index = BM25Index.from_chroma(self.vector_store)
+            try:
+                index.save(self.lexical_index_path())
+            except Exception as e:
+                logger.warning(f"保存BM25索引失败: {e}")
+            # 新索引就绪后才清除过期标记，重建期间的检索会在锁上等待而不是读到旧索引
+            self.lexical_index = index
+            self._lexical_stale = False
+            logger.debug(f"BM25索引构建完成，文档数量: {len(index)}")
+            return index
+
+    def _mark_lexical_stale(self) -> None:
+        """文档增删后标记BM25索引过期；与重建互斥，重建期间的增删不会被重建结束时的清除覆盖"""
+        with self._lexical_lock:
+            self._lexical_stale = settings.enable_hybrid_retrieval
+
+    def _load_lexical_index(self) -> None:
+        """加载向量化时构建的BM25索引，文件缺失或与集合文档数不一致时重建"""
+        self._lexical_stale = False
+        if not settings.enable_hybrid_retrieval or self.vector_store is None:
+            self.lexical_index = None
+            return
+        index = BM25Index.load(self.lexical_index_path())
+        if index is None or len(index) != self.vector_store._collection.count():
+            self.build_lexical_index()
+        else:
+            self.lexical_index = index
+
+    def lexical_search(self, query: str, k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """
+        BM25词法检索
+
+        Args:
+            query: 查询文本
+            k: 返回文档数量
+
+        Returns:
+            List[Tuple[Document, float]]: (文档, BM25分数)列表，未启用混合检索时为空
+        """
+        if self._lexical_stale:
+            with self._lexical_lock:
+                # 等锁期间其他线程可能已经重建完成
+                if self._lexical_stale:
+                    self.build_lexical_index()
+        index = self.lexical_index
+        if index is None:
+            return []
+        with tracer.span("lexical_search"):
+            return index.search(query, k=k or settings.lexical_k)
+
+    def batch_lexical_search(self, queries: List[str], k: Optional[int] = None) -> List[List[Tuple[Document, float]]]:
+        """批量BM25词法检索"""
+        return [self.lexical_search(query, k) for query in queries]
+
+    def _search_backend(self):
+        """返回检索使用的后端：NumPy索引优先，否则为Chroma"""
+        if self.index is not None:
+            return self.index
+        if self.vector_store is None:
+            raise ValueError("向量存储未初始化")
+        return self.vector_store
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
         """
-        向现有向量存储添加文档
+        向现有向量存储添加文档，指定ids时相同ID的文档会被覆盖（upsert）
         
         Args:
             documents: 要添加的文档列表
+            ids: 文档ID列表
         """
         if self.vector_store is None:
             raise ValueError("向量存储未初始化")
         
         try:
-            self.vector_store.add_documents(documents)
+            self.vector_store.add_documents(documents, ids=ids)
+            bump_index_version(self.persist_directory)
+            self._refresh_index()
+            self._mark_lexical_stale()
             logger.info(f"成功添加{len(documents)}个文档到向量存储")
             
         except Exception as e:
             logger.error(f"添加文档到向量存储失败: {e}")
             raise
     
+    def delete_documents(self, ids: List[str]) -> None:
+        """
+        按ID从向量存储删除文档
+
+        Args:
+            ids: 要删除的文档ID列表
+        """
+        if self.vector_store is None:
+            raise ValueError("向量存储未初始化")
+        if not ids:
+            return
+
+        try:
+            self.vector_store.delete(ids=ids)
+            bump_index_version(self.persist_directory)
+            self._refresh_index()
+            self._mark_lexical_stale()
+            logger.info(f"成功从向量存储删除{len(ids)}个文档")
+
+        except Exception as e:
+            logger.error(f"从向量存储删除文档失败: {e}")
+            raise
+
     def similarity_search(self, query: str, k: Optional[int] = None) -> List[Document]:
         """
         相似度搜索
@@ -115,14 +247,13 @@ class VectorStoreManager:
         Returns:
             List[Document]: 相似文档列表
         """
-        if self.vector_store is None:
-            raise ValueError("向量存储未初始化")
+        backend = self._search_backend()
         
         if k is None:
             k = settings.retrieval_k
         
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            results = backend.similarity_search(query, k=k)
             logger.debug(f"相似度搜索完成，查询: {query[:50]}..., 返回{len(results)}个结果")
             return results
             
@@ -141,15 +272,15 @@ class VectorStoreManager:
         Returns:
             List[Tuple[Document, float]]: (文档, 相似度分数)列表
         """
-        if self.vector_store is None:
-            raise ValueError("向量存储未初始化")
+        backend = self._search_backend()
         
         if k is None:
             k = settings.retrieval_k
         
         try:
             # 移除阈值过滤，将召回的文档全部交给Reranker处理
-            results = self.vector_store.similarity_search_with_score(query, k=k)
+            with tracer.span("vector_search", k=k):
+                results = backend.similarity_search_with_score(query, k=k)
             logger.debug(f"带分数相似度搜索完成，查询: {query[:50]}..., 返回{len(results)}个结果")
             return results
             
@@ -157,6 +288,81 @@ class VectorStoreManager:
             logger.error(f"带分数相似度搜索失败: {e}")
             raise
     
+    async def asimilarity_search_with_score(self, query: str, k: Optional[int] = None) -> List[Tuple[Document, float]]:
+        """
+        带分数的相似度搜索（异步）
+
+        Chroma没有异步客户端，查询嵌入和检索在有界线程池中执行。
+
+        Args:
+            query: 查询文本
+            k: 返回文档数量
+
+        Returns:
+            List[Tuple[Document, float]]: (文档, 相似度分数)列表
+        """
+        return await run_blocking(self.similarity_search_with_score, query, k)
+
+    def batch_similarity_search_with_score(
+        self,
+        queries: List[str],
+        k: Optional[int] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        批量带分数的相似度搜索：所有查询通过一次embed_documents调用完成嵌入，
+        再用一次Chroma query（多个查询向量）或一次NumPy矩阵乘法完成检索。
+
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的文档数量
+
+        Returns:
+            List[List[Tuple[Document, float]]]: 与queries一一对应的(文档, 相似度分数)列表
+        """
+        if self.vector_store is None:
+            raise ValueError("向量存储未初始化")
+
+        if k is None:
+            k = settings.retrieval_k
+        if not queries:
+            return []
+
+        try:
+            with tracer.span("vector_search", k=k, queries=len(queries)):
+                query_embeddings = self.embeddings.embed_documents(queries)
+                if self.index is not None:
+                    results = self.index.similarity_search_by_vectors_with_score(query_embeddings, k)
+                    logger.debug(f"批量相似度搜索完成（NumPy索引），查询数量: {len(queries)}, k={k}")
+                    return results
+
+                response = self.vector_store._collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=k,
+                    include=["documents", "metadatas", "distances"]
+                )
+                results = []
+                for documents, metadatas, distances in zip(
+                    response["documents"], response["metadatas"], response["distances"]
+                ):
+                    results.append([
+                        (Document(page_content=content, metadata=metadata or {}), distance)
+                        for content, metadata, distance in zip(documents, metadatas, distances)
+                    ])
+                logger.debug(f"批量相似度搜索完成，查询数量: {len(queries)}, k={k}")
+                return results
+
+        except Exception as e:
+            logger.error(f"批量相似度搜索失败: {e}")
+            raise
+
+    async def abatch_similarity_search_with_score(
+        self,
+        queries: List[str],
+        k: Optional[int] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """批量带分数的相似度搜索（异步），在有界线程池中执行"""
+        return await run_blocking(self.batch_similarity_search_with_score, queries, k)
+
     def create_retriever(self, search_type: str = "similarity", search_kwargs: Optional[dict] = None):
         """
         创建检索器
@@ -197,6 +403,9 @@ class VectorStoreManager:
                 except:
                     pass
                 self.vector_store = None
+            self.index = None
+            self.lexical_index = None
+            self._lexical_stale = False
 
             # 等待一下让文件句柄释放
             import time
@@ -265,6 +474,12 @@ class VectorStoreManager:
                     collection_name=collection_name
                 )
                 vector_store.delete_collection()
+                bump_index_version(self.persist_directory)
+                self.index = None
+                self.lexical_index = None
+                self._lexical_stale = False
+                if os.path.exists(self.lexical_index_path(collection_name)):
+                    os.remove(self.lexical_index_path(collection_name))
                 logger.info(f"集合 {collection_name} 已清空")
 
         except Exception as e:
@@ -311,6 +526,8 @@ class VectorStoreManager:
                 collection_name=collection_name
             )
 
+            self._refresh_index()
+            self.build_lexical_index()
             logger.info(f"隔离向量存储创建成功，文档数量: {len(documents)}")
             return self.vector_store
 
@@ -326,6 +543,8 @@ class VectorStoreManager:
                     persist_directory=self.persist_directory,
                     collection_name=fallback_collection
                 )
+                self._refresh_index()
+                self.build_lexical_index()
                 logger.info(f"回退模式创建成功，集合名称: {fallback_collection}")
                 return self.vector_store
             except Exception as e2:
@@ -370,8 +589,7 @@ class VectorStoreManager:
         Returns:
             List[Tuple[Document, float, float]]: (文档, 向量分数, 重排序分数)列表
         """
-        if self.vector_store is None:
-            raise ValueError("向量存储未初始化")
+        backend = self._search_backend()
 
         if k is None:
             k = settings.rerank_final_k
@@ -381,7 +599,7 @@ class VectorStoreManager:
         try:
             # 第一步：向量检索
             initial_k = settings.rerank_top_k if use_reranking else k
-            vector_results = self.vector_store.similarity_search_with_score(query, k=initial_k)
+            vector_results = backend.similarity_search_with_score(query, k=initial_k)
 
             if not vector_results:
                 return []
@@ -389,8 +607,8 @@ class VectorStoreManager:
             # 第二步：重排序（如果启用）
             if use_reranking and settings.enable_reranking:
                 try:
-                    from src.reranker import RerankerManager
-                    reranker = RerankerManager()
+                    from src.rerank.reranker import RerankerManager
+                    reranker = RerankerManager.get_shared()
 
                     if reranker.enabled:
                         reranked_results = reranker.rerank_with_scores(query, vector_results, k)
@@ -411,6 +629,15 @@ class VectorStoreManager:
             logger.error(f"增强相似度搜索失败: {e}")
             raise
 
+    async def aenhanced_similarity_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        use_reranking: Optional[bool] = None
+    ) -> List[Tuple[Document, float, float]]:
+        """enhanced_similarity_search的异步版本，在有界线程池中执行"""
+        return await run_blocking(self.enhanced_similarity_search, query, k, use_reranking)
+
     def multi_query_search(
         self,
         queries: List[str],
@@ -418,13 +645,35 @@ class VectorStoreManager:
         final_k: Optional[int] = None
     ) -> List[Tuple[Document, float, float]]:
         """
-        多查询搜索并合并结果
+        多查询搜索并合并结果（amulti_query_search的同步包装）
 
         Args:
             queries: 查询列表
             k_per_query: 每个查询返回的文档数量
             final_k: 最终返回的文档数量
 
+        Returns:
+            List[Tuple[Document, float, float]]: 合并后的文档列表
+        """
+        return run_coroutine_sync(self.amulti_query_search(queries, k_per_query, final_k))
+
+    async def amulti_query_search(
+        self,
+        queries: List[str],
+        k_per_query: Optional[int] = None,
+        final_k: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> List[Tuple[Document, float, float]]:
+        """
+        多查询搜索并合并结果（异步）：各查询并发执行增强检索（并发上限concurrency），
+        启用重排序时调用速率受共享重排序器的令牌桶限制；结果按文档ID去重后用堆取top-k
+
+        Args:
+            queries: 查询列表
+            k_per_query: 每个查询返回的文档数量
+            final_k: 最终返回的文档数量
+            concurrency: 并发上限，缺省为settings.multi_query_concurrency
+
         Returns:
             List[Tuple[Document, float, float]]: 合并后的文档列表
         """
@@ -433,23 +682,24 @@ class VectorStoreManager:
         if final_k is None:
             final_k = settings.rerank_final_k
 
-        all_results = []
-        seen_contents = set()
+        rate_limiter = None
+        if settings.enable_reranking:
+            from src.rerank.reranker import RerankerManager
+            reranker = RerankerManager.get_shared()
+            if reranker.enabled:
+                rate_limiter = reranker.rate_limiter
+        semaphore = asyncio.Semaphore(concurrency or settings.multi_query_concurrency)
 
-        for query in queries:
-            try:
-                query_results = self.enhanced_similarity_search(query, k=k_per_query)
-
-                for doc, vec_score, rerank_score in query_results:
-                    content_hash = hash(doc.page_content)
-                    if content_hash not in seen_contents:
-                        seen_contents.add(content_hash)
-                        all_results.append((doc, vec_score, rerank_score))
-
-            except Exception as e:
-                logger.error(f"查询 '{query}' 搜索失败: {e}")
-                continue
+        async def search(query: str) -> List[Tuple[Document, float, float]]:
+            async with semaphore:
+                try:
+                    if rate_limiter is not None:
+                        await rate_limiter.acquire()
+                    return await self.aenhanced_similarity_search(query, k=k_per_query)
+                except Exception as e:
+                    logger.error(f"查询 '{query}' 搜索失败: {e}")
+                    return []
 
-        # 按重排序分数排序
-        all_results.sort(key=lambda x: x[2], reverse=True)
-        return all_results[:final_k]
+        results = await asyncio.gather(*(search(query) for query in queries))
+        # 按重排序分数取top-k
+        return merge_top_k(results, final_k, score=lambda result: result[2])
@@ -0,0 +1,10 @@
+"""
+pytest公共配置
+测试运行时把日志文件指向临时目录，避免写入版本库中的logs/app.log
+"""
+
+import os
+import tempfile
+
+# 必须在导入config.settings之前设置
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="api-rag-test-logs-"), "app.log"))
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agent.api_rag_agent import ApiRagAgent
+from src.agent.api_schema import ApiSchemaRegistry
+from src.utils.groovy_script_generator import GroovyScriptGenerator
+from src.vectorize.api_documents import build_api_documents
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+
+class TestApiSchemaRegistry(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            cls.api_definitions = json.load(f)
+        cls.registry = ApiSchemaRegistry.from_file(API_JSON_PATH)
+        cls.metadatas = {doc.metadata["name"]: doc.metadata for doc in build_api_documents(cls.api_definitions)}
+
+    def test_lookup_by_id_and_name(self):
+        self.assertEqual(len(self.registry), len(self.api_definitions))
+        schema = self.registry.get("获取员工项目信息")
+        self.assertIs(self.registry.get("GET /api/v1/employees/{staffId}/project"), schema)
+        self.assertEqual(schema.required, frozenset({"staffId"}))
+        self.assertEqual(schema.placeholders, frozenset({"staffId"}))
+        self.assertEqual(schema.path_template, ("/api/v1/employees/", "staffId", "/project"))
+
+    def test_metadata_lookup_does_not_parse_params_json(self):
+        metadata = self.metadatas["提交请假申请"]
+        with patch("src.agent.api_schema.json.loads") as loads:
+            schema = self.registry.for_metadata(metadata)
+        loads.assert_not_called()
+        self.assertIs(schema, self.registry.get("提交请假申请"))
+
+        # 注册表中没有的API按元数据编译一次并缓存
+        empty = ApiSchemaRegistry()
+        self.assertIs(empty.for_metadata(metadata), empty.for_metadata(dict(metadata)))
+        self.assertEqual(len(empty.for_metadata(metadata).params), 6)
+
+    def test_schema_is_immutable(self):
+        schema = self.registry.get("提交请假申请")
+        with self.assertRaises(AttributeError):
+            schema.extra = 1
+        with self.assertRaises(TypeError):
+            schema.params_by_name["userId"] = None
+        with self.assertRaises(TypeError):
+            schema.params[0].definition["name"] = "x"
+
+    def test_render_path(self):
+        schema = self.registry.get("获取员工项目信息")
+        self.assertEqual(schema.render_path({"staffId": "s_1"}), ("/api/v1/employees/s_1/project", []))
+        self.assertEqual(schema.render_path({}), ("/api/v1/employees/{staffId}/project", ["staffId"]))
+
+    def test_assemble_api_call(self):
+        schema = self.registry.get("获取员工项目信息")
+        result = ApiRagAgent._assemble_api_call(schema, {}, {"staffId": "s_123"})
+        self.assertEqual(result["url"], "/api/v1/employees/s_123/project")
+        self.assertEqual(result["param_sources"], {"staffId": "rule"})
+
+        result = ApiRagAgent._assemble_api_call(schema, {"staffId": "__MISSING__"})
+        self.assertEqual(result["url"], "/api/v1/employees/{staffId}/project")
+        self.assertEqual([p["name"] for p in result["missing"]], ["staffId"])
+
+    def test_groovy_script_uses_schema(self):
+        metadata = self.metadatas["提交请假申请"]
+        known_data = {"userId": "s_1", "reason": "身体不适"}
+        with_schema = GroovyScriptGenerator.generate(metadata, known_data, self.registry.for_metadata(metadata))
+        self.assertEqual(with_schema, GroovyScriptGenerator.generate(metadata, known_data))
+        self.assertIn("- fromDate", with_schema)
+        self.assertIn('userId: """s_1"""', with_schema)
+
+
+if __name__ == '__main__':
+    unittest.main()
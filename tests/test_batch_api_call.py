@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.agent.api_rag_agent import ApiRagAgent
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.vectorizer import VectorStoreManager
+from scripts.vectorization import build_api_documents
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """记录嵌入调用次数的离线嵌入模型"""
+
+    def __init__(self):
+        super().__init__()
+        self.document_calls = 0
+        self.query_calls = 0
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+
+async def _stub_param_fill(prompt_value):
+    await asyncio.sleep(0.01)
+    return '{}'
+
+
+class TestBatchApiCall(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            documents = build_api_documents(json.load(f))
+        cls.embeddings = CountingEmbeddings()
+        cls.vsm = VectorStoreManager(embeddings=cls.embeddings, persist_directory=cls.tmp_dir.name)
+        cls.vsm.create_vector_store(documents, collection_name="api_docs")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.agent = ApiRagAgent(vector_store_manager=self.vsm, llm=RunnableLambda(_stub_param_fill))
+        self.agent.retriever.reranker.enabled = False
+
+    def test_batch_streams_ndjson_with_input_index(self):
+        """/generate-api-call/batch 接口应一次嵌入所有查询，并按行返回带下标的结果"""
+        queries = ["帮我解锁用户", "", "获取项目详情", "帮我解锁用户", "查询用户状态"]
+        self.embeddings.document_calls = 0
+        self.embeddings.query_calls = 0
+
+        with patch('src.main.api_agent', self.agent):
+            response = self.client.post("/generate-api-call/batch", json={"queries": queries})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        lines = [json.loads(line) for line in response.text.splitlines() if line]
+
+        self.assertEqual(sorted(line["index"] for line in lines), list(range(len(queries))))
+        by_index = {line["index"]: line for line in lines}
+        self.assertIn("error", by_index[1])
+        self.assertEqual(by_index[0]["result"]["url"], "/api/v1/users/unlock")
+        self.assertEqual(by_index[2]["result"]["url"], "/api/v1/projects/{projectId}")
+        self.assertEqual(self.embeddings.document_calls, 1)
+        self.assertEqual(self.embeddings.query_calls, 0)
+
+    def test_batch_rejects_empty_list(self):
+        response = self.client.post("/generate-api-call/batch", json={"queries": []})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
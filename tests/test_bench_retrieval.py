@@ -0,0 +1,61 @@
+import copy
+import os
+import sys
+import unittest
+
+from loguru import logger
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.bench_retrieval import CONFIGURATIONS, compare_reports, quality_metrics, run_benchmark
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class TestRetrievalBenchmark(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # 基准逐条检索会产生大量DEBUG日志
+        logger.disable("src")
+        cls.report = run_benchmark(data_dir=DATA_DIR, synthetic_sizes=(), ks=(1, 5), concurrency=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("src")
+
+    def test_quality_metrics(self):
+        metrics = quality_metrics([1, 2, None, 6], ks=(1, 5))
+        self.assertEqual(metrics, {"recall@1": 0.25, "recall@5": 0.5, "mrr": round((1 + 0.5 + 1 / 6) / 4, 4)})
+
+    def test_report_covers_datasets_and_configurations(self):
+        self.assertEqual(set(self.report["datasets"]), {"api", "api_test"})
+        for result in self.report["datasets"].values():
+            self.assertGreater(result["queries"], 0)
+            self.assertEqual(set(result["configurations"]), set(CONFIGURATIONS))
+            for metrics in result["configurations"].values():
+                self.assertGreaterEqual(metrics["recall@5"], metrics["recall@1"])
+                self.assertLessEqual(metrics["latency_ms"]["p50"], metrics["latency_ms"]["p95"])
+                self.assertGreater(metrics["throughput_qps"], 0)
+
+    def test_quality_is_deterministic(self):
+        again = run_benchmark(data_dir=DATA_DIR, synthetic_sizes=(), ks=(1, 5), concurrency=4)
+        self.assertEqual(compare_reports(self.report, again, tolerance=0.0), [])
+        self.assertEqual(
+            self.report["datasets"]["api"]["configurations"]["vector"]["misses"],
+            again["datasets"]["api"]["configurations"]["vector"]["misses"]
+        )
+
+    def test_compare_reports_flags_regressions(self):
+        worse = copy.deepcopy(self.report)
+        metrics = worse["datasets"]["api"]["configurations"]["hybrid+rerank"]
+        metrics["recall@1"] -= 0.1
+        metrics["latency_ms"]["p95"] *= 10
+        regressions = compare_reports(self.report, worse, tolerance=0.01)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("api/hybrid+rerank recall@1", regressions[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
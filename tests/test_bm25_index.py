@@ -0,0 +1,124 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.synthetic_catalog import generate_catalog
+from scripts.vectorization import build_api_documents
+from src.retrieval.bm25_index import BM25Index, tokenize
+from src.retrieval.rank_fusion import reciprocal_rank_fusion
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_cjk_unigrams_and_bigrams(self):
+        self.assertEqual(tokenize("解锁用户"), ["解", "锁", "用", "户", "解锁", "锁用", "用户"])
+
+    def test_ascii_words_and_camel_case(self):
+        tokens = tokenize("GET /api/v1/employees/{staffId}/project")
+        for token in ("get", "api", "v1", "employees", "staffid", "staff", "id", "project"):
+            self.assertIn(token, tokens)
+
+
+class TestBM25Index(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            cls.documents = build_api_documents(generate_catalog(200, base=json.load(f)))
+        cls.index = BM25Index.build(cls.documents)
+
+    def test_exact_identifier_ranks_first(self):
+        results = self.index.search("staffId project", k=3)
+        self.assertEqual(results[0][0].metadata["endpoint"], "/api/v1/employees/{staffId}/project")
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_no_match_returns_empty(self):
+        self.assertEqual(self.index.search("zzzqqq", k=5), [])
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "api_docs.bm25.npz")
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+        self.assertEqual(len(loaded), len(self.index))
+        for query in ("帮我解锁用户", "提交请假申请"):
+            expected = self.index.search(query, k=5)
+            actual = loaded.search(query, k=5)
+            self.assertEqual([d.page_content for d, _ in actual], [d.page_content for d, _ in expected])
+            for (_, a), (_, e) in zip(actual, expected):
+                self.assertAlmostEqual(a, e, places=5)
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_documents_in_both_lists_rank_first(self):
+        a, b, c = (Document(page_content=n, metadata={"api_id": n}) for n in "abc")
+        fused = reciprocal_rank_fusion([[a, b], [c, b]], k=60)
+        self.assertEqual([doc.metadata["api_id"] for doc, _ in fused], ["b", "a", "c"])
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 62)
+        self.assertEqual(len(reciprocal_rank_fusion([[a, b], [c, b]], limit=2)), 2)
+
+
+class TestVectorStoreLexicalIndex(unittest.TestCase):
+
+    def test_built_at_vectorization_and_loaded(self):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            documents = build_api_documents(json.load(f))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+            vsm.load_vector_store(collection_name="api_docs")
+            vsm.add_documents(documents[:-1], ids=[doc.metadata["api_id"] for doc in documents[:-1]])
+            # 文档变化后索引在下次词法检索时重建
+            self.assertTrue(vsm.lexical_search("员工"))
+            self.assertEqual(len(vsm.lexical_index), len(documents) - 1)
+            vsm.add_documents(documents[-1:], ids=[documents[-1].metadata["api_id"]])
+            vsm.build_lexical_index()
+            self.assertTrue(os.path.exists(vsm.lexical_index_path()))
+
+            reloaded = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+            reloaded.load_vector_store(collection_name="api_docs")
+            self.assertEqual(len(reloaded.lexical_index), len(documents))
+            results = reloaded.lexical_search("staffId", k=1)
+            self.assertEqual(results[0][0].metadata["endpoint"], "/api/v1/employees/{staffId}/project")
+
+    def test_concurrent_searches_rebuild_stale_index_once(self):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            documents = build_api_documents(json.load(f))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+            vsm.load_vector_store(collection_name="api_docs")
+            vsm.add_documents(documents, ids=[doc.metadata["api_id"] for doc in documents])
+
+            builds = []
+            original = BM25Index.from_chroma
+
+            def slow_from_chroma(vector_store):
+                builds.append(1)
+                time.sleep(0.05)
+                return original(vector_store)
+
+            with patch.object(BM25Index, "from_chroma", side_effect=slow_from_chroma):
+                with ThreadPoolExecutor(max_workers=8) as pool:
+                    results = list(pool.map(lambda _: vsm.lexical_search("员工"), range(8)))
+
+            self.assertEqual(len(builds), 1)
+            self.assertTrue(all(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+from langchain_core.documents import Document
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.planning.candidate_selector import CandidateSelector
+from src.planning.task_planner import TaskPlanner
+
+CATALOG = [{"name": f"API{i}", "description": f"第{i}个API"} for i in range(10)] + [
+    {"name": "获取员工项目信息", "description": "获取员工信息"},
+    {"name": "提交请假申请", "description": "提交请假"},
+    {"name": "审批请假申请", "description": "审批请假"},
+]
+
+
+class FakeVectorStoreManager:
+    """按预设结果返回的向量检索"""
+
+    def __init__(self, results):
+        self.results = results
+
+    def similarity_search_with_score(self, query, k=None):
+        return self.results[:k]
+
+
+def _recall(*pairs):
+    return [(Document(page_content=name, metadata={"name": name}), distance) for name, distance in pairs]
+
+
+class TestCandidateSelector(unittest.TestCase):
+
+    def test_selects_top_n_plus_transitive_prerequisites(self):
+        vsm = FakeVectorStoreManager(_recall(("审批请假申请", 0.2), ("API3", 0.5)))
+        selector = CandidateSelector(
+            vsm,
+            prerequisites={"审批请假申请": ["提交请假申请"], "提交请假申请": ["获取员工项目信息"]},
+            top_n=2,
+            max_distance=1.0
+        )
+
+        names = [api["name"] for api in selector.select("审批我的请假", CATALOG)]
+        self.assertEqual(names, ["API3", "获取员工项目信息", "提交请假申请", "审批请假申请"])
+
+    def test_falls_back_to_full_catalog_on_low_confidence(self):
+        vsm = FakeVectorStoreManager(_recall(("API1", 1.8), ("API2", 1.9)))
+        selector = CandidateSelector(vsm, top_n=2, max_distance=1.0)
+        self.assertEqual(selector.select("今天天气怎么样", CATALOG), CATALOG)
+
+    def test_planner_prompt_only_contains_candidates(self):
+        vsm = FakeVectorStoreManager(_recall(("提交请假申请", 0.1)))
+        selector = CandidateSelector(vsm, prerequisites={"提交请假申请": ["获取员工项目信息"]}, top_n=1)
+        planner = TaskPlanner(llm=None, candidate_selector=selector)
+
+        candidates = selector.select("我要请假", CATALOG)
+        prompt = planner._build_prompt("我要请假", candidates)
+        self.assertIn("获取员工项目信息", prompt)
+        self.assertNotIn("API3", prompt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import settings
+from src.utils.client_registry import ClientRegistry, client_registry
+from src.utils.llm_factory import LLMFactory
+from src.rerank.reranker import RerankerManager
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    def test_concurrent_get_or_create_builds_once(self):
+        registry = ClientRegistry()
+        created = []
+
+        def factory():
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get_or_create(("llm", "x", "m"), factory)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(result is created[0] for result in results))
+
+    def test_factory_returns_shared_instances(self):
+        with patch.object(settings, 'dashscope_api_key', 'sk-test'):
+            try:
+                self.assertIs(LLMFactory.create_llm('dashscope'), LLMFactory.create_llm('dashscope'))
+                self.assertIs(LLMFactory.create_embeddings('dashscope'), LLMFactory.create_embeddings('dashscope'))
+                self.assertIs(RerankerManager.get_shared(), RerankerManager.get_shared())
+                self.assertIsNot(RerankerManager.get_shared(), RerankerManager.get_shared("gte-rerank"))
+            finally:
+                client_registry.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.agent.api_rag_agent import ApiRagAgent
+from src.planning.task_planner import TaskPlanner
+from src.vectorize.vectorizer import VectorStoreManager
+
+# 每次模拟的LLM/检索调用耗时（秒）
+STUB_LATENCY = 0.05
+TOTAL_REQUESTS = 16
+
+PLAN_JSON = {
+    "type": "sequential",
+    "tasks": [{"api_name": "获取员工项目信息", "description": "获取员工的基础信息。"}]
+}
+
+LEAVE_API_DOC = Document(
+    page_content="### API名称: 提交请假申请",
+    metadata={
+        "name": "提交请假申请",
+        "description": "员工提交请假申请，需要包含详细的请假信息。",
+        "method": "POST",
+        "endpoint": "/api/v1/leaves",
+        "params_json": json.dumps([{"name": "reason", "description": "请假事由", "required": True}], ensure_ascii=False)
+    }
+)
+
+
+class StubAsyncLLM:
+    """模拟一个只提供异步接口、固定延迟的大模型。"""
+
+    def __init__(self, response: str):
+        self.response = response
+
+    async def ainvoke(self, _input, *args, **kwargs):
+        await asyncio.sleep(STUB_LATENCY)
+        return self.response
+
+
+class BlockingVectorStoreManager(VectorStoreManager):
+    """向量检索是阻塞调用（模拟Chroma），用来验证它不会卡住事件循环。"""
+
+    def __init__(self, persist_directory: str):
+        super().__init__(embeddings=None, persist_directory=persist_directory)
+        self.vector_store = object()
+
+    def similarity_search_with_score(self, query, k=None):
+        time.sleep(STUB_LATENCY)
+        return [(LEAVE_API_DOC, 0.1)]
+
+
+async def _stub_param_fill(_prompt_value):
+    await asyncio.sleep(STUB_LATENCY)
+    return '{"reason": "身体不适"}'
+
+
+async def _measure_throughput(path: str, payload: dict, concurrency: int) -> float:
+    """以给定并发度发出TOTAL_REQUESTS个请求，返回吞吐量(请求/秒)。"""
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        async def one_request():
+            async with semaphore:
+                response = await client.post(path, json=payload)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(TOTAL_REQUESTS)))
+        elapsed = time.perf_counter() - start
+    return TOTAL_REQUESTS / elapsed
+
+
+class TestConcurrencyScaling(unittest.IsolatedAsyncioTestCase):
+    """负载测试：在模拟的LLM下，吞吐量应随并发度增长，而不是被串行化。"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def _assert_scales(self, path: str, payload: dict):
+        results = {}
+        for concurrency in (1, 4, 16):
+            results[concurrency] = await _measure_throughput(path, payload, concurrency)
+            print(f"{path} 并发度={concurrency:<2} 吞吐量={results[concurrency]:.1f} req/s")
+        self.assertGreater(results[4], results[1] * 2.5)
+        self.assertGreater(results[16], results[1] * 4)
+
+    async def test_plan_throughput_scales_with_concurrency(self):
+        print("\n--- 测试 /plan 接口吞吐量随并发扩展 ---")
+        planner = TaskPlanner(StubAsyncLLM(json.dumps(PLAN_JSON, ensure_ascii=False)))
+        with patch('src.main.query_rewriter_chain', StubAsyncLLM("帮我提交一个请假申请。")), \
+                patch('src.main.planner', planner), \
+                patch('src.main.api_json_definitions', []):
+            await self._assert_scales("/plan", {"query": "我要请假"})
+        print("✅ /plan 接口并发扩展测试通过。")
+
+    async def test_generate_api_call_throughput_scales_with_concurrency(self):
+        print("\n--- 测试 /generate-api-call 接口吞吐量随并发扩展 ---")
+        vsm = BlockingVectorStoreManager(self.tmp_dir.name)
+        agent = ApiRagAgent(vector_store_manager=vsm, llm=RunnableLambda(_stub_param_fill))
+        agent.retriever.reranker.enabled = False
+        with patch('src.main.api_agent', agent):
+            await self._assert_scales("/generate-api-call", {"query": "我要请假，身体不适"})
+        print("✅ /generate-api-call 接口并发扩展测试通过。")
+
+
+if __name__ == '__main__':
+    print("开始执行并发负载测试...")
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cache.embedding_cache import CachedEmbeddings, EmbeddingCacheStore, MemmapEmbeddingStore
+from src.utils.hash_embeddings import HashEmbeddings
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """记录实际被嵌入的文本数量"""
+
+    def __init__(self):
+        super().__init__(dimensions=32, model_name="counting")
+        self.embedded_texts = 0
+
+    def embed_documents(self, texts):
+        self.embedded_texts += len(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.embedded_texts += 1
+        return super().embed_query(text)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_repeated_queries_embed_once(self):
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(inner, store=EmbeddingCacheStore(max_entries=10))
+
+        first = cached.embed_query("我要请假")
+        second = cached.embed_query("我要请假")
+
+        self.assertEqual(first, second)
+        self.assertEqual(inner.embedded_texts, 1)
+        stats = cached.stats()
+        self.assertEqual((stats["memory_hits"], stats["misses"]), (1, 1))
+
+    def test_embed_documents_only_embeds_misses(self):
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(
+            inner, store=EmbeddingCacheStore(max_entries=10), document_store=EmbeddingCacheStore(max_entries=10)
+        )
+
+        cached.embed_documents(["a", "b"])
+        vectors = cached.embed_documents(["b", "c", "a"])
+
+        self.assertEqual(inner.embedded_texts, 3)
+        self.assertEqual(vectors[0], inner.embed_documents(["b"])[0])
+
+    def test_documents_do_not_evict_queries(self):
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(
+            inner, store=EmbeddingCacheStore(max_entries=2), document_store=EmbeddingCacheStore(max_entries=2)
+        )
+        cached.embed_query("我要请假")
+        cached.embed_documents([f"文档{i}" for i in range(5)])
+        cached.embed_query("我要请假")
+
+        stats = cached.stats()
+        self.assertEqual((stats["memory_hits"], stats["misses"], stats["memory_entries"]), (1, 1, 1))
+        self.assertEqual((stats["documents"]["misses"], stats["documents"]["memory_entries"]), (5, 2))
+
+    def test_lru_eviction(self):
+        inner = CountingEmbeddings()
+        cached = CachedEmbeddings(inner, store=EmbeddingCacheStore(max_entries=2))
+        for text in ("a", "b", "a", "c", "a", "b"):
+            cached.embed_query(text)
+        # b在写入c时被淘汰，最后一次需要重新嵌入
+        self.assertEqual(inner.embedded_texts, 4)
+
+    def test_memmap_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "counting")
+            inner = CountingEmbeddings()
+            store = EmbeddingCacheStore(max_entries=10, persistent=MemmapEmbeddingStore(path, initial_capacity=1))
+            expected = [CachedEmbeddings(inner, store=store).embed_query(text) for text in ("a", "b", "c")]
+            store.persistent.flush()
+
+            reopened = EmbeddingCacheStore(max_entries=10, persistent=MemmapEmbeddingStore(path))
+            cached = CachedEmbeddings(inner, store=reopened)
+            vectors = [cached.embed_query(text) for text in ("a", "b", "c")]
+
+            self.assertEqual(inner.embedded_texts, 3)
+            np.testing.assert_allclose(vectors, expected)
+            self.assertEqual(reopened.stats()["disk_hits"], 3)
+
+    def test_key_is_not_persisted_before_its_vector(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "store")
+            store = MemmapEmbeddingStore(path, initial_capacity=4)
+            store.put("a", np.ones(8, dtype=np.float32))
+            # 模拟写入向量后、落盘前崩溃
+            with patch.object(np.memmap, "flush", side_effect=OSError("crash")):
+                with self.assertRaises(OSError):
+                    store.put("b", np.full(8, 2.0, dtype=np.float32))
+
+            reopened = MemmapEmbeddingStore(path)
+            self.assertIsNone(reopened.get("b"))
+            np.testing.assert_allclose(reopened.get("a"), np.ones(8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import copy
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.vectorization import vectorize_apis
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """记录实际被嵌入的文档数量"""
+
+    def __init__(self):
+        super().__init__()
+        self.embedded_documents = 0
+
+    def embed_documents(self, texts):
+        self.embedded_documents += len(texts)
+        return super().embed_documents(texts)
+
+
+class TestIncrementalVectorization(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            self.apis = json.load(f)
+        self.api_json = os.path.join(self.tmp_dir.name, "api.json")
+        self._write(self.apis)
+        self.embeddings = CountingEmbeddings()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, apis):
+        with open(self.api_json, "w", encoding="utf-8") as f:
+            json.dump(apis, f, ensure_ascii=False)
+
+    def _vectorize(self, **kwargs):
+        # 每次使用新的VectorStoreManager，模拟脚本的独立运行
+        vsm = VectorStoreManager(embeddings=self.embeddings, persist_directory=os.path.join(self.tmp_dir.name, "store"))
+        return vsm, vectorize_apis(vsm, api_json_path=self.api_json, **kwargs)
+
+    def _indexed_names(self, vsm):
+        return sorted(m["name"] for m in vsm.vector_store._collection.get(include=["metadatas"])["metadatas"])
+
+    def test_only_changed_apis_are_reembedded(self):
+        _, report = self._vectorize()
+        self.assertTrue(report["rebuild"])
+        self.assertEqual(len(report["added"]), len(self.apis))
+
+        apis = copy.deepcopy(self.apis)
+        apis[0]["description"] += "（已更新）"
+        removed = apis.pop()
+        apis.append({**copy.deepcopy(self.apis[1]), "name": "撤销请假申请", "method": "DELETE"})
+        self._write(apis)
+
+        dry_vsm, dry_report = self._vectorize(dry_run=True)
+        self.assertEqual(dry_report["changed"], ["GET /api/v1/employees/{staffId}/project"])
+        self.assertEqual(dry_report["removed"], [f"{removed['method']} {removed['endpoint']}"])
+        self.assertEqual(dry_report["added"], ["DELETE /api/v1/leaves"])
+        self.assertIsNone(dry_vsm.vector_store)
+
+        self.embeddings.embedded_documents = 0
+        vsm, report = self._vectorize()
+        self.assertFalse(report["rebuild"])
+        self.assertEqual(self.embeddings.embedded_documents, 2)
+        self.assertEqual(self._indexed_names(vsm), sorted(api["name"] for api in apis))
+
+    def test_unchanged_catalog_is_a_noop(self):
+        self._vectorize()
+        self.embeddings.embedded_documents = 0
+        vsm, report = self._vectorize()
+        self.assertEqual((report["added"], report["changed"], report["removed"]), ([], [], []))
+        self.assertEqual(self.embeddings.embedded_documents, 0)
+        self.assertEqual(len(self._indexed_names(vsm)), len(self.apis))
+
+
+if __name__ == '__main__':
+    unittest.main()
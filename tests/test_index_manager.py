@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.vectorization import vectorize_apis
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.index_manager import IndexManager, read_active_collection
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+NEW_API = {
+    "name": "撤销请假申请",
+    "description": "撤销一条尚未审批的请假申请。",
+    "method": "DELETE",
+    "endpoint": "/api/v1/leaves/{leaveId}",
+    "params": [{"name": "leaveId", "in": "path", "description": "请假单ID", "required": True, "type": "string"}],
+    "response": {"code": 0}
+}
+
+
+class CountingEmbeddings(HashEmbeddings):
+    """记录实际被嵌入的文档数量"""
+
+    def __init__(self):
+        super().__init__(model_name="index-manager-test")
+        self.embedded_documents = 0
+
+    def embed_documents(self, texts):
+        self.embedded_documents += len(texts)
+        return super().embed_documents(texts)
+
+
+class TestIndexManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.tmp_dir.name, "store")
+        self.api_json = os.path.join(self.tmp_dir.name, "api.json")
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            self.apis = json.load(f)
+        self._write(self.apis)
+
+        self.embeddings = CountingEmbeddings()
+        vectorize_apis(
+            VectorStoreManager(embeddings=self.embeddings, persist_directory=self.store_dir),
+            api_json_path=self.api_json
+        )
+        self.manager = IndexManager(self.embeddings, api_json_path=self.api_json, persist_directory=self.store_dir)
+        self.bound = []
+        self.manager.add_listener(self.bound.append)
+        self.manager.load_initial()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, apis):
+        with open(self.api_json, "w", encoding="utf-8") as f:
+            json.dump(apis, f, ensure_ascii=False)
+
+    def _collections(self):
+        client = self.manager.current.vector_store_manager.vector_store._client
+        return {c if isinstance(c, str) else c.name for c in client.list_collections()}
+
+    def test_swap_reuses_vectors_and_keeps_inflight_generation(self):
+        first = self.manager.acquire()
+        self._write(self.apis + [NEW_API])
+        self.embeddings.embedded_documents = 0
+
+        result = asyncio.run(self.manager.areload())
+
+        self.assertEqual(result["status"], "swapped")
+        # 只有新增的API需要嵌入
+        self.assertEqual(self.embeddings.embedded_documents, 1)
+        second = self.manager.current
+        self.assertIs(self.bound[-1], second)
+        self.assertEqual(len(second.api_definitions), len(self.apis) + 1)
+        top_doc, _ = second.vector_store_manager.similarity_search_with_score("撤销我的请假申请", k=1)[0]
+        self.assertEqual(top_doc.metadata["name"], "撤销请假申请")
+        self.assertEqual(read_active_collection(self.store_dir), second.collection_name)
+
+        # 旧代仍可被正在处理的请求使用
+        self.assertTrue(first.retired)
+        self.assertTrue(first.vector_store_manager.similarity_search_with_score("解锁用户", k=1))
+        self.manager.release(first)
+
+    def test_retired_generation_dropped_after_last_release(self):
+        asyncio.run(self.manager.areload(force=True))
+        second = self.manager.acquire()
+        asyncio.run(self.manager.areload(force=True))
+
+        self.assertIn(second.collection_name, self._collections())
+        self.assertEqual(self.manager.stats()["retiring"][-1]["in_flight"], 1)
+
+        self.manager.release(second)
+        deadline = time.time() + 5
+        while second.collection_name in self._collections() and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertNotIn(second.collection_name, self._collections())
+        # 基础集合由向量化脚本维护，不会被删除
+        self.assertIn("api_docs", self._collections())
+
+    def test_listener_can_use_manager_during_swap(self):
+        seen = []
+
+        def listener(generation):
+            # 在持锁状态下调用监听者会在这里死锁
+            pinned = self.manager.acquire()
+            seen.append((generation.generation_id, pinned.generation_id))
+            self.manager.release(pinned)
+
+        self.manager.add_listener(listener)
+        result = asyncio.run(self.manager.areload(force=True))
+
+        self.assertEqual(result["status"], "swapped")
+        new_id = self.manager.current.generation_id
+        # 监听者先于切换执行，此时当前代仍是旧代
+        self.assertEqual(seen, [(new_id, new_id - 1)])
+
+    def test_preparer_runs_off_loop_before_listeners(self):
+        prepared = []
+
+        def preparer(generation):
+            prepared.append(threading.current_thread() is threading.main_thread())
+            generation.services["agent"] = f"agent-{generation.generation_id}"
+
+        self.manager.add_preparer(preparer)
+        asyncio.run(self.manager.areload(force=True))
+
+        # 热切换时准备回调与建索引一起在线程池中执行，监听者拿到的新一代已准备好
+        self.assertEqual(prepared, [False])
+        self.assertEqual(self.bound[-1].services["agent"], f"agent-{self.manager.current.generation_id}")
+
+    def test_unchanged_catalog_does_not_rebuild(self):
+        result = asyncio.run(self.manager.areload())
+        self.assertEqual(result["status"], "unchanged")
+        self.assertEqual(result["generation"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import settings
+from src.utils.local_model_backends import detect_quantization_target, quantization_target
+
+
+class TestQuantizationTarget(unittest.TestCase):
+
+    def test_detect_by_architecture_and_flags(self):
+        self.assertEqual(detect_quantization_target("aarch64", set()), "arm64")
+        self.assertEqual(detect_quantization_target("x86_64", {"avx2", "avx512f", "avx512_vnni"}), "avx512_vnni")
+        self.assertEqual(detect_quantization_target("x86_64", {"avx2", "avx512f"}), "avx512")
+        self.assertEqual(detect_quantization_target("x86_64", {"sse4_2", "avx2"}), "avx2")
+        # 读不到指令集时退回avx2
+        self.assertEqual(detect_quantization_target("AMD64", set()), "avx2")
+
+    def test_setting_overrides_detection(self):
+        with patch.object(settings, "onnx_quantization_target", "avx2"):
+            self.assertEqual(quantization_target(), "avx2")
+
+
+if __name__ == '__main__':
+    unittest.main()
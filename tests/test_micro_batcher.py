@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cache.embedding_cache import CachedEmbeddings, EmbeddingCacheStore
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.micro_batcher import MicroBatcher
+
+
+class FakeModel:
+    """每次批量调用有固定开销的假模型"""
+
+    def __init__(self, overhead=0.02):
+        self.overhead = overhead
+        self.batch_sizes = []
+
+    def forward(self, items):
+        time.sleep(self.overhead)
+        self.batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+
+class BatchedEmbeddings(HashEmbeddings):
+    """aembed_query走微批次调度的嵌入模型"""
+
+    def __init__(self):
+        super().__init__(dimensions=16, model_name="batched-test")
+        self.batcher = MicroBatcher(self.embed_documents, max_batch_size=64, max_wait_ms=10)
+
+    async def aembed_query(self, text):
+        return await self.batcher.submit(text)
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_share_batches(self):
+        model = FakeModel()
+        batcher = MicroBatcher(model.forward, max_batch_size=16, max_wait_ms=10)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(40)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [i * 2 for i in range(40)])
+        self.assertLessEqual(max(model.batch_sizes), 16)
+        self.assertLessEqual(len(model.batch_sizes), 4)
+        print(f"\n40个并发请求的批大小: {model.batch_sizes}")
+
+    def test_single_request_latency_is_bounded(self):
+        model = FakeModel(overhead=0)
+        batcher = MicroBatcher(model.forward, max_batch_size=16, max_wait_ms=20)
+
+        async def run():
+            start = time.perf_counter()
+            result = await batcher.submit(21)
+            return result, time.perf_counter() - start
+
+        result, elapsed = asyncio.run(run())
+        self.assertEqual(result, 42)
+        self.assertLess(elapsed, 0.2)
+
+    def test_batch_failure_propagates_to_all_callers(self):
+        def broken(items):
+            raise ValueError("model crashed")
+
+        batcher = MicroBatcher(broken, max_batch_size=8, max_wait_ms=5)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_cached_embeddings_use_native_async(self):
+        inner = BatchedEmbeddings()
+        cached = CachedEmbeddings(inner, store=EmbeddingCacheStore(max_entries=100))
+
+        async def run():
+            return await asyncio.gather(*(cached.aembed_query(f"查询{i}") for i in range(10)))
+
+        vectors = asyncio.run(run())
+        self.assertEqual(vectors[3], inner.embed_query("查询3"))
+        self.assertEqual(inner.batcher.stats()["batches"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.rerank.reranker import HybridRetriever, RerankerManager
+from src.retrieval.rank_fusion import merge_top_k
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.rate_limiter import TokenBucket
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+CALL_DELAY = 0.1
+
+
+def _doc(name):
+    return Document(page_content=f"{name}的接口文档内容", metadata={"name": name})
+
+
+class SlowReranker(RerankerManager):
+    """每次调用耗时固定、记录并发度的重排序器"""
+
+    def __init__(self, **kwargs):
+        super().__init__(cache=None, **kwargs)
+        self.enabled = True
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def rerank_documents(self, query, documents, top_k=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(CALL_DELAY)
+        self.in_flight -= 1
+        return [(doc, 1.0 / (rank + 1)) for rank, doc in enumerate(documents[:top_k])]
+
+
+class SlowVectorStore:
+    def __init__(self, results):
+        self.results = results
+
+    def similarity_search_with_score(self, query, k=None):
+        time.sleep(CALL_DELAY)
+        return self.results[query][:k]
+
+
+class TestRateLimiterAndMerge(unittest.TestCase):
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=20, capacity=1)
+
+        async def acquire_all():
+            await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+
+        started = time.perf_counter()
+        asyncio.run(acquire_all())
+        # 第一个令牌立即可用，其余4个按20个/秒补充
+        self.assertGreaterEqual(time.perf_counter() - started, 0.18)
+
+        unlimited = TokenBucket(rate=0)
+        started = time.perf_counter()
+        for _ in range(100):
+            unlimited.acquire_blocking()
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    def test_merge_top_k_dedups_and_keeps_order(self):
+        a, b, c = _doc("a"), _doc("b"), _doc("c")
+        merged = merge_top_k([[(a, 0.5), (b, 0.9)], [(b, 0.1), (c, 0.5)]], k=2)
+        self.assertEqual([(doc.metadata["name"], score) for doc, score in merged], [("b", 0.9), ("a", 0.5)])
+
+    def test_rerank_with_scores_aligns_by_document_id(self):
+        recalled = [(_doc(f"api{i}"), i / 10) for i in range(5)]
+        reranker = SlowReranker()
+        # 重排序返回的是内容相同的新文档对象
+        reranker.rerank_documents = lambda query, documents, top_k=None: [
+            (Document(page_content=doc.page_content, metadata=dict(doc.metadata)), 1.0 - i / 10)
+            for i, doc in enumerate(reversed(documents))
+        ][:top_k]
+        results = reranker.rerank_with_scores("查询", recalled, top_k=3)
+        self.assertEqual(
+            [(doc.metadata["name"], vector_score) for doc, vector_score, _ in results],
+            [("api4", 0.4), ("api3", 0.3), ("api2", 0.2)]
+        )
+
+
+class TestConcurrentMultiQuery(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('src.rerank.reranker.settings.rerank_rate_limit_qps', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_abatch_rerank_runs_concurrently_in_order(self):
+        reranker = SlowReranker()
+        queries_docs = [(f"查询{i}", [_doc(f"api{i}"), _doc("共享")]) for i in range(8)]
+
+        started = time.perf_counter()
+        results = asyncio.run(reranker.abatch_rerank(queries_docs, top_k=1, concurrency=4))
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([result[0][0].metadata["name"] for result in results], [f"api{i}" for i in range(8)])
+        self.assertEqual(reranker.max_in_flight, 4)
+        self.assertLess(elapsed, CALL_DELAY * 8 / 2)
+
+    def test_sync_wrapper_works_inside_event_loop(self):
+        reranker = SlowReranker()
+        queries_docs = [("查询", [_doc("api")])]
+
+        async def call_sync():
+            return reranker.batch_rerank(queries_docs, top_k=1)
+
+        self.assertEqual(reranker.batch_rerank(queries_docs, top_k=1)[0][0][0].metadata["name"], "api")
+        self.assertEqual(asyncio.run(call_sync())[0][0][0].metadata["name"], "api")
+
+    def test_multi_query_retrieve_fans_out(self):
+        a, b, c = _doc("a"), _doc("b"), _doc("c")
+        store = SlowVectorStore({
+            "q1": [(a, 0.9), (b, 0.5)],
+            "q2": [(b, 0.8), (c, 0.7)],
+            "q3": [(c, 0.2)],
+        })
+        retriever = HybridRetriever(store, reranker=SlowReranker())
+
+        started = time.perf_counter()
+        with patch('src.rerank.reranker.settings.enable_reranking', False):
+            results = retriever.multi_query_retrieve(["q1", "q2", "q3"], final_k=2)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual([(doc.metadata["name"], score) for doc, _, score in results], [("a", 0.9), ("c", 0.7)])
+        self.assertLess(elapsed, CALL_DELAY * 3)
+
+    def test_vector_store_multi_query_search(self):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            api_definitions = json.load(f)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=tmp_dir)
+            vsm.create_vector_store(build_api_documents(api_definitions), collection_name="api_docs")
+            with patch('src.vectorize.vectorizer.settings.enable_reranking', False):
+                results = vsm.multi_query_search(["提交请假申请", "请假", "解锁用户"], k_per_query=3, final_k=4)
+
+        names = [doc.metadata["name"] for doc, _, _ in results]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertLessEqual(len(names), 4)
+        scores = [score for _, _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
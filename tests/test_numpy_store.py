@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import settings
+from scripts.synthetic_catalog import generate_catalog
+from scripts.vectorization import build_api_documents
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.numpy_store import NumpyVectorStore
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+QUERIES = ["帮我解锁用户", "获取项目详情", "提交请假申请", "查询员工考勤统计"]
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            catalog = generate_catalog(200, base=json.load(f))
+        with patch.object(settings, "vector_store_backend", "numpy"):
+            cls.vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=cls.tmp_dir.name)
+            cls.vsm.create_vector_store(build_api_documents(catalog), collection_name="api_docs")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_matches_chroma_results(self):
+        self.assertIsInstance(self.vsm.index, NumpyVectorStore)
+        for query in QUERIES:
+            expected = self.vsm.vector_store.similarity_search_with_score(query, k=5)
+            actual = self.vsm.similarity_search_with_score(query, k=5)
+            self.assertEqual([d.metadata["name"] for d, _ in actual], [d.metadata["name"] for d, _ in expected])
+            np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], atol=1e-4)
+
+    def test_batch_matches_single_queries(self):
+        batch = self.vsm.batch_similarity_search_with_score(QUERIES, k=3)
+        for query, results in zip(QUERIES, batch):
+            single = self.vsm.similarity_search_with_score(query, k=3)
+            self.assertEqual([d.page_content for d, _ in results], [d.page_content for d, _ in single])
+
+    def test_k_larger_than_catalog(self):
+        store = NumpyVectorStore(np.eye(3), ["a", "b", "c"], [{"name": n} for n in "abc"])
+        results = store.similarity_search_by_vector_with_score([0.0, 1.0, 0.0], k=10)
+        self.assertEqual([d.metadata["name"] for d, _ in results][0], "b")
+        self.assertEqual(len(results), 3)
+        self.assertAlmostEqual(results[0][1], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
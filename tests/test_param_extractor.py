@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agent.api_rag_agent import ApiRagAgent
+from src.agent.param_extractor import ParamExtractor
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+    API_DOCS = {doc.metadata["name"]: doc for doc in build_api_documents(json.load(f))}
+
+
+def _params(name):
+    return json.loads(API_DOCS[name].metadata["params_json"])
+
+
+class TestParamExtractor(unittest.TestCase):
+
+    def test_enum_and_dates(self):
+        extracted, pending = ParamExtractor(_params("提交请假申请")).extract(
+            "帮我提交一个sick请假，从2024年5月1日到2024-05-03"
+        )
+        self.assertEqual(extracted, {"type": "SICK", "fromDate": "2024-05-01", "toDate": "2024-05-03"})
+        self.assertEqual([p["name"] for p in pending], ["userId", "userName", "reason"])
+
+    def test_ambiguous_values_are_left_to_llm(self):
+        extracted, _ = ParamExtractor(_params("提交请假申请")).extract("ANNUAL还是SICK？2024-05-01开始")
+        self.assertEqual(extracted, {})
+
+    def test_email_id_and_number_with_unit(self):
+        self.assertEqual(ParamExtractor(_params("解锁用户")).extract("帮我解锁用户 a@b.com"), ({"email": "a@b.com"}, []))
+        self.assertEqual(
+            ParamExtractor(_params("获取员工项目信息")).extract("员工s_123在哪个项目"), ({"staffId": "s_123"}, [])
+        )
+        extracted, _ = ParamExtractor(_params("提交加班申请")).extract("2024-06-01加班3.5个小时，申请调休TIMEOFF")
+        self.assertEqual(extracted, {"overtimeDate": "2024-06-01", "hours": 3.5, "compensationWay": "TIMEOFF"})
+
+    def test_multiple_ids_are_matched_by_prefix(self):
+        extractor = ParamExtractor([
+            {"name": "userId", "required": True}, {"name": "projectId", "required": True}
+        ])
+        self.assertEqual(extractor.extract("把u_7加到p_abc"), ({"userId": "u_7", "projectId": "p_abc"}, []))
+
+    def test_unresolved_optional_params_stay_pending(self):
+        extractor = ParamExtractor([
+            {"name": "email", "type": "string", "required": True, "description": "用户邮箱"},
+            {"name": "remark", "type": "string", "required": False, "description": "备注"}
+        ])
+        extracted, pending = extractor.extract("帮我解锁用户 a@b.com，备注忘记密码")
+        self.assertEqual(extracted, {"email": "a@b.com"})
+        self.assertEqual([p["name"] for p in pending], ["remark"])
+
+
+class TestAgentFastPath(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.llm_inputs = []
+
+        def stub_llm(prompt_value):
+            self.llm_inputs.append(prompt_value.to_string())
+            return '{"userId": "u_1", "userName": "张三", "reason": "__MISSING__"}'
+
+        vsm = VectorStoreManager(embeddings=None, persist_directory=self.tmp_dir.name)
+        self.agent = ApiRagAgent(vector_store_manager=vsm, llm=RunnableLambda(stub_llm))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_llm_skipped_when_required_params_resolved(self):
+        result = self.agent._fill_parameters(API_DOCS["解锁用户"], "帮我解锁用户 a@b.com")
+        self.assertEqual(result["body"], {"email": "a@b.com"})
+        self.assertEqual(result["param_sources"], {"email": "rule"})
+        self.assertEqual(self.llm_inputs, [])
+
+    def test_unresolved_optional_params_reported_missing_without_llm(self):
+        api_doc = Document(page_content="解锁用户", metadata={
+            "name": "解锁用户（带备注）", "method": "POST", "endpoint": "/api/v1/users/unlock", "params_json": json.dumps([
+                {"name": "email", "type": "string", "required": True, "description": "用户邮箱"},
+                {"name": "remark", "type": "string", "required": False, "description": "备注"}
+            ], ensure_ascii=False)
+        })
+        result = self.agent._fill_parameters(api_doc, "帮我解锁用户 a@b.com，备注忘记密码")
+        self.assertEqual(self.llm_inputs, [])
+        self.assertEqual(result["body"], {"email": "a@b.com"})
+        self.assertEqual(result["param_sources"], {"email": "rule", "remark": "missing"})
+        self.assertEqual([p["name"] for p in result["missing"]], ["remark"])
+
+    def test_optional_only_api_still_calls_llm(self):
+        api_doc = Document(page_content="查询请假记录", metadata={
+            "name": "查询请假记录", "method": "GET", "endpoint": "/api/v1/leaves", "params_json": json.dumps([
+                {"name": "userName", "type": "string", "required": False, "description": "用户姓名"},
+                {"name": "reason", "type": "string", "required": False, "description": "请假事由"}
+            ], ensure_ascii=False)
+        })
+        result = self.agent._fill_parameters(api_doc, "查一下张三的请假记录")
+        self.assertEqual(len(self.llm_inputs), 1)
+        self.assertEqual(result["param_sources"]["userName"], "llm")
+
+    def test_llm_only_receives_unresolved_params(self):
+        result = self.agent._fill_parameters(API_DOCS["提交请假申请"], "请PERSONAL假 2024-05-01 至 2024-05-02")
+        self.assertEqual(len(self.llm_inputs), 1)
+        self.assertNotIn("fromDate", self.llm_inputs[0])
+        self.assertIn("userName", self.llm_inputs[0])
+        self.assertEqual(result["param_sources"], {
+            "userId": "llm", "userName": "llm", "reason": "missing",
+            "type": "rule", "fromDate": "rule", "toDate": "rule"
+        })
+        self.assertEqual(result["body"]["type"], "PERSONAL")
+        self.assertEqual([p["name"] for p in result["missing"]], ["reason"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from fastapi.testclient import TestClient
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.cache.backends import InMemoryCacheBackend, SQLiteCacheBackend
+from src.cache.plan_cache import PlanCache
+
+CATALOG = [{"name": "提交请假申请", "description": "员工提交请假申请"}]
+PLAN = {"type": "sequential", "tasks": [{"api_name": "提交请假申请", "description": "提交请假申请。"}]}
+
+
+class TestPlanCache(unittest.TestCase):
+
+    def test_exact_hit_uses_normalized_query(self):
+        cache = PlanCache(InMemoryCacheBackend())
+        catalog_hash = PlanCache.catalog_hash(CATALOG)
+        cache.store("帮我申请请假和加班", "改写后的查询", PLAN, catalog_hash)
+
+        hit = cache.lookup_exact("  帮我申请请假和加班。 ", catalog_hash)
+        self.assertEqual(hit["plan"], PLAN)
+        self.assertEqual(cache.stats()["exact_hits"], 1)
+
+    def test_catalog_change_invalidates(self):
+        cache = PlanCache(InMemoryCacheBackend())
+        cache.store("我要请假", "帮我提交一个请假申请。", PLAN, PlanCache.catalog_hash(CATALOG), [1.0, 0.0])
+
+        new_hash = PlanCache.catalog_hash(CATALOG + [{"name": "提交加班申请"}])
+        self.assertIsNone(cache.lookup_exact("我要请假", new_hash))
+        self.assertIsNone(cache.lookup_semantic("帮我提交一个请假申请。", [1.0, 0.0], new_hash))
+
+    def test_semantic_hit_above_threshold(self):
+        cache = PlanCache(InMemoryCacheBackend(), similarity_threshold=0.9)
+        catalog_hash = PlanCache.catalog_hash(CATALOG)
+        cache.store("我要请假", "帮我提交一个请假申请。", PLAN, catalog_hash, [1.0, 0.0])
+
+        hit = cache.lookup_semantic("请帮我提交请假申请。", [0.99, 0.05], catalog_hash)
+        self.assertEqual(hit["plan"], PLAN)
+        self.assertIsNone(cache.lookup_semantic("解锁用户", [0.0, 1.0], catalog_hash))
+
+        stats = cache.stats()
+        self.assertEqual((stats["semantic_hits"], stats["misses"]), (1, 1))
+
+    def test_semantic_index_follows_store_and_eviction(self):
+        """语义匹配只在冷启动时读取后端全部条目，写入和淘汰增量更新内存索引"""
+        backend = InMemoryCacheBackend(max_entries=3)
+        catalog_hash = PlanCache.catalog_hash(CATALOG)
+        PlanCache(backend).store("我要请假", "帮我提交一个请假申请。", PLAN, catalog_hash, [1.0, 0.0])
+
+        cache = PlanCache(backend, similarity_threshold=0.9)
+        with patch.object(backend, 'items', wraps=backend.items) as items:
+            self.assertIsNotNone(cache.lookup_semantic("请假", [1.0, 0.0], catalog_hash))
+            self.assertIsNone(cache.lookup_semantic("解锁用户", [0.0, 1.0], catalog_hash))
+            cache.store("解锁", "解锁用户。", PLAN, catalog_hash, [0.0, 1.0])
+            self.assertIsNotNone(cache.lookup_semantic("解锁用户", [0.0, 1.0], catalog_hash))
+        self.assertEqual(items.call_count, 1)
+
+        # 写入两条精确匹配条目，LRU淘汰最早的语义条目，内存索引同步删除
+        cache.store("a", "a", PLAN, catalog_hash)
+        self.assertEqual(cache.stats()["semantic_index_entries"], 1)
+        self.assertIsNone(cache.lookup_semantic("请假", [1.0, 0.0], catalog_hash))
+
+    def test_async_lookups_match_sync(self):
+        cache = PlanCache(InMemoryCacheBackend(), similarity_threshold=0.9)
+        catalog_hash = PlanCache.catalog_hash(CATALOG)
+
+        async def scenario():
+            await cache.astore("我要请假", "帮我提交一个请假申请。", PLAN, catalog_hash, [1.0, 0.0])
+            return (
+                await cache.alookup_exact("我要请假", catalog_hash),
+                await cache.alookup_semantic("请帮我提交请假申请。", [0.99, 0.05], catalog_hash)
+            )
+
+        exact, semantic = asyncio.run(scenario())
+        self.assertEqual(exact["plan"], PLAN)
+        self.assertEqual(semantic["plan"], PLAN)
+
+    def test_ttl_and_lru_eviction(self):
+        backend = InMemoryCacheBackend(max_entries=2, ttl_seconds=0.05)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)  # 淘汰最久未使用的b
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("a"), 1)
+        self.assertEqual(backend.evictions, 1)
+
+        time.sleep(0.06)
+        self.assertIsNone(backend.get("a"))
+
+    def test_sqlite_backend_persists_and_evicts(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "plan_cache.sqlite3")
+            backend = SQLiteCacheBackend(path, max_entries=2)
+            backend.set("exact:x:1", {"plan": PLAN})
+            backend.set("exact:x:2", {"plan": PLAN})
+            backend.get("exact:x:1")
+            backend.set("semantic:x:3", {"plan": PLAN})
+            backend.close()
+
+            reopened = SQLiteCacheBackend(path, max_entries=2)
+            self.assertIsNone(reopened.get("exact:x:2"))
+            self.assertEqual(reopened.get("exact:x:1"), {"plan": PLAN})
+            self.assertEqual([key for key, _ in reopened.items("semantic:")], ["semantic:x:3"])
+            reopened.close()
+
+
+class TestPlanEndpointCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_repeated_plan_skips_llm_calls(self):
+        """重复的/plan请求应直接命中缓存，不再调用改写和规划"""
+        rewriter = MagicMock()
+        rewriter.ainvoke = AsyncMock(return_value="帮我提交一个请假申请。")
+        planner = MagicMock()
+        planner.aplan = AsyncMock(return_value=PLAN)
+        agent = MagicMock()
+        agent.embeddings.embed_query.return_value = [1.0, 0.0]
+
+        with patch('src.main.query_rewriter_chain', rewriter), \
+                patch('src.main.planner', planner), \
+                patch('src.main.api_agent', agent), \
+                patch('src.main.api_json_definitions', CATALOG), \
+                patch('src.main.api_catalog_hash', PlanCache.catalog_hash(CATALOG)), \
+                patch('src.main.plan_cache', PlanCache(InMemoryCacheBackend())):
+            for _ in range(3):
+                response = self.client.post("/plan", json={"query": "我要请假"})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), PLAN)
+
+            stats = self.client.get("/plan/cache/stats").json()
+
+        self.assertEqual(rewriter.ainvoke.await_count, 1)
+        self.assertEqual(planner.aplan.await_count, 1)
+        self.assertEqual(stats["exact_hits"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
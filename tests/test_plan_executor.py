@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.execution.plan_executor import PlanExecutor
+from src.utils.client_registry import client_registry
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+SLOW_DELAY = 0.3
+
+LEAVE_AND_OVERTIME_PLAN = {
+    "type": "sequential",
+    "tasks": [
+        {"api_name": "获取员工项目信息"},
+        {
+            "type": "parallel",
+            "tasks": [
+                {"api_name": "提交请假申请"},
+                {"api_name": "提交加班申请"}
+            ]
+        }
+    ]
+}
+
+KNOWN_DATA = {
+    "staffId": "s_123", "userName": "张三", "type": "SICK", "fromDate": "2024-05-01", "toDate": "2024-05-02",
+    "reason": "身体不适", "overtimeDate": "2024-05-03", "hours": 2, "compensationWay": "PAY"
+}
+
+
+class StubApiServer:
+    """模拟业务API的本地HTTP服务，记录请求和并发度"""
+
+    def __init__(self, delay=SLOW_DELAY):
+        self.delay = delay
+        self.requests = []
+        self.failures = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.handle(self, None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                stub.handle(self, json.loads(self.rfile.read(length)) if length else None)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handle(self, handler, body):
+        path = handler.path
+        with self.lock:
+            self.requests.append((handler.command, path, body))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            remaining_failures = self.failures.get(path, 0)
+            if remaining_failures:
+                self.failures[path] = remaining_failures - 1
+        try:
+            if remaining_failures:
+                status, payload = 503, {"error": "unavailable"}
+            elif path.startswith("/api/v1/employees/"):
+                status, payload = 200, {"staffId": path.split("/")[4], "projectId": "p_abc"}
+            elif path == "/api/v1/leaves":
+                time.sleep(self.delay)
+                status, payload = 200, {"success": True, "leaveId": "leave_987", "userId": body["userId"]}
+            elif path == "/api/v1/overtimes":
+                time.sleep(self.delay)
+                status, payload = 200, {"success": True, "overtimeId": "ot_654"}
+            elif path == "/api/v1/users/unlock":
+                status, payload = 500, {"error": "internal"}
+            elif path.startswith("/api/v1/projects/"):
+                status, payload = 200, {"projectId": path.split("/")[4], "projectName": "天元项目"}
+            else:
+                status, payload = 404, {"error": "not found"}
+            data = json.dumps(payload).encode("utf-8")
+            handler.send_response(status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestPlanExecutor(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            cls.api_definitions = json.load(f)
+
+    def tearDown(self):
+        client_registry.clear()
+
+    def _executor(self, stub, **kwargs):
+        kwargs.setdefault("retry_backoff", 0.01)
+        return PlanExecutor(self.api_definitions, base_url=stub.base_url, **kwargs)
+
+    def test_parallel_group_runs_concurrently_and_propagates_outputs(self):
+        with StubApiServer() as stub:
+            started = time.perf_counter()
+            result = asyncio.run(self._executor(stub).execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA))
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual([step["status"] for step in result["steps"]], ["success"] * 3)
+        self.assertEqual(stub.max_in_flight, 2)
+        self.assertLess(elapsed, SLOW_DELAY * 2)
+        # userId取自获取员工项目信息返回的staffId
+        leave_body = next(body for method, path, body in stub.requests if path == "/api/v1/leaves")
+        self.assertEqual(leave_body["userId"], "s_123")
+        self.assertEqual(result["outputs"][1]["leaveId"], "leave_987")
+        self.assertEqual(result["context"]["overtimeId"], "ot_654")
+
+    def test_per_host_limit(self):
+        with StubApiServer() as stub:
+            result = asyncio.run(
+                self._executor(stub, max_connections_per_host=1).execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA)
+            )
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(stub.max_in_flight, 1)
+
+    def test_per_host_limit_is_shared_across_executions(self):
+        async def execute_concurrently(stub):
+            executors = [self._executor(stub, max_connections_per_host=1) for _ in range(2)]
+            self.assertIs(executors[0].pool, executors[1].pool)
+            return await asyncio.gather(*(
+                executor.execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA) for executor in executors
+            ))
+
+        with StubApiServer(delay=0.1) as stub:
+            results = asyncio.run(execute_concurrently(stub))
+        self.assertEqual([result["status"] for result in results], ["success", "success"])
+        self.assertEqual(stub.max_in_flight, 1)
+
+    def test_loop_change_closes_previous_client(self):
+        with StubApiServer() as stub:
+            executor = self._executor(stub)
+            asyncio.run(executor.execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA))
+            first_client = executor.pool._client
+            result = asyncio.run(executor.execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA))
+
+        self.assertEqual(result["status"], "success")
+        self.assertIsNot(executor.pool._client, first_client)
+        self.assertTrue(first_client.is_closed)
+
+    def test_repeated_api_keeps_each_output(self):
+        plan = {"type": "sequential", "tasks": [
+            {"api_name": "获取项目详情", "params": {"projectId": "p_1"}},
+            {"api_name": "获取项目详情", "params": {"projectId": "p_2"}}
+        ]}
+        with StubApiServer() as stub:
+            result = asyncio.run(self._executor(stub).execute(plan))
+        self.assertEqual([step["step_id"] for step in result["steps"]], [0, 1])
+        self.assertEqual(result["outputs"][0]["projectId"], "p_1")
+        self.assertEqual(result["outputs"][1]["projectId"], "p_2")
+
+    def test_idempotent_request_is_retried(self):
+        plan = {"type": "sequential", "tasks": [{"api_name": "获取项目详情", "params": {"projectId": "p_1"}}]}
+        with StubApiServer() as stub:
+            stub.failures["/api/v1/projects/p_1"] = 2
+            result = asyncio.run(self._executor(stub, max_retries=2).execute(plan))
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["steps"][0]["attempts"], 3)
+        self.assertEqual(result["context"]["projectName"], "天元项目")
+
+    def test_failure_cancels_parallel_siblings(self):
+        plan = {
+            "type": "parallel",
+            "tasks": [{"api_name": "提交请假申请"}, {"api_name": "解锁用户", "params": {"email": "a@b.com"}}]
+        }
+        with StubApiServer() as stub:
+            result = asyncio.run(self._executor(stub).execute(plan, {**KNOWN_DATA, "userId": "s_1"}))
+
+        self.assertEqual(result["status"], "failed")
+        steps = {step["api_name"]: step for step in result["steps"]}
+        # POST请求的5xx不重试
+        self.assertEqual((steps["解锁用户"]["status"], steps["解锁用户"]["attempts"]), ("failed", 1))
+        self.assertEqual(steps["解锁用户"]["status_code"], 500)
+        self.assertEqual(steps["提交请假申请"]["status"], "cancelled")
+
+    def test_plan_timeout_cancels_running_steps(self):
+        with StubApiServer(delay=2.0) as stub:
+            result = asyncio.run(self._executor(stub, timeout=1.0).execute(LEAVE_AND_OVERTIME_PLAN, KNOWN_DATA))
+        self.assertEqual(result["status"], "timeout")
+        self.assertEqual([step["status"] for step in result["steps"]], ["success", "cancelled", "cancelled"])
+
+    def test_missing_required_param_fails_without_request(self):
+        plan = {"api_name": "获取员工项目信息"}
+        with StubApiServer() as stub:
+            result = asyncio.run(self._executor(stub).execute(plan))
+        self.assertEqual(result["status"], "failed")
+        self.assertIn("staffId", result["steps"][0]["error"])
+        self.assertEqual(stub.requests, [])
+
+    def test_execute_endpoint(self):
+        client = TestClient(app)
+        with StubApiServer() as stub, patch('src.main.plan_executor', PlanExecutor(self.api_definitions, base_url=stub.base_url)):
+            response = client.post("/plan/execute", json={"plan": LEAVE_AND_OVERTIME_PLAN, "known_data": KNOWN_DATA})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["status"], "success")
+
+            # 调用方不能把请求转发到任意地址
+            response = client.post("/plan/execute", json={
+                "plan": LEAVE_AND_OVERTIME_PLAN, "known_data": KNOWN_DATA, "base_url": "http://169.254.169.254"
+            })
+            self.assertEqual(response.json()["steps"][0]["request"]["url"], f"{stub.base_url}/api/v1/employees/s_123/project")
+
+            response = client.post("/plan/execute", json={"plan": {}})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
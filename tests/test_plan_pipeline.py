@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.planning.candidate_selector import CandidateSelector
+from src.planning.task_planner import TaskPlanner
+from src.utils.hash_embeddings import HashEmbeddings
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+from scripts.synthetic_catalog import generate_catalog
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+PLAN_JSON = json.dumps({"type": "sequential", "tasks": [{"api_name": "提交请假申请", "description": "提交请假。"}]})
+STAGE_DELAY = 0.2
+
+
+class SlowHashEmbeddings(HashEmbeddings):
+    """模拟远程嵌入服务延迟的HashEmbeddings"""
+
+    def embed_query(self, text):
+        time.sleep(STAGE_DELAY)
+        return super().embed_query(text)
+
+
+class RecordingLLM:
+    """记录Prompt并返回固定规划的大模型"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt, config=None):
+        self.prompts.append(prompt)
+        return f"```json\n{PLAN_JSON}\n```"
+
+
+async def _slow_rewrite(_input):
+    await asyncio.sleep(STAGE_DELAY)
+    return "帮我提交一个请假申请。"
+
+
+def _server_timing(header):
+    stages = {}
+    for item in header.split(", "):
+        name, dur = item.split(";dur=")
+        stages[name] = float(dur)
+    return stages
+
+
+class TestPlanPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            cls.catalog = generate_catalog(60, base=json.load(f))
+        cls.vsm = VectorStoreManager(embeddings=SlowHashEmbeddings(), persist_directory=cls.tmp_dir.name)
+        cls.vsm.create_vector_store(build_api_documents(cls.catalog), collection_name="api_docs")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.selector = CandidateSelector(self.vsm, top_n=10, max_distance=4.0)
+
+    def test_needs_refinement(self):
+        recalled = self.vsm.similarity_search_with_score("提交请假申请", k=10)
+        self.assertFalse(self.selector.needs_refinement(recalled, "提交请假申请"))
+        self.assertTrue(self.selector.needs_refinement([], "提交请假申请"))
+
+        strict = CandidateSelector(self.vsm, top_n=10, max_distance=0.0)
+        self.assertTrue(strict.needs_refinement(recalled, "提交请假申请"))
+
+        self.assertFalse(asyncio.run(self.selector.aneeds_refinement(recalled, "提交请假申请")))
+        self.assertTrue(asyncio.run(strict.aneeds_refinement(recalled, "提交请假申请")))
+
+    def test_recall_overlaps_rewrite(self):
+        llm = RecordingLLM()
+        planner = TaskPlanner(llm, candidate_selector=self.selector)
+        with patch('src.main.query_rewriter_chain', RunnableLambda(_slow_rewrite)), \
+                patch('src.main.planner', planner), patch('src.main.plan_cache', None), \
+                patch('src.main.api_json_definitions', self.catalog):
+            response = self.client.post("/plan", json={"query": "我要请假"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["tasks"][0]["api_name"], "提交请假申请")
+        stages = _server_timing(response.headers["Server-Timing"])
+        for name in ("rewrite", "recall", "planner", "total"):
+            self.assertIn(name, stages)
+        # 召回与改写并行：总耗时小于各阶段耗时之和
+        parts = sum(ms for name, ms in stages.items() if name != "total")
+        self.assertLess(stages["total"], parts)
+        # 规划Prompt只包含候选API，而不是完整目录
+        self.assertEqual(len(llm.prompts), 1)
+        self.assertLess(sum(api["name"] in llm.prompts[0] for api in self.catalog), len(self.catalog))
+
+    def test_pipelining_disabled_runs_sequentially(self):
+        planner = TaskPlanner(RecordingLLM(), candidate_selector=self.selector)
+        with patch('src.main.query_rewriter_chain', RunnableLambda(_slow_rewrite)), \
+                patch('src.main.planner', planner), patch('src.main.plan_cache', None), \
+                patch('src.main.api_json_definitions', self.catalog), \
+                patch('src.main.settings.enable_plan_pipelining', False):
+            response = self.client.post("/plan", json={"query": "我要请假"})
+
+        self.assertEqual(response.status_code, 200)
+        stages = _server_timing(response.headers["Server-Timing"])
+        self.assertNotIn("recall", stages)
+        self.assertIn("rewrite", stages)
+
+
+if __name__ == '__main__':
+    unittest.main()
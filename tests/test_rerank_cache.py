@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.cache.rerank_cache import RerankCache
+from src.rerank.reranker import RerankerManager
+from src.vectorize.index_version import bump_index_version, read_index_version
+
+
+def _documents(*names):
+    return [Document(page_content=f"### API名称: {name}，用于测试重排序缓存", metadata={"name": name}) for name in names]
+
+
+def _fake_rerank(model, query, documents, top_n, **kwargs):
+    """按文档顺序倒序打分"""
+    results = [SimpleNamespace(index=i, relevance_score=1.0 - i * 0.1) for i in reversed(range(len(documents)))]
+    return SimpleNamespace(status_code=200, output=SimpleNamespace(results=results[:top_n]))
+
+
+class TestRerankCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = RerankCache(max_entries=2, version_provider=lambda: read_index_version(self.tmp_dir.name))
+        self.reranker = RerankerManager(model_name="test-rerank", cache=self.cache)
+        self.reranker.enabled = True
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_repeated_query_and_candidates_call_api_once(self):
+        with patch('src.rerank.reranker.TextReRank.call', side_effect=_fake_rerank) as call:
+            first = self.reranker.rerank_documents("解锁用户", _documents("A", "B", "C"), top_k=2)
+            # 归一化后相同的查询、新的Document对象，仍然命中缓存
+            second = self.reranker.rerank_documents(" 解锁用户。", _documents("A", "B", "C"), top_k=2)
+
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual([(d.metadata["name"], s) for d, s in first], [(d.metadata["name"], s) for d, s in second])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_candidate_order_and_top_k_are_part_of_key(self):
+        with patch('src.rerank.reranker.TextReRank.call', side_effect=_fake_rerank) as call:
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"), top_k=2)
+            self.reranker.rerank_documents("解锁用户", _documents("B", "A"), top_k=2)
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"), top_k=1)
+        self.assertEqual(call.call_count, 3)
+
+    def test_failed_calls_are_not_cached(self):
+        failure = SimpleNamespace(status_code=500, message="throttled")
+        with patch('src.rerank.reranker.TextReRank.call', return_value=failure) as call:
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"))
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"))
+        self.assertEqual(call.call_count, 2)
+
+    def test_index_rebuild_invalidates_cache(self):
+        with patch('src.rerank.reranker.TextReRank.call', side_effect=_fake_rerank) as call:
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"))
+            bump_index_version(self.tmp_dir.name)
+            self.reranker.rerank_documents("解锁用户", _documents("A", "B"))
+        self.assertEqual(call.call_count, 2)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from langchain_core.documents import Document
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config.settings import settings
+from src.retrieval.api_retriever import ApiRetriever
+from src.retrieval.rerank_gate import RerankGate, exact_name_match, fit_margin_threshold, vector_margin
+
+
+def _doc(name):
+    return Document(page_content=f"# {name}", metadata={"api_id": name, "name": name})
+
+
+class TestRerankGate(unittest.TestCase):
+
+    def test_fit_margin_threshold(self):
+        samples = [(0.5, True), (0.4, True), (0.3, False), (0.2, True), (0.1, False)]
+        self.assertEqual(fit_margin_threshold(samples, 1.0), 0.4)
+        self.assertEqual(fit_margin_threshold(samples, 0.75), 0.2)
+        self.assertIsNone(fit_margin_threshold([(0.5, False)], 0.9))
+
+    def test_exact_name_match_prefers_longest_unique_name(self):
+        docs = [_doc("用户信息"), _doc("获取用户信息"), _doc("解锁用户")]
+        self.assertEqual(exact_name_match("请帮我获取用户信息", docs).metadata["name"], "获取用户信息")
+        self.assertIsNone(exact_name_match("查询考勤", docs))
+        self.assertIsNone(exact_name_match("解锁用户和获取用户", [_doc("解锁用户"), _doc("获取用户")]))
+
+    def test_check_skips_and_counts(self):
+        gate = RerankGate(margin_threshold=0.3, enabled=True)
+        a, b, c = _doc("提交请假申请"), _doc("查询考勤"), _doc("解锁用户")
+        recalled = [(a, 0.2), (b, 0.7), (c, 0.9)]
+        candidates = [(b, 0.03), (a, 0.02), (c, 0.01)]
+
+        self.assertAlmostEqual(vector_margin(recalled), 0.5)
+        by_margin = gate.check("我要请个假", recalled, candidates, final_k=2)
+        self.assertEqual([doc.metadata["name"] for doc, _ in by_margin], ["提交请假申请", "查询考勤"])
+        self.assertEqual([doc.metadata["score_source"] for doc, _ in by_margin], ["rrf", "rrf"])
+        # 原文档不被修改
+        self.assertNotIn("score_source", a.metadata)
+        by_name = gate.check("帮我解锁用户", [(a, 0.2), (b, 0.3)], candidates, final_k=1)
+        self.assertEqual(by_name[0][0].metadata["name"], "解锁用户")
+        self.assertIsNone(gate.check("随便看看", [(a, 0.2), (b, 0.3)], candidates, final_k=1))
+
+        stats = gate.stats()
+        self.assertEqual((stats["queries"], stats["skipped_margin"], stats["skipped_exact_name"]), (3, 1, 1))
+        self.assertAlmostEqual(stats["skip_rate"], 2 / 3)
+
+    def test_retriever_skips_reranker(self):
+        a, b = _doc("提交请假申请"), _doc("查询考勤")
+        vsm = MagicMock()
+        vsm.similarity_search_with_score.return_value = [(a, 0.1), (b, 0.9)]
+        reranker = MagicMock(enabled=True)
+        retriever = ApiRetriever(vsm, reranker=reranker, gate=RerankGate(margin_threshold=0.5, enabled=True))
+
+        with patch.object(settings, "enable_hybrid_retrieval", False), patch.object(settings, "enable_reranking", True):
+            results = retriever.search("我要请个假", final_k=1)
+            self.assertEqual(results[0][0].metadata["name"], "提交请假申请")
+            # 跳过精排时分数是召回阶段的1 - 向量距离，与Reranker分数不在同一尺度上
+            self.assertEqual((results[0][1], results[0][0].metadata["score_source"]), (0.9, "vector"))
+            reranker.rerank_documents.assert_not_called()
+
+            vsm.similarity_search_with_score.return_value = [(a, 0.1), (b, 0.2)]
+            reranker.rerank_documents.return_value = [(b, 0.9)]
+            (doc, score), = retriever.search("我要请个假", final_k=1)
+            self.assertEqual((doc.metadata["name"], score, doc.metadata["score_source"]), ("查询考勤", 0.9, "rerank"))
+            reranker.rerank_documents.assert_called_once()
+
+    def test_async_and_batch_paths_share_gate(self):
+        a, b = _doc("提交请假申请"), _doc("查询考勤")
+        vsm = MagicMock()
+        vsm.asimilarity_search_with_score = AsyncMock(return_value=[(a, 0.1), (b, 0.9)])
+        vsm.abatch_similarity_search_with_score = AsyncMock(
+            return_value=[[(a, 0.1), (b, 0.9)], [(a, 0.1), (b, 0.2)]]
+        )
+        reranker = MagicMock(enabled=True)
+        reranker.arerank_documents = AsyncMock(return_value=[(b, 0.9)])
+        retriever = ApiRetriever(vsm, reranker=reranker, gate=RerankGate(margin_threshold=0.5, enabled=True))
+
+        with patch.object(settings, "enable_hybrid_retrieval", False), patch.object(settings, "enable_reranking", True):
+            (doc, score), = asyncio.run(retriever.asearch("我要请个假", final_k=1))
+            self.assertEqual((doc.metadata["name"], score, doc.metadata["score_source"]), ("提交请假申请", 0.9, "vector"))
+            reranker.arerank_documents.assert_not_awaited()
+
+            gated, reranked = asyncio.run(retriever.abatch_search(["我要请个假", "查一下考勤"], final_k=1))
+            self.assertEqual(gated[0][0].metadata["score_source"], "vector")
+            self.assertEqual(reranked[0][0].metadata["score_source"], "rerank")
+            reranker.arerank_documents.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
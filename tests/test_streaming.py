@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.agent.api_rag_agent import ApiRagAgent
+from src.planning.task_planner import TaskPlanner
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.tracing import InMemoryExporter, tracer
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+PLAN_JSON = json.dumps({"type": "sequential", "tasks": [{"api_name": "提交请假申请", "description": "提交请假。"}]})
+
+
+class StubStreamingLLM:
+    """按固定片段流式输出的大模型"""
+
+    def __init__(self, text: str, pieces: int = 3):
+        step = max(1, len(text) // pieces)
+        self.chunks = [text[i:i + step] for i in range(0, len(text), step)]
+
+    async def astream(self, _input, *args, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStreamingEndpoints(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            cls.api_definitions = json.load(f)
+        cls.vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=cls.tmp_dir.name)
+        cls.vsm.create_vector_store(build_api_documents(cls.api_definitions), collection_name="api_docs")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_plan_stream_emits_stages_in_order(self):
+        exporter = InMemoryExporter()
+        tracer.add_exporter(exporter)
+        self.addCleanup(tracer.remove_exporter, exporter)
+        rewriter = StubStreamingLLM("帮我提交一个请假申请。")
+        planner = TaskPlanner(StubStreamingLLM(f"```json\n{PLAN_JSON}\n```"))
+        with patch('src.main.query_rewriter_chain', rewriter), patch('src.main.planner', planner), \
+                patch('src.main.api_json_definitions', self.api_definitions), patch('src.main.plan_cache', None):
+            response = self.client.post("/plan/stream", json={"query": "我要请假"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = _parse_sse(response.text)
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], "rewrite_token")
+        self.assertEqual(names[-2:], ["plan", "done"])
+        self.assertLess(names.index("rewritten_query"), names.index("plan_token"))
+        self.assertEqual(dict(events)["rewritten_query"]["query"], "帮我提交一个请假申请。")
+        self.assertEqual(events[-2][1]["tasks"][0]["api_name"], "提交请假申请")
+        # 流式改写与规划同样记录span
+        self.assertIn("rewrite", exporter.names())
+        self.assertIn("planner", exporter.names())
+
+    def test_generate_api_call_stream(self):
+        agent = ApiRagAgent(
+            vector_store_manager=self.vsm,
+            llm=RunnableLambda(lambda _prompt: '{"reason": "身体不适", "userId": "u_1", "userName": "张三"}')
+        )
+        agent.retriever.reranker.enabled = False
+        with patch('src.main.api_agent', agent):
+            response = self.client.post(
+                "/generate-api-call/stream", json={"query": "提交请假申请 SICK 2024-05-01 到 2024-05-02"}
+            )
+
+        events = _parse_sse(response.text)
+        names = [name for name, _ in events]
+        self.assertEqual(names[:2], ["retrieved", "params_rule"])
+        self.assertIn("params_token", names)
+        self.assertEqual(names[-2:], ["result", "done"])
+        self.assertEqual(events[0][1]["endpoint"], "/api/v1/leaves")
+        self.assertIn(events[0][1]["score_source"], ("rrf", "vector"))
+        result = events[-2][1]
+        self.assertEqual(result["param_sources"]["type"], "rule")
+        self.assertEqual(result["param_sources"]["reason"], "llm")
+
+    def test_stream_errors_become_events(self):
+        with patch('src.main.query_rewriter_chain', None), patch('src.main.plan_cache', None):
+            response = self.client.post("/plan/stream", json={"query": "我要请假"})
+        self.assertEqual([name for name, _ in _parse_sse(response.text)], ["error", "done"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.main as main
+from scripts.vectorization import vectorize_apis
+from src.planning.task_planner import TaskPlanner
+from src.utils.client_registry import client_registry
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.llm_factory import LLMFactory
+from src.utils.stub_llm import LatencyModel, StubChatModel
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+    API_DEFINITIONS = json.load(f)
+
+
+class TestStubChatModel(unittest.TestCase):
+
+    def setUp(self):
+        self.llm = StubChatModel(latency_ms=0, token_latency_ms=0)
+
+    def test_planner_gets_canned_plan(self):
+        plan = TaskPlanner(self.llm).plan("帮我提交请假申请和提交加班申请", API_DEFINITIONS)
+        self.assertEqual([task["api_name"] for task in plan["tasks"]], ["提交请假申请", "提交加班申请"])
+
+        fuzzy = TaskPlanner(self.llm).plan("我想请假", API_DEFINITIONS)
+        self.assertEqual(fuzzy["tasks"][0]["api_name"], "提交请假申请")
+        self.assertEqual(TaskPlanner(self.llm).plan("今天天气", API_DEFINITIONS), {})
+
+    def test_param_fill_returns_typed_json(self):
+        api_doc = json.dumps({"name": "提交请假申请", "params": [
+            {"name": "type", "type": "string", "description": "请假类型 (ANNUAL, SICK, PERSONAL)"},
+            {"name": "days", "type": "number", "description": "天数"},
+            {"name": "reason", "type": "string", "description": "请假事由"},
+        ]}, ensure_ascii=False)
+        text = self.llm.invoke(f"你是一个参数提取机器人。\n\n**# API文档:**\n{api_doc}\n\n**# 用户需求:**\n我要请假").content
+        self.assertEqual(json.loads(text), {"type": "ANNUAL", "days": 1, "reason": "stub-reason"})
+
+    def test_streaming_latency_and_usage(self):
+        llm = StubChatModel(latency_ms=50, latency_distribution="fixed", token_latency_ms=10, stream_chunk_chars=2)
+
+        async def collect():
+            started = time.perf_counter()
+            chunks = [chunk async for chunk in llm.astream("用户原始请求: 我要请假")]
+            return chunks, time.perf_counter() - started
+
+        chunks, elapsed = asyncio.run(collect())
+        self.assertEqual("".join(chunk.content for chunk in chunks), "我要请假")
+        self.assertEqual(len([chunk for chunk in chunks if chunk.content]), 2)
+        self.assertGreaterEqual(elapsed, 0.06)
+        usage = [chunk.usage_metadata for chunk in chunks if chunk.usage_metadata]
+        self.assertEqual(usage[-1]["output_tokens"], 4)
+
+    def test_latency_model_is_seeded(self):
+        first = [LatencyModel(100, "lognormal", 0.5, seed=7).sample() for _ in range(3)]
+        again = [LatencyModel(100, "lognormal", 0.5, seed=7).sample() for _ in range(3)]
+        self.assertEqual(first, again)
+        self.assertEqual(LatencyModel(100, "fixed").sample(), 0.1)
+        samples = [LatencyModel(100, "uniform", 0.2, seed=1).sample() for _ in range(20)]
+        self.assertTrue(all(0.08 <= sample <= 0.12 for sample in samples))
+
+
+class TestStubProvider(unittest.TestCase):
+
+    def test_factory_creates_shared_stub_clients(self):
+        self.addCleanup(client_registry.clear)
+        llm = LLMFactory.create_llm("stub")
+        self.assertIsInstance(llm, StubChatModel)
+        self.assertIs(LLMFactory.create_llm("stub"), llm)
+
+        embeddings = LLMFactory.create_embeddings("stub")
+        self.assertIsInstance(embeddings, HashEmbeddings)
+        self.assertEqual(embeddings.embed_query("提交请假申请"), HashEmbeddings().embed_query("提交请假申请"))
+
+    def test_app_runs_offline_with_stub_provider(self):
+        """LLM_PROVIDER=stub时，服务启动和/plan、/generate-api-call全流程不需要任何API密钥"""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        state = {name: getattr(main, name) for name in (
+            "llm", "query_rewriter_chain", "plan_cache", "index_manager", "index_watcher_task",
+            "api_agent", "planner", "api_json_definitions", "api_catalog_hash"
+        )}
+        self.addCleanup(lambda: [setattr(main, name, value) for name, value in state.items()])
+        self.addCleanup(client_registry.clear)
+
+        with patch.multiple(
+            main.settings, llm_provider="stub", vector_store_path=tmp_dir.name, enable_index_watcher=False,
+            stub_llm_latency_ms=0, stub_llm_token_latency_ms=0, dashscope_api_key=None
+        ):
+            vsm = VectorStoreManager(embeddings=LLMFactory.create_embeddings(), persist_directory=tmp_dir.name)
+            vectorize_apis(vsm, api_json_path=API_JSON_PATH)
+
+            with TestClient(main.app) as client:
+                plan = client.post("/plan", json={"query": "帮我提交请假申请"})
+                api_call = client.post("/generate-api-call", json={"query": "我要提交请假申请"})
+
+        self.assertEqual(plan.status_code, 200, plan.text)
+        self.assertEqual(plan.json()["tasks"][0]["api_name"], "提交请假申请")
+        self.assertEqual(api_call.status_code, 200, api_call.text)
+        self.assertEqual(api_call.json()["url"], "/api/v1/leaves")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# 将项目根目录添加到sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.main import app
+from src.agent.api_rag_agent import ApiRagAgent
+from src.cache.embedding_cache import CachedEmbeddings, EmbeddingCacheStore
+from src.planning.task_planner import TaskPlanner
+from src.utils.hash_embeddings import HashEmbeddings
+from src.utils.stub_llm import StubChatModel
+from src.utils.tracing import NOOP_SPAN, InMemoryExporter, MetricsExporter, Tracer, merge_server_timing, tracer
+from src.vectorize.api_documents import build_api_documents
+from src.vectorize.vectorizer import VectorStoreManager
+
+API_JSON_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'api.json')
+
+
+def _server_timing(header):
+    return {item.split(";dur=")[0]: float(item.split(";dur=")[1]) for item in header.split(", ")}
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer(enabled=True)
+        self.exporter = InMemoryExporter()
+        self.tracer.add_exporter(self.exporter)
+
+    def test_span_records_duration_attributes_and_cache_hits(self):
+        with self.tracer.span("rerank", documents=3) as span:
+            self.tracer.record_cache("rerank", True)
+            span.set("top_n", 1)
+
+        self.assertEqual(self.exporter.names(), ["rerank"])
+        recorded = self.exporter.spans[0]
+        self.assertEqual(recorded.attributes, {"documents": 3, "rerank_cache_hit": True, "top_n": 1})
+        self.assertGreater(recorded.duration_ms, 0)
+        self.assertIn('pipeline_cache_lookups_total{cache="rerank",result="hit"} 1', self.tracer.metrics.render())
+
+    def test_disabled_tracer_is_noop(self):
+        self.tracer.configure(False)
+        with self.tracer.span("rerank") as span:
+            self.tracer.record_cache("rerank", False)
+        self.assertIs(span, NOOP_SPAN)
+        self.assertEqual(self.tracer.llm_config(span), {})
+        self.assertEqual(self.exporter.spans, [])
+        self.assertNotIn("rerank", self.tracer.metrics.render())
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = MetricsExporter(buckets=(0.01, 0.1))
+        for duration_ms in (5, 50, 500):
+            with Tracer(enabled=True).span("plan") as span:
+                pass
+            span.duration_ms = duration_ms
+            metrics.export(span)
+
+        text = metrics.render()
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="plan",le="0.01"} 1', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="plan",le="0.1"} 2', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="plan",le="+Inf"} 3', text)
+        self.assertIn('pipeline_stage_duration_seconds_count{stage="plan"} 3', text)
+
+    def test_merge_server_timing_keeps_route_stages(self):
+        spans = []
+        for name, duration_ms in (("embedding", 2.0), ("embedding", 3.0), ("rewrite", 99.0)):
+            with Tracer(enabled=True).span(name) as span:
+                pass
+            span.duration_ms = duration_ms
+            spans.append(span)
+
+        header = merge_server_timing("rewrite;dur=10.0, total;dur=20.0", spans, 30.0)
+        self.assertEqual(_server_timing(header), {"rewrite": 10.0, "total": 20.0, "embedding": 5.0})
+
+
+class TestPipelineSpans(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        tracer.add_exporter(self.exporter)
+        self.addCleanup(tracer.remove_exporter, self.exporter)
+
+    def test_planner_span_counts_tokens(self):
+        llm = GenericFakeChatModel(messages=iter([AIMessage(
+            content=json.dumps({"type": "sequential", "tasks": []}),
+            usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150}
+        )]))
+        TaskPlanner(llm).plan("我要请假", [{"name": "提交请假申请", "description": "提交请假申请"}])
+
+        span = self.exporter.spans[-1]
+        self.assertEqual((span.name, span.prompt_tokens, span.completion_tokens), ("planner", 120, 30))
+        self.assertIn('pipeline_llm_tokens_total{stage="planner",kind="prompt"}', tracer.metrics.render())
+
+    def test_streaming_planner_records_span(self):
+        planner = TaskPlanner(StubChatModel(latency_ms=0, token_latency_ms=0))
+
+        async def consume():
+            return [kind async for kind, _ in planner.astream_plan(
+                "帮我提交请假申请", [{"name": "提交请假申请", "description": "提交请假申请"}]
+            )]
+
+        kinds = asyncio.run(consume())
+        self.assertEqual(kinds[-1], "plan")
+        span = self.exporter.spans[-1]
+        self.assertEqual(span.name, "planner")
+        self.assertGreater(span.prompt_tokens, 0)
+        self.assertGreater(span.completion_tokens, 0)
+
+    def test_embedding_span_marks_cache_hit(self):
+        embeddings = CachedEmbeddings(HashEmbeddings(), store=EmbeddingCacheStore(max_entries=8))
+        embeddings.embed_query("提交请假申请")
+        embeddings.embed_query("提交请假申请")
+        self.assertEqual(
+            [(span.name, span.attributes["embedding_cache_hit"]) for span in self.exporter.spans],
+            [("embedding", False), ("embedding", True)]
+        )
+
+
+class TestServerTimingAndMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+        with open(API_JSON_PATH, "r", encoding="utf-8") as f:
+            api_definitions = json.load(f)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        vsm = VectorStoreManager(embeddings=HashEmbeddings(), persist_directory=self.tmp_dir.name)
+        vsm.create_vector_store(build_api_documents(api_definitions), collection_name="api_docs")
+        self.agent = ApiRagAgent(vector_store_manager=vsm, llm=RunnableLambda(lambda _: '{"reason": "身体不适"}'))
+        self.agent.retriever.reranker.enabled = False
+
+    def test_generate_api_call_reports_stage_timings(self):
+        with patch('src.main.api_agent', self.agent):
+            response = self.client.post("/generate-api-call", json={"query": "我要请假，身体不适"})
+        self.assertEqual(response.status_code, 200)
+
+        stages = _server_timing(response.headers["server-timing"])
+        self.assertIn("embedding", stages)
+        self.assertIn("vector_search", stages)
+        self.assertIn("param_fill", stages)
+        self.assertGreaterEqual(stages["total"], stages["param_fill"])
+
+        metrics = self.client.get("/metrics")
+        self.assertEqual(metrics.status_code, 200)
+        self.assertTrue(metrics.headers["content-type"].startswith("text/plain"))
+        self.assertIn('pipeline_stage_duration_seconds_count{stage="param_fill"}', metrics.text)
+        self.assertIn('pipeline_cache_lookups_total{cache="embedding"', metrics.text)
+
+    def test_disabled_tracing_omits_header(self):
+        with patch.object(tracer, 'enabled', False), patch('src.main.api_agent', self.agent):
+            response = self.client.post("/generate-api-call", json={"query": "我要请假，身体不适"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("server-timing", response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
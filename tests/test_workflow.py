@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 import sys
 import os
@@ -17,14 +17,14 @@ class TestApiRoutes(unittest.TestCase):
         self.client = TestClient(app)
 
     @patch('src.main.query_rewriter_chain')
-    @patch('src.planning.task_planner.TaskPlanner.plan')
-    def test_plan_endpoint_success(self, mock_plan, mock_rewriter):
+    @patch('src.main.planner')
+    def test_plan_endpoint_success(self, mock_planner, mock_rewriter):
         """测试 /plan 接口在成功情况下的表现"""
         print("\n--- 测试 /plan 接口成功场景 ---")
         
         # 1. 设定模拟对象的返回值
-        mock_rewriter.ainvoke.return_value = "首先获取我的员工信息，然后并行为我提交请假和加班申请。"
-        mock_plan.return_value = {
+        mock_rewriter.ainvoke = AsyncMock(return_value="首先获取我的员工信息，然后并行为我提交请假和加班申请。")
+        mock_planner.aplan = AsyncMock(return_value={
             "type": "sequential",
             "tasks": [
                 {"api_name": "获取员工项目信息", "description": "获取员工的基础信息。"},
@@ -36,7 +36,7 @@ class TestApiRoutes(unittest.TestCase):
                     ]
                 }
             ]
-        }
+        })
 
         # 2. 发起API请求
         response = self.client.post("/plan", json={"query": "帮我申请请假和加班"})
@@ -48,13 +48,13 @@ class TestApiRoutes(unittest.TestCase):
         self.assertIn('tasks', response_json)
         print("✅ /plan 接口成功场景测试通过。")
 
-    @patch('src.agent.api_rag_agent.ApiRagAgent.generate_api_call')
-    def test_generate_api_call_success(self, mock_generate_call):
+    @patch('src.main.api_agent')
+    def test_generate_api_call_success(self, mock_agent):
         """测试 /generate-api-call 接口在成功情况下的表现"""
         print("\n--- 测试 /generate-api-call 接口成功场景 ---")
 
         # 1. 设定模拟对象的返回值
-        mock_generate_call.return_value = {
+        mock_agent.agenerate_api_call = AsyncMock(return_value={
             "description": "通过邮箱地址解锁一个被锁定的用户账号。",
             "method": "POST",
             "url": "/api/v1/users/unlock",
@@ -64,7 +64,7 @@ class TestApiRoutes(unittest.TestCase):
                     "description": "需要解锁的用户的邮箱地址",
                 }
             ]
-        }
+        })
 
         # 2. 发起API请求
         response = self.client.post("/generate-api-call", json={"query": "帮我解锁用户 a@b.com"})